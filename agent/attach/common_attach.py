@@ -191,6 +191,17 @@ def get_full_team_force_send(context: Context) -> bool:
     return bool(force_send)
 
 
+def get_team_info_ttl(context: Context) -> int:
+    """获取队伍信息缓存时间参数"""
+    team_info_ttl_node = context.get_node_data("获取参数-队伍信息缓存时间")
+    team_info_ttl = (team_info_ttl_node
+                         .get("attach", {})
+                         .get("team_info_ttl", 300)
+                         ) if team_info_ttl_node else 300
+    logger.info("队伍信息缓存时间: {}秒", team_info_ttl)
+    return int(team_info_ttl)
+
+
 def get_world_line_id_list(context: Context) -> list[str]:
     """获取需要切换的世界分线ID列表参数"""
     line_ids_node = context.get_node_data("获取参数-需要切换的世界分线ID列表")
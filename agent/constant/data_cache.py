@@ -0,0 +1,145 @@
+"""常量数据预编译缓存：把各常量 JSON 编译成一个带版本和内容校验的 pickle，并预建反查索引。"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Any
+
+CURRENT_DIR = Path(__file__).parent
+CACHE_FILEPATH = CURRENT_DIR / "constant_cache.pickle"
+# 缓存结构变更时需要递增
+CACHE_VERSION = 2
+
+# 缓存键 -> 源 JSON 文件
+SOURCE_FILES: dict[str, Path] = {
+    "fish": CURRENT_DIR / "fish" / "fishData.json",
+    "key_event": CURRENT_DIR / "key_event" / "AndroidKeyEvent.json",
+    "map_point": CURRENT_DIR / "map_point" / "MapPoint.json",
+    "navigate_point": CURRENT_DIR / "map_point" / "NavigatePoint.json",
+    "world_channel": CURRENT_DIR / "world_channel" / "ChannelData.json",
+    "ocr_confusion": CURRENT_DIR / "ocr_confusion" / "OcrConfusion.json",
+}
+
+_constant_data: dict[str, Any] | None = None
+
+
+def _source_stamps() -> dict[str, tuple[int, int]]:
+    """
+    源文件的 (crc32, size)，用于判断缓存是否过期
+
+    不使用 mtime：发布包经过 artifact 上传下载和 zip 打包，不会保留纳秒级的修改时间。
+    """
+    stamps = {}
+    for key, path in SOURCE_FILES.items():
+        content = path.read_bytes()
+        stamps[key] = (zlib.crc32(content), len(content))
+    return stamps
+
+
+def _build_point_indexes(point_data: dict[str, dict]) -> tuple[dict[str, str], dict[str, tuple[str, ...]]]:
+    """
+    构建地点反查索引
+
+    Returns:
+        (地点 -> 所在地图, 别称 -> 地点列表)；同名地点以 JSON 中先出现的地图为准
+    """
+    point_to_map: dict[str, str] = {}
+    alias_to_points: dict[str, list[str]] = {}
+    for map_name, points in point_data.items():
+        for point_name, point in points.items():
+            point_to_map.setdefault(point_name, map_name)
+            alias = point.get("alias", point_name)
+            alias_to_points.setdefault(alias, []).append(point_name)
+    return point_to_map, {alias: tuple(points) for alias, points in alias_to_points.items()}
+
+
+def _build_fish_indexes(fish_data: dict[str, dict[str, list[str]]]) -> dict[str, Any]:
+    """
+    把 区域 -> 类别 -> 鱼名 的嵌套结构展平
+
+    Returns:
+        fish_list: 去重后的鱼名列表（保持 JSON 中的顺序）
+        fish_entries: (鱼名, 类别, 区域) 的展平列表
+        fish_info: 鱼名 -> ((类别, 区域), ...)
+    """
+    fish_entries: list[tuple[str, str, str]] = []
+    fish_info: dict[str, list[tuple[str, str]]] = {}
+    for region, categories in fish_data.items():
+        for category, names in categories.items():
+            for name in names:
+                fish_entries.append((name, category, region))
+                fish_info.setdefault(name, []).append((category, region))
+    return {
+        "fish_list": list(fish_info),
+        "fish_entries": tuple(fish_entries),
+        "fish_info": {name: tuple(info) for name, info in fish_info.items()},
+    }
+
+
+def build_constant_data() -> dict[str, Any]:
+    """从源 JSON 构建全部常量数据和索引"""
+    data: dict[str, Any] = {}
+    for key, path in SOURCE_FILES.items():
+        with open(path, "r", encoding="utf-8") as f:
+            data[key] = json.load(f)
+    data["map_point_index"], data["map_point_alias_index"] = _build_point_indexes(data["map_point"])
+    data["navigate_point_index"], data["navigate_point_alias_index"] = _build_point_indexes(data["navigate_point"])
+    data.update(_build_fish_indexes(data["fish"]))
+    return data
+
+
+def write_constant_cache(cache_path: Path = CACHE_FILEPATH, data: dict[str, Any] | None = None) -> dict[str, Any]:
+    """构建并写出缓存文件，供构建脚本调用；先写临时文件再替换，避免写一半被读到"""
+    payload = {
+        "version": CACHE_VERSION,
+        "stamps": _source_stamps(),
+        "data": data if data is not None else build_constant_data(),
+    }
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return payload["data"]
+
+
+def _read_valid_cache(cache_path: Path) -> dict[str, Any] | None:
+    """读取缓存，版本不符或源文件有变化时返回 None"""
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != CACHE_VERSION:
+        return None
+    if payload.get("stamps") != _source_stamps():
+        return None
+    return payload["data"]
+
+
+def load_constant_data() -> dict[str, Any]:
+    """
+    获取全部常量数据，进程内只加载一次
+
+    缓存有效时直接反序列化 pickle，跳过 JSON 解析；否则从 JSON 重新构建并尽量回写缓存。
+    """
+    global _constant_data
+    if _constant_data is None:
+        data = _read_valid_cache(CACHE_FILEPATH)
+        if data is None:
+            data = build_constant_data()
+            try:
+                write_constant_cache(CACHE_FILEPATH, data)
+            except OSError:
+                # 安装目录只读时直接使用内存中的数据
+                pass
+        _constant_data = data
+    return _constant_data
+
+
+__all__ = ["load_constant_data", "write_constant_cache", "build_constant_data"]
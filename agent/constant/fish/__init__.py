@@ -1,13 +1,14 @@
-import json
-from itertools import chain
-from pathlib import Path
+from agent.constant.data_cache import load_constant_data
 
-CURRENT_DIR = Path(__file__).parent
-FISH_FILEPATH = CURRENT_DIR / "FishData.json"
+_DATA = load_constant_data()
 
-with open(FISH_FILEPATH, "r", encoding="utf-8") as f:
-    FISH_DATA = json.load(f)
+# 区域 -> 类别 -> 鱼名列表
+FISH_DATA = _DATA["fish"]
+# 去重后的鱼名列表
+FISH_LIST = _DATA["fish_list"]
+# (鱼名, 类别, 区域) 的展平列表
+FISH_ENTRIES = _DATA["fish_entries"]
+# 鱼名 -> ((类别, 区域), ...)
+FISH_INFO = _DATA["fish_info"]
 
-FISH_LIST = (lambda d: list(set(chain.from_iterable(chain.from_iterable(p.values() for p in d.values())))))(FISH_DATA)
-
-__all__ = ["FISH_DATA", "FISH_LIST"]
+__all__ = ["FISH_DATA", "FISH_LIST", "FISH_ENTRIES", "FISH_INFO"]
@@ -1,11 +1,6 @@
-import json
-from pathlib import Path
+from agent.constant.data_cache import load_constant_data
 
-CURRENT_DIR = Path(__file__).parent
-ANDROID_KEY_EVENT_FILEPATH = CURRENT_DIR / "AndroidKeyEvent.json"
-
-with open(ANDROID_KEY_EVENT_FILEPATH, "r", encoding="utf-8") as f:
-    ANDROID_KEY_EVENT_DATA = json.load(f)
+ANDROID_KEY_EVENT_DATA = load_constant_data()["key_event"]
 
 
 __all__ = ["ANDROID_KEY_EVENT_DATA"]
@@ -1,13 +1,44 @@
-import json
-from pathlib import Path
+from agent.constant.data_cache import load_constant_data
 
-CURRENT_DIR = Path(__file__).parent
-MAP_POINT_FILEPATH = CURRENT_DIR / "MapPoint.json"
-NAVIGATE_FILEPATH = CURRENT_DIR / "NavigatePoint.json"
+_DATA = load_constant_data()
 
-with open(MAP_POINT_FILEPATH, "r", encoding="utf-8") as f:
-    MAP_POINT_DATA = json.load(f)
-with open(NAVIGATE_FILEPATH, "r", encoding="utf-8") as f:
-    NAVIGATE_DATA = json.load(f)
+MAP_POINT_DATA = _DATA["map_point"]
+NAVIGATE_DATA = _DATA["navigate_point"]
+# 地点 -> 所在地图
+MAP_POINT_INDEX = _DATA["map_point_index"]
+NAVIGATE_INDEX = _DATA["navigate_point_index"]
+# 别称 -> 地点列表
+MAP_POINT_ALIAS_INDEX = _DATA["map_point_alias_index"]
+NAVIGATE_ALIAS_INDEX = _DATA["navigate_point_alias_index"]
 
-__all__ = ["MAP_POINT_DATA", "NAVIGATE_DATA"]
+
+def find_point_map(point_data: dict, point: str) -> str | None:
+    """
+    根据地点反查所在地图，内置数据走预建索引，其他数据退化为线性查找
+
+    Args:
+        point_data: 地点数据MAP
+        point: 地点名
+
+    Returns:
+        地图名，找不到返回 None
+    """
+    if point_data is MAP_POINT_DATA:
+        return MAP_POINT_INDEX.get(point)
+    if point_data is NAVIGATE_DATA:
+        return NAVIGATE_INDEX.get(point)
+    for map_name, locations in point_data.items():
+        if point in locations:
+            return map_name
+    return None
+
+
+__all__ = [
+    "MAP_POINT_DATA",
+    "NAVIGATE_DATA",
+    "MAP_POINT_INDEX",
+    "NAVIGATE_INDEX",
+    "MAP_POINT_ALIAS_INDEX",
+    "NAVIGATE_ALIAS_INDEX",
+    "find_point_map",
+]
@@ -0,0 +1,7 @@
+from agent.constant.data_cache import load_constant_data
+from agent.utils.fuzzy_utils import OcrConfusionTable
+
+# OCR 易混淆字符表 | 用于 FuzzyIndex 的 normalizer
+OCR_CONFUSION = OcrConfusionTable(load_constant_data()["ocr_confusion"]["groups"])
+
+__all__ = ["OCR_CONFUSION"]
@@ -1,10 +1,5 @@
-import json
-from pathlib import Path
+from agent.constant.data_cache import load_constant_data
 
-CURRENT_DIR = Path(__file__).parent
-CHANNEL_FILEPATH = CURRENT_DIR / "ChannelData.json"
-
-with open(CHANNEL_FILEPATH, "r", encoding="utf-8") as f:
-    CHANNEL_DATA = dict(json.load(f))
+CHANNEL_DATA = dict(load_constant_data()["world_channel"])
 
 __all__ = ["CHANNEL_DATA"]
@@ -7,23 +7,64 @@ from maa.custom_action import CustomAction
 from maa.job import Job
 
 from agent.attach.common_attach import get_area_change_timeout, get_login_timeout
+from agent.custom.general.ad_close import AD_POPUP_NODE, AD_SETTLE_SECONDS, dismiss_ad
+from agent.custom.general.chat_channel_state import chat_channel_state
+from agent.custom.general.line_selector import line_selector
+from agent.custom.general.route_planner import location_tracker
 from agent.logger import logger
-from agent.utils.param_utils import CustomActionParam
+from agent.utils.event_stream import controller, counter, recognition, recovery, track_task
+from agent.utils.param_utils import ParamField, ParamSchema
+from agent.utils.progress_watchdog import ProgressWatch, progress_watchdog
+
+XHGM_PACKAGE_NAME = "com.tencent.wlfz"
+# 关闭应用后到再次启动的间隔（秒） | stop_app 返回时进程已经结束，只留一点余量
+APP_RESTART_GAP = 1.0
+# 登录流程每轮截图的间隔（秒）
+LOGIN_POLL_INTERVAL = 0.5
+# 场景切换检测的间隔（秒）
+SWITCH_POLL_INTERVAL = 1.0
+# 进入主页面后继续检测广告弹窗的时间（秒），每关闭一个广告重新计时 | 弹窗展示很慢，与关闭广告的等待保持一致
+AD_WATCH_WINDOW = AD_SETTLE_SECONDS
+# 看门狗检测到画面卡住后最多重启几次应用
+MAX_STALL_RESTARTS = 1
+
+# 登录流程的阶段
+RESTART = "restart"    # 关闭并重新启动应用
+CONNECT = "connect"    # 等待 点击连接开始
+ENTER = "enter"        # 等待 点击进入游戏
+LOADING = "loading"    # 已点击进入游戏，等待主页面
+AD_WATCH = "ad_watch"  # 已在主页面，关闭陆续弹出的广告
+DONE = "done"
+FAILED = "failed"
+
+# 登录各阶段卡住判定窗口的下限（秒） | 连接、加载画面可以长时间几乎不变，学习到的窗口再短也不提前重启
+PHASE_MIN_WINDOWS = {CONNECT: 90.0, ENTER: 60.0, LOADING: 60.0}
+
+PHASE_NAMES = {
+    RESTART: "重启应用",
+    CONNECT: "连接开始",
+    ENTER: "进入游戏",
+    LOADING: "加载场景",
+    AD_WATCH: "关闭广告",
+}
+
+START_TARGET_APP_PARAMS = ParamSchema("StartTargetApp", ParamField("app_package_name", str))
+STOP_TARGET_APP_PARAMS = ParamSchema("StopTargetApp", ParamField("app_package_name", str))
+RESTART_TARGET_APP_PARAMS = ParamSchema("RestartTargetApp", ParamField("app_package_name", str))
 
 
 # 启动指定APP
 @AgentServer.custom_action("StartTargetApp")
 class StartTargetAppAction(CustomAction):
 
+    @track_task("StartTargetApp")
     def run(
         self,
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
         # 获取参数
-        params = CustomActionParam(argv.custom_action_param)
-        required = params.require(["app_package_name"])
-        app_package_name = required["app_package_name"]
+        app_package_name = START_TARGET_APP_PARAMS.parse(argv.custom_action_param)["app_package_name"]
         return start_target_app(context, app_package_name)
 
 
@@ -31,15 +72,14 @@ class StartTargetAppAction(CustomAction):
 @AgentServer.custom_action("StopTargetApp")
 class StopTargetAppAction(CustomAction):
 
+    @track_task("StopTargetApp")
     def run(
         self,
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
         # 获取参数
-        params = CustomActionParam(argv.custom_action_param)
-        required = params.require(["app_package_name"])
-        app_package_name = required["app_package_name"]
+        app_package_name = STOP_TARGET_APP_PARAMS.parse(argv.custom_action_param)["app_package_name"]
         return stop_target_app(context, app_package_name)
 
 
@@ -47,30 +87,22 @@ class StopTargetAppAction(CustomAction):
 @AgentServer.custom_action("RestartTargetApp")
 class RestartTargetAppAction(CustomAction):
 
+    @track_task("RestartTargetApp")
     def run(
         self,
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
         # 获取参数
-        params = CustomActionParam(argv.custom_action_param)
-        required = params.require(["app_package_name"])
-        app_package_name = required["app_package_name"]
-
-        # 先关闭应用
-        stop_target_app(context, app_package_name)
-        
-        # 等待5秒再启动应用
-        logger.info("等待5秒后启动应用...")
-        time.sleep(5)
-
-        # 再启动应用
-        return start_target_app(context, app_package_name)
+        app_package_name = RESTART_TARGET_APP_PARAMS.parse(argv.custom_action_param)["app_package_name"]
+
+        return restart_target_app(context, app_package_name)
 
 
 # 重启并登录星痕共鸣
 @AgentServer.custom_action("RestartAndLoginXHGM")
 class RestartAndLoginXHGMAction(CustomAction):
+    @track_task("RestartAndLoginXHGM")
     def run(
         self,
         context: Context,
@@ -82,6 +114,7 @@ class RestartAndLoginXHGMAction(CustomAction):
 def start_target_app(context: Context, app_package_name: str) -> bool:
     """启动指定应用"""
     job: Job = context.tasker.controller.post_start_app(app_package_name).wait()
+    controller("start_target_app", "start_app", package=app_package_name, succeeded=job.succeeded)
     if job.succeeded:
         logger.info(f"已启动应用: {app_package_name}")
         return True
@@ -93,6 +126,7 @@ def start_target_app(context: Context, app_package_name: str) -> bool:
 def stop_target_app(context: Context, app_package_name: str) -> bool:
     """关闭指定应用"""
     job: Job = context.tasker.controller.post_stop_app(app_package_name).wait()
+    controller("stop_target_app", "stop_app", package=app_package_name, succeeded=job.succeeded)
     if job.succeeded:
         logger.info(f"已关闭应用: {app_package_name}")
         return True
@@ -101,89 +135,206 @@ def stop_target_app(context: Context, app_package_name: str) -> bool:
         return False
 
 
-def restart_and_login_xhgm(context: Context) -> bool:
-    """重启并登录星痕共鸣"""
-    app_package_name = "com.tencent.wlfz"
-
-    # 先关闭星痕共鸣
+def restart_target_app(context: Context, app_package_name: str) -> bool:
+    """关闭并重新启动指定应用"""
     stop_target_app(context, app_package_name)
-    
-    # 等待5秒再启动星痕共鸣
-    logger.info("等待5秒后启动星痕共鸣...")
-    time.sleep(5)
-
-    # 再启动星痕共鸣
-    start_target_app(context, app_package_name)
-
-    # 等待星痕共鸣启动完成
-    logger.info("等待星痕共鸣已启动，等待游戏连接开始...")
-    need_next = wait_for_start(context)
-    
-    # 登录结果判断
-    if not need_next:
-        return False
+    time.sleep(APP_RESTART_GAP)
+    return start_target_app(context, app_package_name)
 
-    logger.info("等待8秒后将检测进入游戏按钮...")
-    time.sleep(8)
 
-    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-    entry_result: RecognitionDetail | None = context.run_recognition("点击进入游戏", img)
-    if not entry_result or not entry_result.hit:
-        # 未识别到进入游戏
-        logger.error("未检测到进入游戏按钮，登录失败，请检查网络或应用状态！")
-        return False
-    
-    # 识别到进入游戏，点击进入游戏
-    context.tasker.controller.post_click(1103, 632).wait()
-    logger.info("星痕共鸣进入游戏成功，将等待登录完成...")
-    del entry_result
+class LoginStateMachine:
+    """
+    登录状态机：重启应用 -> 连接开始 -> 进入游戏 -> 加载场景 -> 关闭广告
 
-    # 等待进入游戏主界面
-    return wait_for_switch(context)
+    每轮只截一张图，先检测广告弹窗（出现就立即关闭），再检测当前阶段等待的画面，画面一出现就进入下一阶段，
+    不再在阶段之间固定等待。记录每个阶段的耗时。
+    """
 
+    def __init__(self, context: Context, task: str = "restart_and_login_xhgm") -> None:
+        """
+        Args:
+            context: 控制器上下文
+            task: 所属任务名，用于日志和事件
+        """
+        self.context = context
+        self.task = task
+        self.phase = RESTART
+        self.phase_started = time.monotonic()
+        self.phase_seconds: dict[str, float] = {}
+        self.ads_closed = 0
+        self.ad_watch_deadline = 0.0
+        self.stall_restarts = 0
+        self.watch: ProgressWatch | None = None
+        self.phase_windows: dict[str, float] = {}
 
-def wait_for_start(context: Context) -> bool:
-    """等待游戏启动"""
-    login_timeout = get_login_timeout(context)
-    start_time = time.time()
-    elapsed_time = 0
-    while elapsed_time <= login_timeout and not context.tasker.stopping:
-        elapsed_time = time.time() - start_time
-        img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-        # 登录完成检测
-        login_result: RecognitionDetail | None = context.run_recognition("点击连接开始", img)
-        if login_result and login_result.hit:
-            del login_result, img
-            logger.info("检测到星痕共鸣已经成功启动完游戏！")
-            context.tasker.controller.post_click(639, 602).wait()
-            return True
-        # 登录信息失效检测
-        no_login_result: RecognitionDetail | None = context.run_recognition("检测是否需要登录", img)
-        if no_login_result and no_login_result.hit:
-            del login_result, no_login_result, img
-            logger.info("检测到星痕共鸣登录信息失效，需要登录账号！")
+    def run(self, start_phase: str = RESTART) -> bool:
+        """
+        执行登录流程
+
+        Args:
+            start_phase: 开始的阶段，例如已经点击了进入游戏时从 LOADING 开始
+
+        Returns:
+            是否进入了游戏主页面
+        """
+        login_timeout = get_login_timeout(self.context)
+        area_change_timeout = get_area_change_timeout(self.context)
+        # 各阶段没有学习到进度间隔时的卡住判定窗口，与原来的固定超时一致
+        self.phase_windows = {CONNECT: login_timeout, ENTER: login_timeout, LOADING: area_change_timeout}
+        start = time.monotonic()
+        self.phase = start_phase
+        self.phase_started = start
+        loading_started = start
+        self.watch = progress_watchdog.watch(self.task, default_window=self.phase_windows.get(start_phase, login_timeout))
+        self.watch.set_phase(start_phase, min_window=PHASE_MIN_WINDOWS.get(start_phase))
+        try:
+            if self.phase == RESTART:
+                restart_target_app(self.context, XHGM_PACKAGE_NAME)
+                self.transition(CONNECT)
+                logger.info("星痕共鸣已启动，等待游戏连接开始...")
+            while self.phase not in (DONE, FAILED):
+                if self.context.tasker.stopping:
+                    logger.info("[登录] 被手动停止")
+                    self.transition(FAILED)
+                    break
+                now = time.monotonic()
+                if self.phase in (CONNECT, ENTER) and now - start > login_timeout:
+                    logger.error(f"星痕共鸣启动游戏超{login_timeout}秒限制，请检查游戏状态！")
+                    self.transition(FAILED)
+                    break
+                if self.phase == LOADING and now - loading_started > area_change_timeout:
+                    logger.error(f"星痕共鸣切换场景超过{area_change_timeout}秒限制，请检查游戏状态！")
+                    self.transition(FAILED)
+                    break
+                if self.phase == AD_WATCH and now >= self.ad_watch_deadline:
+                    self.transition(DONE)
+                    break
+                if self.watch.take_stall():
+                    # 画面长时间没有变化：模拟器或游戏卡住，不再等到固定超时
+                    if self.stall_restarts >= MAX_STALL_RESTARTS:
+                        logger.error("星痕共鸣登录过程中画面卡住，重启后仍未恢复，请检查游戏状态！")
+                        self.transition(FAILED)
+                        break
+                    self.stall_restarts += 1
+                    recovery(self.task, "login_stall_restart", phase=self.phase)
+                    logger.warning("[登录] {} 阶段画面卡住，重启星痕共鸣", PHASE_NAMES.get(self.phase, self.phase))
+                    self.transition(RESTART)
+                    restart_target_app(self.context, XHGM_PACKAGE_NAME)
+                    self.transition(CONNECT)
+                    start = time.monotonic()
+                    continue
+                img: numpy.ndarray = self.context.tasker.controller.post_screencap().wait().get()
+                self.watch.frame(img)
+                if self.close_ad(img):
+                    continue
+                previous = self.phase
+                self.judge(img)
+                if self.phase == LOADING and previous != LOADING:
+                    loading_started = time.monotonic()
+                if self.phase == previous:
+                    time.sleep(LOGIN_POLL_INTERVAL)
+        finally:
+            self.watch.close()
+            self.report(time.monotonic() - start)
+        return self.phase == DONE
+
+    def transition(self, phase: str) -> None:
+        """结束当前阶段并记录耗时"""
+        now = time.monotonic()
+        self.phase_seconds[self.phase] = self.phase_seconds.get(self.phase, 0.0) + now - self.phase_started
+        logger.debug("[登录] {} -> {}", self.phase, phase)
+        self.phase = phase
+        self.phase_started = now
+        if self.watch is not None:
+            self.watch.set_phase(phase, self.phase_windows.get(phase), PHASE_MIN_WINDOWS.get(phase))
+        if phase == AD_WATCH:
+            self.ad_watch_deadline = now + AD_WATCH_WINDOW
+
+    def close_ad(self, img: numpy.ndarray) -> bool:
+        """本轮截图中有广告弹窗就立即关闭，返回是否关闭了广告"""
+        ad_result: RecognitionDetail | None = self.context.run_recognition(AD_POPUP_NODE, img)
+        if not ad_result or not ad_result.hit:
             return False
-        del login_result, no_login_result, img
-        time.sleep(2)
-    logger.error(f"星痕共鸣启动游戏超{login_timeout}秒限制 或者 被手动停止，请检查游戏状态！")
-    return False
+        dismiss_ad(self.context)
+        self.ads_closed += 1
+        if self.phase == AD_WATCH:
+            self.ad_watch_deadline = time.monotonic() + AD_WATCH_WINDOW
+        return True
+
+    def judge(self, img: numpy.ndarray) -> None:
+        """根据当前阶段等待的画面推进状态"""
+        context = self.context
+        if self.phase in (CONNECT, ENTER):
+            # 有时候已经跳过了连接开始，直接出现进入游戏
+            entry_result: RecognitionDetail | None = context.run_recognition("点击进入游戏", img)
+            if entry_result and entry_result.hit:
+                recognition(self.task, "点击进入游戏", True)
+                context.tasker.controller.post_click(1103, 632).wait()
+                logger.info("星痕共鸣进入游戏成功，将等待登录完成...")
+                self.transition(LOADING)
+                return
+        if self.phase == CONNECT:
+            login_result: RecognitionDetail | None = context.run_recognition("点击连接开始", img)
+            if login_result and login_result.hit:
+                logger.info("检测到星痕共鸣已经成功启动完游戏！")
+                context.tasker.controller.post_click(639, 602).wait()
+                self.transition(ENTER)
+                return
+            no_login_result: RecognitionDetail | None = context.run_recognition("检测是否需要登录", img)
+            if no_login_result and no_login_result.hit:
+                logger.info("检测到星痕共鸣登录信息失效，需要登录账号！")
+                recovery(self.task, "login_expired")
+                self.transition(FAILED)
+            return
+        if self.phase == LOADING:
+            area_change_result: RecognitionDetail | None = context.run_recognition("图片识别是否在主页面", img)
+            if area_change_result and area_change_result.hit:
+                logger.info("检测到星痕共鸣已经成功切换场景！")
+                self.transition(AD_WATCH)
+
+    def report(self, total: float) -> None:
+        summary = "，".join(
+            f"{PHASE_NAMES[phase]} {seconds:.1f} 秒"
+            for phase, seconds in self.phase_seconds.items() if phase in PHASE_NAMES
+        )
+        logger.info("[登录] 结果: {}，总耗时 {:.1f} 秒（{}），关闭广告 {} 个",
+                    self.phase, total, summary or "无", self.ads_closed)
+        for phase, seconds in self.phase_seconds.items():
+            if phase in PHASE_NAMES:
+                counter(self.task, f"login_{phase}_seconds", round(seconds, 2))
+        counter(self.task, "login_total_seconds", round(total, 2), result=self.phase, ads_closed=self.ads_closed)
+
+
+@track_task("restart_and_login_xhgm")
+def restart_and_login_xhgm(context: Context) -> bool:
+    """重启并登录星痕共鸣，进入主页面后顺便关闭弹出的广告"""
+    # 重启后不再信任之前记录的位置和聊天分线
+    location_tracker.get(context).invalidate()
+    chat_channel_state.get(context).invalidate()
+    line_selector.invalidate_current(context)
+    return LoginStateMachine(context).run()
 
 
 def wait_for_switch(context: Context) -> bool:
-    """等待场景切换"""
+    """等待场景切换，画面长时间没有变化时提前结束"""
     area_change_timeout = get_area_change_timeout(context)
     start_time = time.time()
     elapsed_time = 0
-    while elapsed_time <= area_change_timeout and not context.tasker.stopping:
-        elapsed_time = time.time() - start_time
-        img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-        area_change_result: RecognitionDetail | None = context.run_recognition("图片识别是否在主页面", img)
-        if area_change_result and area_change_result.hit:
+    with progress_watchdog.watch("wait_for_switch", default_window=area_change_timeout) as watch:
+        while elapsed_time <= area_change_timeout and not context.tasker.stopping:
+            elapsed_time = time.time() - start_time
+            if watch.take_stall():
+                logger.error("星痕共鸣切换场景时画面长时间没有变化，可能已经卡住，请检查游戏状态！")
+                return False
+            img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+            watch.frame(img)
+            area_change_result: RecognitionDetail | None = context.run_recognition("图片识别是否在主页面", img)
+            if area_change_result and area_change_result.hit:
+                del area_change_result, img
+                logger.info("检测到星痕共鸣已经成功切换场景！")
+                return True
             del area_change_result, img
-            logger.info("检测到星痕共鸣已经成功切换场景！")
-            return True
-        del area_change_result, img
-        time.sleep(2)
+            time.sleep(SWITCH_POLL_INTERVAL)
     # 超时未进入游戏主页面
     logger.error(f"星痕共鸣切换场景超过{area_change_timeout}秒限制 或者 被手动停止，请检查游戏状态！")
     return False
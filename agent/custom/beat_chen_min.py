@@ -1,4 +1,7 @@
+from __future__ import annotations
+
 import time
+from dataclasses import dataclass, field
 
 from maa.agent.agent_server import AgentServer
 from maa.context import Context
@@ -7,88 +10,120 @@ from maa.custom_action import CustomAction, RecognitionDetail
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
 from agent.constant.map_point import NAVIGATE_DATA
 from agent.custom.app_manage_action import wait_for_switch
-from agent.custom.general.general import ensure_main_page
-from agent.custom.general.power_saving_mode import exit_power_saving_mode
+from agent.custom.general.line_selector import CHEN_MIN, line_selector
+from agent.custom.general.precondition import ensure_ready
+from agent.custom.general.route_planner import location_tracker
 from agent.custom.general.world_line_switcher import switch_line
-from agent.custom.teleport_action import teleport_or_navigate
+from agent.custom.teleport_action import ARRIVAL_CONFIRM_TIMEOUT, teleport_or_navigate
 from agent.logger import logger
-from agent.utils.param_utils import CustomActionParam
+from agent.utils.checkpoint import Checkpoint, config_key
+from agent.utils.event_stream import counter, track_task
+from agent.utils.param_utils import ParamField, ParamSchema
+
+BEAT_CHEN_MIN_PARAMS = ParamSchema(
+    "BeatChenMinPoint",
+    ParamField("max_beat_count", int, default=0),
+)
+
+# 一轮小游戏的最长时间（秒） | 与原来的固定流程一致：走路 0.8 + 开场 10 + 攻击 15 + 等待 55
+ROUND_TIMEOUT = 81
+# 检测小游戏是否结束的间隔（秒）
+ROUND_POLL_INTERVAL = 1.0
+# 等待开场标志出现的最长时间（秒） | 超时后按原来的固定开场等待处理，直接开始攻击
+ROUND_START_TIMEOUT = 10
+# 连续多少次识别不到小游戏标志才算结束 | 防止 OCR 偶尔漏识别
+ROUND_END_CONFIRM = 2
+# 从断点恢复时检测是否已经在入口的时间（秒），检测不到再导航
+RESUME_ENTRY_TIMEOUT = 4
 
 
 @AgentServer.custom_action("BeatChenMinPoint")
 class BeatChenMinPointAction(CustomAction):
 
-    def __init__(self):
-        super().__init__()
-        self.beat_count = None
-        self.tried_count = None
-        self.is_first = None
-
-    @exit_power_saving_mode()
-    @ensure_main_page()
+    @track_task("BeatChenMinPoint")
+    @ensure_ready()
     def run(
         self,
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
         # 获取参数
-        self.beat_count = 0
-        self.tried_count = 0
-        self.is_first = True
-        params = CustomActionParam(argv.custom_action_param)
-        max_beat_count = int(params.data["max_beat_count"]) if params.data["max_beat_count"] else 0
+        max_beat_count = BEAT_CHEN_MIN_PARAMS.parse(argv.custom_action_param)["max_beat_count"]
         logger.info(f"本次任务设置的最大暴打次数: {max_beat_count if max_beat_count != 0 else '无限'}")
+        # 崩溃前的进度 | 继续计数并遵守最大暴打次数，已经尝试过的分线不再尝试
+        state = BeatChenRun.restore(Checkpoint(context, "BeatChenMinPoint", config_key(max_beat_count)))
+        round_times: list[float] = []
+        resumed = state.checkpoint.resumed
 
         while not context.tasker.stopping:
             # 检查是否已经暴打足够次数了
-            if max_beat_count != 0 and max_beat_count <= self.beat_count:
-                logger.info(f"已成功暴打了您所配置的{self.beat_count}次陈敏，暴打结束！")
+            if max_beat_count != 0 and max_beat_count <= state.beat_count:
+                logger.info(f"已成功暴打了您所配置的{state.beat_count}次陈敏，暴打结束！")
+                state.checkpoint.clear()
                 return True
 
-            # 先导航过去
-            teleport_or_navigate(context, "游星岛", "异次元惩戒", "导航", NAVIGATE_DATA)
+            if resumed and ensure_chen_entry(context, RESUME_ENTRY_TIMEOUT):
+                logger.info("上次中断前已经在暴打陈敏入口，跳过导航")
+            else:
+                # 先导航过去
+                teleport_or_navigate(context, "游星岛", "异次元惩戒", "导航", NAVIGATE_DATA,
+                                     confirm=lambda c: ensure_chen_entry(c, ARRIVAL_CONFIRM_TIMEOUT))
 
-            # 循环检测进入暴打陈敏的按钮
-            has_entry = ensure_chen_entry(context)
-            if not has_entry:
-                return False
+                # 循环检测进入暴打陈敏的按钮
+                has_entry = ensure_chen_entry(context)
+                if not has_entry:
+                    state.checkpoint.clear()
+                    return False
+            resumed = False
+            location_tracker.get(context).arrive()
 
             # 循环检测是否可进去暴打，不能就切线
-            self.ensure_can_beat_chen(context)
+            self.ensure_can_beat_chen(context, state)
+            round_start = time.monotonic()
 
             # 向前走几步
-            logger.info("向前走几步靠近陈敏，等待10秒后开始暴打3次")
+            logger.info("向前走几步靠近陈敏，等待开场后开始暴打3次")
             context.tasker.controller.post_key_down(ANDROID_KEY_EVENT_DATA["KEYCODE_W"]).wait()
             time.sleep(0.8)
             context.tasker.controller.post_key_up(ANDROID_KEY_EVENT_DATA["KEYCODE_W"]).wait()
+            location_tracker.get(context).left_point()
+
+            # 等待开场：异次元惩戒 标志出现就开始攻击，识别不到时等满原来的 10 秒
+            round_watcher = RoundWatcher(context)
+            if not round_watcher.wait_start(ROUND_START_TIMEOUT):
+                logger.debug("{} 秒内未识别到开场标志，按固定等待开始攻击", ROUND_START_TIMEOUT)
+
+            # 按几下攻击键，每次间隔5秒，期间小游戏结束就不再攻击
+            for _ in range(3):
+                context.tasker.controller.post_click(1122, 550, 1, 1).wait()
+                if round_watcher.wait_end(5):
+                    break
 
-            # 等待10秒
-            time.sleep(10)
-
-            # 按几下攻击键
-            context.tasker.controller.post_click(1122, 550, 1, 1).wait()
-            time.sleep(5)
-            context.tasker.controller.post_click(1122, 550, 1, 1).wait()
-            time.sleep(5)
-            context.tasker.controller.post_click(1122, 550, 1, 1).wait()
-            time.sleep(5)
-
-            # 等待55秒后开启下一轮暴打
-            logger.info("等待55秒暴打结束...")
-            wait_count = 0
-            while wait_count < 11 and not context.tasker.stopping:
-                wait_count += 1
-                time.sleep(5)
-            
-            self.beat_count += 1
+            # 等待暴打结束后开启下一轮暴打
+            logger.info("等待暴打结束...")
+            round_watcher.wait_end(ROUND_TIMEOUT - (time.monotonic() - round_start))
 
+            state.beat_count += 1
+            round_times.append(time.monotonic() - round_start)
+            logger.info(
+                "第 {} 轮暴打用时 {:.1f} 秒（{}）",
+                state.beat_count, round_times[-1], "检测到结束" if round_watcher.ended else "等待超时",
+            )
+            counter("BeatChenMinPoint", "round_seconds", round(round_times[-1], 1), ended=round_watcher.ended)
+            state.save()
+
+        if round_times:
+            average = sum(round_times) / len(round_times)
+            logger.info("暴打陈敏平均每轮用时 {:.1f} 秒，约每小时 {:.1f} 轮", average, 3600 / average)
         logger.warning("暴打陈敏已结束！")
+        state.checkpoint.clear()
         return True
 
-    def ensure_can_beat_chen(self, context: Context) -> bool:
+    @staticmethod
+    def ensure_can_beat_chen(context: Context, state: BeatChenRun) -> bool:
         """
         循环检测是否可进入暴打陈敏，不可进入则切线。
-        30~49 线全部尝试一轮，若都失败则返回 False。
+        30~59 线全部尝试一轮，若都失败则返回 False，尝试顺序按历史结果排序（见 line_selector）。
         """
         line_list = [
             "30", "31", "32", "33", "34", "35", "36", "37", "38", "39",
@@ -96,20 +131,14 @@ class BeatChenMinPointAction(CustomAction):
             "50", "51", "52", "53", "54", "55", "56", "57", "58", "59"
         ]
 
-        total_lines = len(line_list)
-
-        while self.tried_count < total_lines:
+        # 初始分线 + 每条分线最多一次
+        for _ in range(len(line_list) + 1):
             if context.tasker.stopping:
                 logger.warning("暴打陈敏检测已被手动停止")
                 return False
 
-            # 获取当前索引 和 尝试的分线
-            index = self.tried_count % total_lines
-            if self.is_first:
-                current_line = "初始"
-                self.is_first = False
-            else:
-                current_line = line_list[index]
+            # 当前尝试的分线 | 第一次是进入任务时所在的分线，可能未知
+            current_line = line_selector.current_line(context) or "初始"
             logger.info(f"准备在 {current_line} 分线尝试暴打陈敏")
 
             # 先点击进入按钮，并等待 6 秒看是否进入小游戏
@@ -117,26 +146,30 @@ class BeatChenMinPointAction(CustomAction):
             time.sleep(6)
 
             # 检测是否已经进入暴打陈敏游戏
-            if check_can_beat_chen(context):
+            can_beat = check_can_beat_chen(context)
+            line_selector.record_current(context, CHEN_MIN, can_beat)
+            if can_beat:
                 logger.info(f"检测到当前线路 {current_line} 已经进入暴打陈敏游戏")
                 return True
             else:
                 logger.info(f"当前线路 {current_line} 不可进入暴打陈敏，准备切线...")
+            state.tried_lines.add(current_line)
+            state.save()
 
-            # 当前的分线列表
-            need_switch_list = line_list[index:] + line_list[:index]
+            # 剩余未尝试的分线
+            need_switch_list = [line for line in line_list if line not in state.tried_lines]
+            if not need_switch_list:
+                break
             # 尝试切换分线
-            has_next = switch_line(context, need_switch_list)
+            has_next = switch_line(context, need_switch_list, CHEN_MIN)
             # 切换失败，通常表示已经在这条线了
             if not has_next:
                 break
 
             # 等待场景切换完成
             wait_for_switch(context)
-            # 尝试次数 + 1
-            self.tried_count += 1
 
-        logger.error("分线 30 至 49 线均无法进入暴打陈敏！")
+        logger.error("分线 30 至 59 线均无法进入暴打陈敏！")
         return False
 
 
@@ -164,10 +197,92 @@ def ensure_chen_entry(context: Context, timeout: int = 120) -> bool:
             return True
         del ocr_result, img
         time.sleep(2)
-    logger.error("超 120 秒未到达暴打陈敏的入口！")
+    logger.error(f"超 {timeout} 秒未到达暴打陈敏的入口！")
     return False
 
 
+@dataclass(slots=True)
+class BeatChenRun:
+    """
+    一次暴打陈敏运行的状态，在 run 中创建并传给各个步骤
+
+    Attributes:
+        checkpoint: 断点
+        beat_count: 已暴打次数
+        tried_lines: 已尝试过的分线
+    """
+
+    checkpoint: Checkpoint
+    beat_count: int = 0
+    tried_lines: set[str] = field(default_factory=set)
+
+    @classmethod
+    def restore(cls, checkpoint: Checkpoint) -> BeatChenRun:
+        """有崩溃前的进度时从断点恢复暴打次数和已尝试的分线"""
+        return cls(checkpoint, checkpoint.state.get("beat_count", 0), set(checkpoint.state.get("tried_lines", [])))
+
+    def save(self) -> None:
+        """保存暴打次数和已尝试的分线"""
+        self.checkpoint.save(beat_count=self.beat_count, tried_lines=sorted(self.tried_lines))
+
+
+class RoundWatcher:
+    """
+    一轮暴打陈敏小游戏的结束检测：小游戏进行中左侧会显示 异次元惩戒 标志，标志消失即本轮结束
+
+    只有识别到过标志之后才会判断结束，OCR 一直识别不到时退化为等待到超时，与原来的固定等待一致。
+    """
+
+    def __init__(self, context: Context) -> None:
+        self.context = context
+        self.seen = False
+        self.ended = False
+        self._misses = 0
+
+    def poll(self) -> bool:
+        """截图检测一次，返回本轮是否已经结束"""
+        if check_can_beat_chen(self.context):
+            self.seen = True
+            self._misses = 0
+        elif self.seen:
+            self._misses += 1
+            self.ended = self._misses >= ROUND_END_CONFIRM
+        return self.ended
+
+    def wait_start(self, timeout: float) -> bool:
+        """
+        在 timeout 秒内等待开场标志出现
+
+        Returns:
+            是否识别到了开场标志，未识别到时已经等满 timeout
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while not self.seen and not self.context.tasker.stopping:
+            self.poll()
+            remaining = deadline - time.monotonic()
+            if self.seen or remaining <= 0:
+                break
+            time.sleep(min(ROUND_POLL_INTERVAL, remaining))
+        return self.seen
+
+    def wait_end(self, timeout: float) -> bool:
+        """
+        在 timeout 秒内等待本轮结束
+
+        Returns:
+            本轮是否已经结束
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while not self.ended and not self.context.tasker.stopping:
+            if self.poll():
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(ROUND_POLL_INTERVAL, remaining))
+        return self.ended
+
+
 def check_can_beat_chen(context: Context) -> bool:
     """
     检测当前是否已经进入暴打陈敏游戏
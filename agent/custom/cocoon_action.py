@@ -1,21 +1,57 @@
 import time
+from collections import defaultdict
 
+import numpy
 from maa.agent.agent_server import AgentServer
 from maa.context import Context, RecognitionDetail
 from maa.custom_action import CustomAction
 
 from agent.attach.common_attach import get_need_cocoon_name
 from agent.constant.map_point import NAVIGATE_DATA
+from agent.custom.general.battle_supervisor import STOP_STOPPING, BattleSupervisor, revive_job
+from agent.custom.general.line_selector import COCOON
 from agent.custom.general.move_battle import mount_vehicle, auto_attack
 from agent.custom.general.power_saving_mode import exit_power_saving_mode
+from agent.custom.general.route_planner import location_tracker
 from agent.custom.general.world_line_switcher import switch_line
-from agent.custom.teleport_action import teleport_or_navigate
+from agent.custom.teleport_action import ARRIVAL_CONFIRM_TIMEOUT, teleport_or_navigate
 from agent.logger import logger
+from agent.utils.event_stream import counter, track_task
+
+# 茧流程的状态
+APPROACH = "approach"        # 前往茧的入口
+ENTER = "enter"              # 已点击进入，等待幻觉值出现
+FIGHTING = "fighting"        # 在茧中自动战斗积累幻觉值
+CHARGE_FULL = "charge_full"  # 幻觉值消失：积累满后被踢出
+EXIT = "exit"                # 已退出，等待入口按钮出现
+RELOCATE = "relocate"        # 找不到入口，传送后重新导航
+
+STATE_NAMES = {
+    APPROACH: "前往入口",
+    ENTER: "进入茧",
+    FIGHTING: "战斗",
+    CHARGE_FULL: "幻觉值已满",
+    EXIT: "已退出",
+    RELOCATE: "重新定位",
+}
+# 需要截图判断的状态每轮检测间隔（秒）
+TICK_INTERVALS = {ENTER: 2, FIGHTING: 10, EXIT: 2}
+# 战斗中复活检测的间隔（秒）
+REVIVE_INTERVAL = 10
+# 战斗监督中识别失败时的结束原因
+STOP_FAILED = "failed"
+# 点击进入后等待幻觉值出现的时间（秒），超时后重新找入口
+ENTER_TIMEOUT = 30
+# 退出后等待入口按钮出现的时间（秒），超时后重新定位
+EXIT_ENTRY_TIMEOUT = 10
+# 状态耗时汇总的日志间隔（秒）
+STATE_REPORT_INTERVAL = 60 * 60
 
 
 @AgentServer.custom_action("CocoonAction")
 class CocoonActionAction(CustomAction):
 
+    @track_task("CocoonAction")
     @exit_power_saving_mode()
     def run(
         self,
@@ -23,7 +59,7 @@ class CocoonActionAction(CustomAction):
         _,
     ) -> bool:
         """
-        幻觉值不为空 -> 确保自动战斗；幻觉值为空 -> 关闭自动战斗后识别进茧再开自动战斗
+        幻觉值不为空 -> 保持自动战斗；幻觉值为空 -> 关闭自动战斗后识别进茧再开自动战斗
 
         Args:
             context: 控制器上下文
@@ -32,76 +68,170 @@ class CocoonActionAction(CustomAction):
         Returns:
             任务执行结果
         """
-
         # 获取需要刷的茧的名字
         cocoon_name = get_need_cocoon_name(context)
+        return CocoonStateMachine(context, cocoon_name).run()
+
+
+class CocoonStateMachine:
+    """
+    刷茧状态机：前往入口 -> 进入茧 -> 战斗 -> 幻觉值已满 -> 已退出 -> 进入茧 ...，找不到入口时重新定位
+
+    截图判断的状态每轮只截一张图；自动战斗只在进入战斗 / 幻觉值已满时切换一次。
+    记录每个状态累计的时间，用于统计长时间挂机中真正在战斗的比例。
+    """
+
+    def __init__(self, context: Context, cocoon_name: str) -> None:
+        self.context = context
+        self.cocoon_name = cocoon_name
+        self.state = APPROACH
+        self.state_since = time.monotonic()
+        self.state_seconds: dict[str, float] = defaultdict(float)
+        self._last_report = self.state_since
+
+    def transition(self, state: str) -> None:
+        """切换状态，记录上一个状态的耗时，并执行进入新状态时的动作"""
+        now = time.monotonic()
+        elapsed = now - self.state_since
+        self.state_seconds[self.state] += elapsed
+        logger.info("[刷茧] {} -> {}（{:.0f} 秒）", STATE_NAMES[self.state], STATE_NAMES[state], elapsed)
+        counter("CocoonAction", "state_seconds", round(elapsed, 1), state=self.state)
+        self.state = state
+        self.state_since = now
+
+        if state == ENTER:
+            # 点击进入茧
+            self.context.tasker.controller.post_click(0, 0)  # TODO 进茧按钮坐标
+        elif state == FIGHTING:
+            auto_attack(self.context, attack_type=1)
+        elif state == CHARGE_FULL:
+            # 关闭自动战斗，防止在入口处乱打
+            auto_attack(self.context, attack_type=0)
+
+        if now - self._last_report >= STATE_REPORT_INTERVAL:
+            self._last_report = now
+            self.report()
+
+    def run(self) -> bool:
+        """执行状态机直到任务停止或者出现无法恢复的异常"""
+        try:
+            while not self.context.tasker.stopping:
+                if self.state == APPROACH:
+                    next_state = self.approach()
+                elif self.state == RELOCATE:
+                    next_state = self.relocate()
+                elif self.state == CHARGE_FULL:
+                    next_state = EXIT
+                elif self.state == FIGHTING:
+                    next_state = self.fight()
+                else:
+                    img: numpy.ndarray = self.context.tasker.controller.post_screencap().wait().get()
+                    next_state = self.judge(img)
+                    if next_state == self.state:
+                        time.sleep(TICK_INTERVALS[self.state])
+                if next_state is None:
+                    return False
+                if next_state != self.state:
+                    self.transition(next_state)
+            return True
+        finally:
+            self.state_seconds[self.state] += time.monotonic() - self.state_since
+            self.state_since = time.monotonic()
+            self.report()
+
+    def judge(self, img: numpy.ndarray) -> str | None:
+        """根据一张截图判断 进入茧 / 战斗 / 已退出 状态的下一个状态，None 表示无法继续"""
+        elapsed = time.monotonic() - self.state_since
+        if self.state == EXIT:
+            if check_cocoon_entry(self.context, img):
+                return ENTER
+            return RELOCATE if elapsed > EXIT_ENTRY_TIMEOUT else EXIT
+
+        # 进入茧 / 战斗：检测幻觉值
+        ocr_result: RecognitionDetail | None = self.context.run_recognition(
+            "通用文字识别",
+            img,
+            pipeline_override={
+                "通用文字识别": {
+                    "expected": "[0-9]+",
+                    "roi": [0, 0, 0, 0],  # TODO 幻觉值识别坐标
+                }
+            },
+        )
+        if not ocr_result:
+            return None
+        if self.state == ENTER:
+            if ocr_result.hit:
+                return FIGHTING
+            return EXIT if elapsed > ENTER_TIMEOUT else ENTER
+        # 战斗中幻觉值消失：积累满被踢出
+        return FIGHTING if ocr_result.hit else CHARGE_FULL
+
+    def fight(self) -> str | None:
+        """战斗中由战斗监督同时检测幻觉值和角色死亡，两者共用一张截图"""
+        supervisor = BattleSupervisor(self.context, "CocoonAction")
+        supervisor.add_job(self.charge_job, TICK_INTERVALS[FIGHTING], "charge", delay=TICK_INTERVALS[FIGHTING])
+        supervisor.add_job(revive_job, REVIVE_INTERVAL, "revive")
+        reason = supervisor.run()
+        if reason == STOP_STOPPING:
+            return FIGHTING
+        return None if reason == STOP_FAILED else reason
+
+    def charge_job(self, _context: Context, img: numpy.ndarray | None) -> str | None:
+        """战斗监督任务：幻觉值还在时继续战斗，否则以下一个状态结束监督"""
+        next_state = self.judge(img)  # type: ignore
+        if next_state == FIGHTING:
+            return None
+        return next_state or STOP_FAILED
+
+    def approach(self) -> str | None:
+        """首次前往茧的入口并切换到靠前的分线"""
         # 传送到目的位置
-        teleport_or_navigate(context, None, cocoon_name, "导航", NAVIGATE_DATA)
+        teleport_or_navigate(self.context, None, self.cocoon_name, "导航", NAVIGATE_DATA,
+                             confirm=lambda c: ensure_cocoon_entry(c, ARRIVAL_CONFIRM_TIMEOUT))
         # 点击按钮下马
-        mount_vehicle(context, mount_type=0)
-
+        mount_vehicle(self.context, mount_type=0)
         # 确保到达茧的入口
-        need_next = ensure_cocoon_entry(context)
-        if not need_next:
-            return False
-
+        if not ensure_cocoon_entry(self.context):
+            return None
+        location_tracker.get(self.context).arrive()
         # 尝试切换到一条靠前的分线
-        switch_line(context, ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"])
-
+        switch_line(self.context, ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"], COCOON)
         # 确保自动战斗关闭
-        auto_attack(context, attack_type=0)
-
-        # 点击进入茧
-        context.tasker.controller.post_click(0, 0)  # TODO 进茧按钮坐标
-        logger.info("初次进入茧，等待 5 秒后开始识别幻觉值并自动战斗")
-        time.sleep(5)
-
-        # 循环检测
-        while not context.tasker.stopping:
-            # 检测幻觉值
-            img = context.tasker.controller.post_screencap().wait().get()
-            ocr_result: RecognitionDetail | None = context.run_recognition(
-                "通用文字识别",
-                img,
-                pipeline_override={
-                    "通用文字识别": {
-                        "expected": "[0-9]+",
-                        "roi": [0, 0, 0, 0],  # TODO 幻觉值识别坐标
-                    }
-                },
-            )
-            if not ocr_result:
-                return False
+        auto_attack(self.context, attack_type=0)
+        return ENTER
+
+    def relocate(self) -> str | None:
+        """没有入口按钮，可能是位置发生偏移，尝试复位，战斗中不能导航，所以先传送再导航"""
+        location_tracker.get(self.context).left_point()
+        teleport_or_navigate(self.context, None, self.cocoon_name, "传送", NAVIGATE_DATA)
+        time.sleep(3)
+        teleport_or_navigate(self.context, None, self.cocoon_name, "导航", NAVIGATE_DATA)
+        # 确保到达茧的入口
+        if not ensure_cocoon_entry(self.context):
+            return None
+        location_tracker.get(self.context).arrive()
+        # 点击按钮下马
+        mount_vehicle(self.context, mount_type=0)
+        return ENTER
 
-            if ocr_result.hit:
-                # 有幻觉值，需要确保自动战斗还开着
-                auto_attack(context, attack_type=1)
-            else:
-                # 没有幻觉值，需要关闭自动战斗后识别进茧再开自动战斗
-                auto_attack(context, attack_type=0)
-                # 检测还有没有按钮
-                has_entry = ensure_cocoon_entry(context, 10)
-                if has_entry:
-                    # 点击进入茧
-                    context.tasker.controller.post_click(0, 0)  # TODO 进茧按钮坐标
-                else:
-                    # 没有按钮，可能是位置发生偏移，尝试复位，战斗中不能导航，所以先传送
-                    teleport_or_navigate(context, None, cocoon_name, "传送", NAVIGATE_DATA)
-                    time.sleep(3)
-                    # 再进行导航
-                    teleport_or_navigate(context, None, cocoon_name, "导航", NAVIGATE_DATA)
-                    # 确保到达茧的入口
-                    need_next = ensure_cocoon_entry(context)
-                    if not need_next:
-                        return False
-                    # 击按钮下马
-                    mount_vehicle(context, mount_type=0)
-                    # 点击进入茧
-                    context.tasker.controller.post_click(0, 0)  # TODO 进茧按钮坐标
-            # 10秒检查一次
-            logger.info("已再次进入茧，等待 10 秒后开始识别幻觉值并自动战斗")
-            time.sleep(10)
-        return True
+    def report(self) -> None:
+        """输出各状态累计耗时和战斗时间占比"""
+        total = sum(self.state_seconds.values())
+        if not total:
+            return
+        detail = "，".join(
+            f"{STATE_NAMES[state]} {seconds / 60:.1f} 分钟" for state, seconds in self.state_seconds.items()
+        )
+        productive = self.state_seconds.get(FIGHTING, 0.0) / total
+        logger.info("[刷茧] 累计 {:.1f} 小时，战斗时间占比 {:.1%}：{}", total / 3600, productive, detail)
+        counter("CocoonAction", "productive_ratio", round(productive, 4), hours=round(total / 3600, 2))
+
+
+def check_cocoon_entry(context: Context, img: numpy.ndarray) -> bool:
+    """在已有截图中检测茧的入口按钮"""
+    is_arrive: RecognitionDetail | None = context.run_recognition("检测是否到达茧的入口", img)
+    return bool(is_arrive and is_arrive.hit)
 
 
 def ensure_cocoon_entry(context: Context, timeout: int = 120) -> bool:
@@ -112,12 +242,11 @@ def ensure_cocoon_entry(context: Context, timeout: int = 120) -> bool:
     while elapsed_time <= timeout and not context.tasker.stopping:
         elapsed_time = time.time() - start_time
         img = context.tasker.controller.post_screencap().wait().get()
-        is_arrive = context.run_recognition("检测是否到达茧的入口", img)
-        if is_arrive and is_arrive.hit:
-            del is_arrive, img
+        if check_cocoon_entry(context, img):
+            del img
             logger.info(f"检测到已经到达茧的入口！")
             return True
-        del is_arrive, img
+        del img
         time.sleep(2)
-    logger.error("超 120 秒未到达茧的入口！")
+    logger.error(f"超 {timeout} 秒未到达茧的入口！")
     return False
@@ -6,8 +6,34 @@ from maa.context import Context, RecognitionDetail
 from maa.custom_action import CustomAction
 
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
+from agent.custom.general.route_planner import location_tracker
 from agent.logger import logger
-from agent.utils.param_utils import CustomActionParam, CustomActionParamError
+from agent.utils.param_utils import CustomActionParamError, ParamField, ParamSchema
+
+RUN_PIPELINE_NODE_PARAMS = ParamSchema(
+    "run_pipeline_node",
+    ParamField("pipeline_node_name", str),
+)
+DECISION_ROUTER_PARAMS = ParamSchema(
+    "decision_router",
+    ParamField("judge_node", str),
+    ParamField("success_node", str),
+    ParamField("failure_node", str),
+)
+WAIT_X_SECONDS_PARAMS = ParamSchema(
+    "wait_x_seconds",
+    ParamField("wait_seconds", int),
+)
+RUN_CUSTOM_ACTIONS_SERIES_PARAMS = ParamSchema(
+    "run_custom_actions_series",
+    ParamField("actions", list, item_type=str),
+    ParamField("interval", int, default=1000),
+)
+MOVE_WSAD_PARAMS = ParamSchema(
+    "move_wsad",
+    ParamField("direction", str, choices=("前", "后", "左", "右")),
+    ParamField("millisecond", int),
+)
 
 
 # 运行任务流水线任务
@@ -18,13 +44,13 @@ class RunTaskPipelineAction(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        params: CustomActionParam | None = None
         pipeline_node_name = ""
         try:
-            params = CustomActionParam(argv.custom_action_param)
-            required = params.require(["pipeline_node_name"])
-            pipeline_node_name = required["pipeline_node_name"]
+            params = RUN_PIPELINE_NODE_PARAMS.parse(argv.custom_action_param)
+            pipeline_node_name = params["pipeline_node_name"]
             logger.info(f"pipeline_node_name: {pipeline_node_name}")
+            # pipeline 节点中可能有移动角色的动作，之后不再信任记录的位置
+            location_tracker.get(context).invalidate()
             context.run_task(entry=pipeline_node_name)
             logger.success(f"run pipeline node {pipeline_node_name} success")
             return True
@@ -33,8 +59,6 @@ class RunTaskPipelineAction(CustomAction):
             return False
         except Exception as exc:  # pragma: no cover - 运行时保护
             stack_trace = traceback.format_exc()
-            if not pipeline_node_name and params:
-                pipeline_node_name = params.data.get("pipeline_node_name", "")
             logger.exception(
                 f"run pipeline node {pipeline_node_name} failed, error: {exc}\n{stack_trace}",
             )
@@ -60,10 +84,9 @@ class DecisionRouterAction(CustomAction):
         Returns:
             CustomAction.RunResult: 运行结果
         """
-        logger.debug(f"argv: {argv}")
+        logger.debug("argv: {}", argv)
         try:
-            parser = CustomActionParam(argv.custom_action_param)
-            params = parser.require(("judge_node", "success_node", "failure_node"))
+            params = DECISION_ROUTER_PARAMS.parse(argv.custom_action_param)
         except CustomActionParamError as exc:
             logger.error(f"[DecisionRouterAction] 参数解析失败: {exc}")
             return CustomAction.RunResult(success=False)
@@ -88,17 +111,17 @@ class DecisionRouterAction(CustomAction):
             entry=judge_node,
             image=argv.reco_detail.raw_image,
         )
-        logger.debug(f"[DecisionRouterAction] judge_detail: {judge_detail}")
+        logger.debug("[DecisionRouterAction] judge_detail: {}", judge_detail)
         # 匹配失败的话 RecognitionDetail.hit: bool 会是 False
         judge_succeeded = judge_detail and judge_detail.hit
 
         target_node = success_node if judge_succeeded else failure_node
-        logger.debug(f"[DecisionRouterAction] target_node: {target_node}")
+        logger.debug("[DecisionRouterAction] target_node: {}", target_node)
         if not target_node:
             logger.warning("[DecisionRouterAction] 目标节点为空")
             return CustomAction.RunResult(success=False)
 
-        logger.debug(f"argv.node_name: {argv.node_name}")
+        logger.debug("argv.node_name: {}", argv.node_name)
         current_node = argv.node_name
         # override_result = context.override_pipeline({argv.node_name: {"next": [target_node]}})
         # override_result = context.override_next(argv.node_name, [target_node])
@@ -124,12 +147,10 @@ class WaitXSecondsAction(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        params: CustomActionParam | None = None
         wait_seconds = 0
         try:
-            params = CustomActionParam(argv.custom_action_param)
-            required = params.require(["wait_seconds"])
-            wait_seconds = int(required["wait_seconds"])
+            params = WAIT_X_SECONDS_PARAMS.parse(argv.custom_action_param)
+            wait_seconds = params["wait_seconds"]
             total = max(0, wait_seconds)
             if total <= 0:
                 logger.warning("等待秒数 <= 0，跳过等待")
@@ -176,8 +197,6 @@ class WaitXSecondsAction(CustomAction):
             return False
         except Exception as exc:  # pragma: no cover - 运行时保护
             stack_trace = traceback.format_exc()
-            if params:
-                wait_seconds = params.data.get("wait_seconds", 0)
             logger.exception(
                 f"WaitXSecondsAction 等待 {wait_seconds} 秒失败, 错误: {exc}\n{stack_trace}",
             )
@@ -192,16 +211,14 @@ class RunCustomActionsSeriesAction(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        params: CustomActionParam | None = None
-        actions: list[str] = []
+        actions: tuple[str, ...] = ()
         interval: int = 1000  # 默认动作衔接等待时间为1000毫秒
         try:
-            params = CustomActionParam(argv.custom_action_param)
-            required = params.require(["actions", "interval"])
-            actions = required["actions"]
-            interval = int(required["interval"])
+            params = RUN_CUSTOM_ACTIONS_SERIES_PARAMS.parse(argv.custom_action_param)
+            actions = params["actions"]
+            interval = params["interval"]
             logger.debug(
-                f"Running custom actions series: {actions} with interval {interval} ms"
+                "Running custom actions series: {} with interval {} ms", actions, interval
             )
 
             for action_name in actions:
@@ -215,9 +232,6 @@ class RunCustomActionsSeriesAction(CustomAction):
             return False
         except Exception as exc:  # pragma: no cover - 运行时保护
             stack_trace = traceback.format_exc()
-            if params:
-                actions = params.data.get("actions", [])
-                interval = params.data.get("interval", 1000)
             logger.exception(
                 f"RunCustomActionsSeriesAction 运行自定义动作系列 {actions} 失败，间隔 {interval} 秒，错误: {exc}\n{stack_trace}",
             )
@@ -232,14 +246,12 @@ class MoveWSADAction(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        params: CustomActionParam | None = None
         direction: str = ""
         millisecond: int = 0
         try:
-            params = CustomActionParam(argv.custom_action_param)
-            required = params.require(["direction", "millisecond"])
-            direction = required["direction"]
-            millisecond = int(required["millisecond"])
+            params = MOVE_WSAD_PARAMS.parse(argv.custom_action_param)
+            direction = params["direction"]
+            millisecond = params["millisecond"]
 
             key_map = {
                 "前": "KEYCODE_W",
@@ -253,9 +265,10 @@ class MoveWSADAction(CustomAction):
                 raise ValueError(f"Invalid direction: {direction}")
 
             logger.debug(
-                f"尝试向{direction}移动 {millisecond} 毫秒, key_code: {key_code}, duration: {millisecond} ms"
+                "尝试向{}移动 {} 毫秒, key_code: {}, duration: {} ms", direction, millisecond, key_code, millisecond
             )
-            # 按下按键millisecond毫秒后松开
+            # 按下按键millisecond毫秒后松开，角色离开了记录的位置
+            location_tracker.get(context).invalidate()
             context.run_task(
                 entry="按住W键1秒",
                 pipeline_override={
@@ -274,9 +287,6 @@ class MoveWSADAction(CustomAction):
             return False
         except Exception as exc:  # pragma: no cover - 运行时保护
             stack_trace = traceback.format_exc()
-            if params:
-                direction = params.data.get("direction", "")
-                millisecond = params.data.get("millisecond", 0)
             logger.exception(
                 f"MoveWSADAction 移动 {direction} {millisecond} 毫秒失败, 错误: {exc}\n{stack_trace}",
             )
@@ -1,5 +1,8 @@
+from __future__ import annotations
+
 import re
 import time
+from dataclasses import dataclass
 
 import numpy
 from maa.agent.agent_server import AgentServer
@@ -10,17 +13,93 @@ from agent.attach.common_attach import get_restart_for_except, get_max_restart_c
     get_fish_navigation
 from agent.constant.fish import FISH_LIST
 from agent.constant.map_point import NAVIGATE_DATA
-from agent.custom.app_manage_action import restart_and_login_xhgm, wait_for_switch
-from agent.custom.general.ad_close import close_ad
+from agent.constant.ocr_confusion import OCR_CONFUSION
+from agent.custom.app_manage_action import LOADING, LoginStateMachine, restart_and_login_xhgm
 from agent.custom.general.general import default_ensure_main_page
+from agent.custom.general.route_planner import location_tracker
+from agent.custom.general.line_selector import FISHING, line_selector
 from agent.custom.general.world_line_switcher import switch_line
-from agent.custom.teleport_action import teleport_or_navigate
+from agent.custom.teleport_action import ARRIVAL_CONFIRM_TIMEOUT, teleport_or_navigate
 from agent.logger import logger
-from agent.utils.fuzzy_utils import get_best_match_single
+from agent.utils.checkpoint import Checkpoint, config_key
+from agent.utils.event_stream import counter, recognition, recovery, track_task
+from agent.utils.fuzzy_utils import FuzzyIndex
 from agent.utils.other_utils import print_center_block
-from agent.utils.param_utils import CustomActionParam
+from agent.utils.param_utils import ParamField, ParamSchema
+from agent.utils.progress_watchdog import ProgressWatch, progress_watchdog
 from agent.utils.time_utlls import format_seconds_to_hms
 
+AUTO_FISHING_PARAMS = ParamSchema(
+    "AutoFishing",
+    ParamField("max_success_fishing_count", int, default=0),
+)
+
+# 看门狗在没有学习到进度间隔时的卡住判定窗口（秒）
+# 每轮准备阶段：环境检查和购买配件不参与判断，剩下的只有固定等待
+CYCLE_STALL_WINDOW = 60
+# 等待咬钩：与原来的 30 秒超时一致
+BITE_STALL_WINDOW = 30
+# 从断点恢复时检测是否还在钓鱼点入口的时间（秒），检测不到再导航
+RESUME_ENTRY_TIMEOUT = 4
+
+# 鱼鱼稀有度 / 名称的模糊匹配索引 | 候选列表固定，只构建一次
+FISH_RARITY_INDEX = FuzzyIndex(["常见", "珍稀", "神话"], normalizer=OCR_CONFUSION.canonicalize)
+FISH_NAME_INDEX = FuzzyIndex(FISH_LIST, normalizer=OCR_CONFUSION.canonicalize)
+
+
+# 写入断点的计数字段
+FISHING_COUNTERS = (
+    "fishing_count", "success_fishing_count", "except_count", "ssr_fish_count", "sr_fish_count",
+    "r_fish_count", "used_rod_count", "used_bait_count", "restart_count",
+)
+
+
+@dataclass(slots=True)
+class FishingRun:
+    """
+    一次自动钓鱼运行的状态，在 run 中创建并传给各个步骤
+
+    Attributes:
+        watch: 进度看门狗
+        start_time: 起始钓鱼时间
+        fishing_count: 累计钓鱼次数
+        success_fishing_count: 成功钓鱼次数
+        except_count: 出现意外次数
+        ssr_fish_count: 神话鱼
+        sr_fish_count: 珍稀鱼
+        r_fish_count: 常见鱼
+        used_rod_count: 消耗的鱼竿数量
+        used_bait_count: 消耗的鱼饵数量
+        restart_count: 重启游戏次数
+    """
+
+    watch: ProgressWatch
+    start_time: float
+    fishing_count: int = 0
+    success_fishing_count: int = 0
+    except_count: int = 0
+    ssr_fish_count: int = 0
+    sr_fish_count: int = 0
+    r_fish_count: int = 0
+    used_rod_count: int = 0
+    used_bait_count: int = 0
+    restart_count: int = 0
+
+    @classmethod
+    def restore(cls, saved: dict, watch: ProgressWatch) -> FishingRun:
+        """由断点中保存的进度创建，没有断点时从零开始"""
+        return cls(
+            watch,
+            time.time() - saved.get("elapsed", 0),
+            **{name: saved.get(name, 0) for name in FISHING_COUNTERS},
+        )
+
+    def snapshot(self) -> dict:
+        """需要写入断点的进度"""
+        result = {name: getattr(self, name) for name in FISHING_COUNTERS}
+        result["elapsed"] = round(time.time() - self.start_time)
+        return result
+
 
 # 自动钓鱼任务
 @AgentServer.custom_action("AutoFishing")
@@ -28,27 +107,14 @@ class AutoFishingAction(CustomAction):
 
     def __init__(self):
         super().__init__()
-        # 初始变量
-        self.fishing_start_time = None
-        self.fishing_count = None
-        self.success_fishing_count = None
-        self.except_count = None
-        self.ssr_fish_count = None
-        self.sr_fish_count = None
-        self.r_fish_count = None
-        self.used_rod_count = None
-        self.used_bait_count = None
-        self.restart_count = None
+        # 运行状态都在 run 中创建的 FishingRun 里，动作实例只保存常量，可以被多个控制器同时使用
 
         # 收竿触控通道常量
         self.REEL_IN_CONTACT = 0
         # 方向触控通道常量
         self.BOWING_CONTACT = 1
-        # 鱼鱼稀有度列表
-        self.FISH_RARITY_LIST = ["常见", "珍稀", "神话"]
-        # 鱼鱼名称列表
-        self.FISH_NAME_LIST = FISH_LIST
 
+    @track_task("AutoFishing")
     def run(
         self,
         context: Context,
@@ -73,174 +139,197 @@ class AutoFishingAction(CustomAction):
         logger.warning(f"!!! 即将开始钓鱼，建议根据文档选择合适的钓鱼点 !!!")
 
         # 获取参数
-        params = CustomActionParam(argv.custom_action_param)
-        max_success_fishing_count = int(params.data["max_success_fishing_count"]) if params.data["max_success_fishing_count"] else 0
+        max_success_fishing_count = AUTO_FISHING_PARAMS.parse(argv.custom_action_param)["max_success_fishing_count"]
         # 获取是否重启游戏参数
         restart_for_except = get_restart_for_except(context)
         # 获取最大重启游戏次数限制参数
         max_restart_count = get_max_restart_count(context)
         # 获取自动钓鱼去的导航位置
         fish_navigation = get_fish_navigation(context)
+        # 崩溃前的进度 | 配置不变时继续计数，已经到达钓鱼点就不再导航
+        checkpoint = Checkpoint(context, "AutoFishing", config_key(max_success_fishing_count, fish_navigation))
         if fish_navigation == "不导航":
             logger.info(f"本次自动钓鱼不需要导航，即原地钓鱼")
+        elif checkpoint.state.get("arrived") and self.ensure_fish_entry(context, RESUME_ENTRY_TIMEOUT):
+            # 崩溃时经常伴随游戏或模拟器重启，只有画面上还在钓鱼点入口才跳过导航
+            logger.info("上次中断前已经到达钓鱼点，跳过导航")
         else:
-            teleport_or_navigate(context, None, fish_navigation, "导航", NAVIGATE_DATA)  # TODO 钓鱼点位置未录入
+            teleport_or_navigate(context, None, fish_navigation, "导航", NAVIGATE_DATA,  # TODO 钓鱼点位置未录入
+                                 confirm=lambda c: self.ensure_fish_entry(c, ARRIVAL_CONFIRM_TIMEOUT))
             # 确保到达钓鱼点入口
             has_entry = self.ensure_fish_entry(context)
             if not has_entry:
+                checkpoint.clear()
                 return False
+            location_tracker.get(context).arrive()
         # 打印参数信息
         logger.info(f"本次任务设置的最大钓到的鱼鱼数量: {max_success_fishing_count if max_success_fishing_count != 0 else '无限'}")
         logger.info(f"如遇到不可恢复异常，是否重启游戏: {'是' if restart_for_except else '否'}")
         logger.info(f"最大重启游戏次数限制: {max_restart_count}")
         
-        # 起始钓鱼时间
-        self.fishing_start_time = time.time()
-        # 累计钓鱼次数
-        self.fishing_count = 0
-        # 成功钓鱼次数
-        self.success_fishing_count = 0
-        # 出现意外次数
-        self.except_count = 0
-        # 神话鱼
-        self.ssr_fish_count = 0
-        # 珍稀鱼
-        self.sr_fish_count = 0
-        # 常见鱼
-        self.r_fish_count = 0
-        # 消耗的鱼竿数量
-        self.used_rod_count = 0
-        # 消耗的鱼饵数量
-        self.used_bait_count = 0
-        # 重启游戏次数
-        self.restart_count = 0
-
-        # 开始钓鱼循环
-        while self.check_running(context):
-            # 检查是否已经钓到足够数量的鱼鱼了
-            if max_success_fishing_count != 0 and max_success_fishing_count <= self.success_fishing_count:
-                logger.info(f"[任务结束] 已成功钓到了您所配置的{self.success_fishing_count}条鱼鱼，自动钓鱼结束！")
-                return True
+        # 本次运行的状态 | 从断点恢复计数，咬钩等待和收线中画面卡住时由看门狗提前结束，回到环境检查处理
+        # 退出循环（包括异常）时结束监视
+        with progress_watchdog.watch(
+            "AutoFishing", on_stall=lambda idle: recovery("AutoFishing", "stall", idle=round(idle, 1))
+        ) as watch:
+            state = FishingRun.restore(checkpoint.state, watch)
+
+            # 开始钓鱼循环
+            while self.check_running(context):
+                # 每轮开始时保存上一轮结束后的进度
+                checkpoint.save(arrived=fish_navigation != "不导航", **state.snapshot())
+                state.watch.set_phase("cycle", CYCLE_STALL_WINDOW)
+                state.watch.beat("counter", state.fishing_count)
+                # 检查是否已经钓到足够数量的鱼鱼了
+                if max_success_fishing_count != 0 and max_success_fishing_count <= state.success_fishing_count:
+                    logger.info(f"[任务结束] 已成功钓到了您所配置的{state.success_fishing_count}条鱼鱼，自动钓鱼结束！")
+                    checkpoint.clear()
+                    return True
             
-            self.fishing_count += 1
-            # 打印当前钓鱼统计信息
-            delta_time = time.time() - self.fishing_start_time
-            success_rate = (self.success_fishing_count / max(1, self.fishing_count - 1 - self.except_count) * 100) if self.fishing_count > 1 else 0.0
-            exception_rate = (self.except_count / (self.fishing_count - 1) * 100) if self.fishing_count > 1 else 0.0
-            avg_fish_per_rod = self.success_fishing_count / (self.used_rod_count + 1)
-            print_center_block([
-                f"累计进行 {self.fishing_count - 1} 次自动钓鱼 / 耗时 {format_seconds_to_hms(delta_time)}",
-                f"成功钓上 {self.success_fishing_count} 只 => 神话{self.ssr_fish_count}只 / 珍稀{self.sr_fish_count}只 / 常见{self.r_fish_count}只",
-                f"每条鱼鱼平均耗时 => {round(delta_time / max(1, self.success_fishing_count), 1)} 秒",
-                f"消耗配件 => {self.used_rod_count}个鱼竿 / {self.used_bait_count}个鱼饵",
-                f"每个鱼竿平均可钓 => {round(avg_fish_per_rod, 1)} 条鱼",
-                f"钓鱼成功率 => {round(success_rate, 1)}% / 可恢复异常率：{round(exception_rate, 1)}%"
-            ])
+                state.fishing_count += 1
+                counter("AutoFishing", "fishing_count", state.fishing_count)
+                # 打印当前钓鱼统计信息 | 日志级别不输出 INFO 时不生成
+                print_center_block(lambda: self.stats_lines(state))
             
-            # 1.1 直接点击一下指定位置 | 可以直接解决月卡和省电模式问题
-            context.tasker.controller.post_click(640, 10).wait()
-            time.sleep(1)
-
-            # 2. 环境检查
-            env_check_result = self.env_check(context, restart_for_except, max_restart_count)
-            if env_check_result == -1:
-                logger.error("[任务结束] 自动钓鱼环境检查出现无法重试错误，结束任务")
-                return False
-            elif env_check_result > 0:
-                # 等待指定时间后继续下一次循环
-                time.sleep(env_check_result)
-                continue
-            else:
-                # 环境检查通过，等待1秒继续钓鱼流程
+                # 1.1 直接点击一下指定位置 | 可以直接解决月卡和省电模式问题
+                context.tasker.controller.post_click(640, 10).wait()
                 time.sleep(1)
 
-            # 3.1 检测配件：鱼竿
-            self.ensure_equipment(
-                context,
-                "鱼竿",
-                add_task="检测是否需要添加鱼竿",
-                add_action="点击添加鱼竿",
-                buy_task="检测是否需要购买鱼竿",
-                buy_action_prefix=[
-                    "点击前往购买鱼竿页面"
-                ],
-                buy_action_suffix=[
-                    "点击钓鱼配件购买按钮"
-                ],
-                use_action="点击使用鱼竿"
-            )
+                # 2. 环境检查
+                # 环境检查中的重连 / 重启有自己的超时保护
+                with state.watch.suspend():
+                    env_check_result = self.env_check(context, state, restart_for_except, max_restart_count)
+                if env_check_result == -1:
+                    logger.error("[任务结束] 自动钓鱼环境检查出现无法重试错误，结束任务")
+                    checkpoint.clear()
+                    return False
+                elif env_check_result > 0:
+                    # 等待指定时间后继续下一次循环
+                    time.sleep(env_check_result)
+                    continue
+                else:
+                    # 环境检查通过，等待1秒继续钓鱼流程
+                    time.sleep(1)
+
+                # 购买配件会执行较长的 pipeline，不参与卡住判断
+                with state.watch.suspend():
+                    # 3.1 检测配件：鱼竿
+                    self.ensure_equipment(
+                        context,
+                        state,
+                        "鱼竿",
+                        add_task="检测是否需要添加鱼竿",
+                        add_action="点击添加鱼竿",
+                        buy_task="检测是否需要购买鱼竿",
+                        buy_action_prefix=[
+                            "点击前往购买鱼竿页面"
+                        ],
+                        buy_action_suffix=[
+                            "点击钓鱼配件购买按钮"
+                        ],
+                        use_action="点击使用鱼竿"
+                    )
+
+                    # 3.2 检测配件：鱼饵
+                    self.ensure_equipment(
+                        context,
+                        state,
+                        "鱼饵",
+                        add_task="检测是否需要添加鱼饵",
+                        add_action="点击添加鱼饵",
+                        buy_task="检测是否需要购买鱼饵",
+                        buy_action_prefix=[
+                            "点击前往购买鱼饵页面"
+                        ],
+                        buy_action_suffix=[
+                            "点击钓鱼配件最大数量按钮",
+                            "点击钓鱼配件购买按钮",
+                            "点击确认购买按钮"
+                        ],
+                        use_action="点击使用鱼饵"
+                    )
+
+                # 4. 开始抛竿
+                logger.info("[任务准备] 开始抛竿，等待鱼鱼咬钩...")
+                context.run_action("点击抛竿按钮")
+                time.sleep(1)
 
-            # 3.2 检测配件：鱼饵
-            self.ensure_equipment(
-                context,
-                "鱼饵",
-                add_task="检测是否需要添加鱼饵",
-                add_action="点击添加鱼饵",
-                buy_task="检测是否需要购买鱼饵",
-                buy_action_prefix=[
-                    "点击前往购买鱼饵页面"
-                ],
-                buy_action_suffix=[
-                    "点击钓鱼配件最大数量按钮",
-                    "点击钓鱼配件购买按钮",
-                    "点击确认购买按钮"
-                ],
-                use_action="点击使用鱼饵"
-            )
-            
-            # 4. 开始抛竿
-            logger.info("[任务准备] 开始抛竿，等待鱼鱼咬钩...")
-            context.run_action("点击抛竿按钮")
-            time.sleep(1)
+                # 5. 检测鱼鱼是否咬钩 | 检测30秒，检测时间长，如果有中断命令就直接结束
+                need_next = True  # 是否需要进行下一步 | 不需要就是被手动终止任务了
+                wait_for_fish_times = 0
+                stalled = False
+                state.watch.set_phase("bite", BITE_STALL_WINDOW)
+                while wait_for_fish_times < 60:
+                    if not self.check_running(context):
+                        need_next = False
+                        break
+                    if state.watch.take_stall():
+                        stalled = True
+                        break
+                    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+                    state.watch.frame(img)
+                    is_hooked: RecognitionDetail | None = context.run_recognition("检测鱼鱼是否咬钩", img)
+                    if is_hooked and is_hooked.hit:
+                        del is_hooked, img
+                        logger.info("[执行钓鱼] 鱼鱼咬钩了！")
+                        self.click_reel(context)
+                        break
+                    time.sleep(0.4)
+                    wait_for_fish_times += 1
+                # 画面卡住 / 超时还没检测到鱼鱼咬钩 | 重新开始检测环境
+                if stalled:
+                    logger.info("[执行钓鱼] 等待咬钩时画面没有变化，将重新开始环境检测")
+                    continue
+                if wait_for_fish_times >= 60:
+                    logger.info("[执行钓鱼] 超过30秒未检测到鱼鱼咬钩，将重新开始环境检测")
+                    recovery("AutoFishing", "bite_timeout")
+                    continue
+                # 30秒检测内如果没有下一次了，说明钓鱼被强制结束了
+                if not need_next:
+                    break
 
-            # 5. 检测鱼鱼是否咬钩 | 检测30秒，检测时间长，如果有中断命令就直接结束
-            need_next = True  # 是否需要进行下一步 | 不需要就是被手动终止任务了
-            wait_for_fish_times = 0
-            while wait_for_fish_times < 60:
-                if not self.check_running(context):
-                    need_next = False
+                # 6. 开始收线循环
+                need_next = self.reel_loop(context, state)
+                # 没有下一次了，说明钓鱼被强制结束了
+                if not need_next:
                     break
+                time.sleep(3)
+
+                # 7.1 本次钓鱼完成，检测并点击继续钓鱼按钮进行第二次钓鱼
                 img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-                is_hooked: RecognitionDetail | None = context.run_recognition("检测鱼鱼是否咬钩", img)
-                if is_hooked and is_hooked.hit:
-                    del is_hooked, img
-                    logger.info("[执行钓鱼] 鱼鱼咬钩了！")
-                    self.click_reel(context)
-                    break
-                time.sleep(0.4)
-                wait_for_fish_times += 1
-            # 超时还没检测到鱼鱼咬钩 | 重新开始检测环境
-            if wait_for_fish_times >= 60:
-                logger.info("[执行钓鱼] 超过30秒未检测到鱼鱼咬钩，将重新开始环境检测")
-                continue
-            # 30秒检测内如果没有下一次了，说明钓鱼被强制结束了
-            if not need_next:
-                break
-
-            # 6. 开始收线循环
-            need_next = self.reel_loop(context)
-            # 没有下一次了，说明钓鱼被强制结束了
-            if not need_next:
-                break
-            time.sleep(3)
-
-            # 7.1 本次钓鱼完成，检测并点击继续钓鱼按钮进行第二次钓鱼
-            img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-            is_continue_fishing: RecognitionDetail | None = context.run_recognition("检测继续钓鱼", img)
-            if is_continue_fishing and is_continue_fishing.hit:
-                self.success_fishing_count += 1
-                # 检查钓鱼结果
-                self.check_fishing_result(context, img)
-                time.sleep(1.5)
-                # 点击继续钓鱼按钮
-                context.run_action("点击继续钓鱼按钮")
-            else:
-                logger.info(f"[钓鱼结果] 鱼鱼跑掉了...")
-            del is_continue_fishing, img
-            time.sleep(1)
+                is_continue_fishing: RecognitionDetail | None = context.run_recognition("检测继续钓鱼", img)
+                recognition("AutoFishing", "检测继续钓鱼", bool(is_continue_fishing and is_continue_fishing.hit))
+                if is_continue_fishing and is_continue_fishing.hit:
+                    state.success_fishing_count += 1
+                    # 检查钓鱼结果
+                    self.check_fishing_result(context, state, img)
+                    time.sleep(1.5)
+                    # 点击继续钓鱼按钮
+                    context.run_action("点击继续钓鱼按钮")
+                else:
+                    logger.info(f"[钓鱼结果] 鱼鱼跑掉了...")
+                del is_continue_fishing, img
+                time.sleep(1)
 
-        logger.warning("[任务结束] 自动钓鱼已结束！")
-        return True
+            logger.warning("[任务结束] 自动钓鱼已结束！")
+            checkpoint.clear()
+            return True
+
+    @staticmethod
+    def stats_lines(state: FishingRun) -> list[str]:
+        """当前钓鱼统计信息，每轮开始时打印"""
+        delta_time = time.time() - state.start_time
+        success_rate = (state.success_fishing_count / max(1, state.fishing_count - 1 - state.except_count) * 100) if state.fishing_count > 1 else 0.0
+        exception_rate = (state.except_count / (state.fishing_count - 1) * 100) if state.fishing_count > 1 else 0.0
+        avg_fish_per_rod = state.success_fishing_count / (state.used_rod_count + 1)
+        return [
+            f"累计进行 {state.fishing_count - 1} 次自动钓鱼 / 耗时 {format_seconds_to_hms(delta_time)}",
+            f"成功钓上 {state.success_fishing_count} 只 => 神话{state.ssr_fish_count}只 / 珍稀{state.sr_fish_count}只 / 常见{state.r_fish_count}只",
+            f"每条鱼鱼平均耗时 => {round(delta_time / max(1, state.success_fishing_count), 1)} 秒",
+            f"消耗配件 => {state.used_rod_count}个鱼竿 / {state.used_bait_count}个鱼饵",
+            f"每个鱼竿平均可钓 => {round(avg_fish_per_rod, 1)} 条鱼",
+            f"钓鱼成功率 => {round(success_rate, 1)}% / 可恢复异常率：{round(exception_rate, 1)}%"
+        ]
 
     @staticmethod
     def ensure_fish_entry(context: Context, timeout: int = 120) -> bool:
@@ -258,12 +347,13 @@ class AutoFishingAction(CustomAction):
                 return True
             del fishing_result, img
             time.sleep(2)
-        logger.error("超 120 秒未到达钓鱼点入口！")
+        logger.error(f"超 {timeout} 秒未到达钓鱼点入口！")
         return False
     
     def env_check(
         self,
         context: Context,
+        state: FishingRun,
         restart_for_except: bool = True,
         max_restart_count: int = 5
     ) -> int:
@@ -272,6 +362,7 @@ class AutoFishingAction(CustomAction):
 
         Args:
             context: 控制器上下文
+            state: 本次运行的状态
             restart_for_except: 如遇到不可恢复异常，是否重启游戏，默认True重启
             max_restart_count: 最大重启游戏次数限制，默认5次
 
@@ -321,6 +412,8 @@ class AutoFishingAction(CustomAction):
         reeling_result: RecognitionDetail | None = context.run_recognition("检测抛竿按钮", img)
         if reeling_result and reeling_result.hit:
             logger.info("[任务准备] 检测到抛竿按钮，环境检查通过")
+            if has_fishing:
+                line_selector.record_current(context, FISHING, True)
             del fishing_result, reeling_result, img
             return 0
         
@@ -330,11 +423,14 @@ class AutoFishingAction(CustomAction):
             time.sleep(2)
             default_ensure_main_page(context)
             time.sleep(2)
-            switch_line(context, ["40", "41", "42", "43", "44", "45", "46", "47", "48", "49"])
+            recovery("AutoFishing", "table_full_switch_line")
+            line_selector.record_current(context, FISHING, False)
+            switch_line(context, ["40", "41", "42", "43", "44", "45", "46", "47", "48", "49"], FISHING)
             return 1
         
         # 5. 检查其他意外情况
-        self.except_count += 1  # type: ignore
+        state.except_count += 1
+        counter("AutoFishing", "except_count", state.except_count)
         logger.warning('[任务准备] 出现异常：可能是遇到掉线/切线情况，尝试自动处理...')
         disconnect_result: RecognitionDetail | None = context.run_recognition(
             "通用文字识别",
@@ -346,6 +442,7 @@ class AutoFishingAction(CustomAction):
         if disconnect_result and disconnect_result.hit:
             # 6.1 有确认按钮：很有可能是掉线了
             logger.info("[任务准备] 有确认按钮，可能是掉线重连按钮，正在点击重连，等待30秒后重试...")
+            recovery("AutoFishing", "reconnect")
             context.tasker.controller.post_click(797, 532).wait()
             time.sleep(2)
 
@@ -379,12 +476,11 @@ class AutoFishingAction(CustomAction):
             if entry_result and entry_result.hit:
                 # 识别到进入游戏
                 logger.info("[任务准备] 登录结束，点击进入游戏，等待90秒...")
+                recovery("AutoFishing", "relogin")
                 context.tasker.controller.post_click(1103, 632).wait()
                 del entry_result
-                # 等待场景切换
-                wait_for_switch(context)
-                # 处理广告
-                close_ad(context)
+                # 等待场景切换，同时处理广告
+                LoginStateMachine(context, "AutoFishing").run(start_phase=LOADING)
                 return 1
             del entry_result
 
@@ -396,13 +492,12 @@ class AutoFishingAction(CustomAction):
                 return -1
 
             # 7.4 若开启不可恢复异常重启选项，则直接重启游戏
-            if restart_for_except and self.restart_count < max_restart_count:  # type: ignore
+            if restart_for_except and state.restart_count < max_restart_count:
                 logger.info("[任务准备] 检测不到进入游戏按钮，准备直接重启游戏...")
+                recovery("AutoFishing", "restart_game", restart_count=state.restart_count + 1)
                 # 等待游戏重启完成
                 restart_result = restart_and_login_xhgm(context)
-                # 处理广告
-                close_ad(context)
-                self.restart_count += 1  # type: ignore
+                state.restart_count += 1
                 if restart_result:
                     return 1
                 else:
@@ -415,6 +510,7 @@ class AutoFishingAction(CustomAction):
     def ensure_equipment(
         self,
         context: Context,
+        state: FishingRun,
         type_str: str,
         add_task: str,
         add_action: str,
@@ -428,6 +524,7 @@ class AutoFishingAction(CustomAction):
 
         Args:
             context: 控制器上下文
+            state: 本次运行的状态
             type_str: 配件类型字符串（鱼竿 / 鱼饵）
             add_task: 检测是否需要添加配件任务名称
             add_action: 点击添加配件动作名称
@@ -456,7 +553,8 @@ class AutoFishingAction(CustomAction):
         if need_buy and need_buy.hit:
             logger.info(f"[任务准备] 检测到{type_str}不足，需要购买")
             if type_str == "鱼竿":
-                self.used_rod_count += 1  # type: ignore
+                state.used_rod_count += 1
+                counter("AutoFishing", "used_rod_count", state.used_rod_count)
                 logger.info(f"[任务准备] 当前将购买1个{type_str}")
             else:
                 logger.info(f"[任务准备] 当前将购买200个{type_str}")
@@ -513,7 +611,7 @@ class AutoFishingAction(CustomAction):
         context.run_action(use_action)
         time.sleep(2)
 
-    def reel_loop(self, context: Context) -> bool:
+    def reel_loop(self, context: Context, state: FishingRun) -> bool:
         """
         钓鱼循环逻辑：
         0. 基础设置：
@@ -535,6 +633,7 @@ class AutoFishingAction(CustomAction):
 
         Args:
             context: 控制器上下文
+            state: 本次运行的状态
 
         Returns:
             是否继续下一次钓鱼：True / False
@@ -559,14 +658,19 @@ class AutoFishingAction(CustomAction):
         last_arrow_direction = None  # 上次箭头方向
         is_bow_pressed = False  # 当前方向键状态
         no_tension_count = 0  # 连续未检测到张力的次数
+        state.watch.set_phase("reel", max_reel_time)
 
         while self.check_running(context):
             loop_start_perf = time.perf_counter()
             now = time.time()
 
-            # ===== 最大收线时间保护 =====
-            if now - first_start_time >= max_reel_time:
-                logger.warning(f"[执行钓鱼] 收线时间超过{max_reel_time}秒，强制结束本次钓鱼")
+            # ===== 最大收线时间保护 / 看门狗检测到画面卡住 =====
+            stalled = state.watch.take_stall()
+            if stalled or now - first_start_time >= max_reel_time:
+                if stalled:
+                    logger.warning("[执行钓鱼] 收线时画面长时间没有变化，强制结束本次钓鱼")
+                else:
+                    logger.warning("[执行钓鱼] 收线时间超过{}秒，强制结束本次钓鱼", max_reel_time)
                 time.sleep(1)  # 缓冲1秒
                 if is_reel_pressed:
                     self.stop_reel_in(context)
@@ -578,6 +682,7 @@ class AutoFishingAction(CustomAction):
 
             # ===== 获取截图 =====
             img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+            state.watch.frame(img)
 
             # ===== 张力检测 / 收线状态判断 =====
             tension_hit: RecognitionDetail | None = context.run_recognition("检测张力百分比", img)
@@ -587,6 +692,7 @@ class AutoFishingAction(CustomAction):
                 tension_match = re.search(r"\d+", tension_raw_text)
                 if tension_match:
                     tension_num = int(tension_match.group())
+                    state.watch.beat("tension", tension_num)
                     no_tension_count = 0
 
                     target_rhythm_mode = tension_num >= max_tension
@@ -597,16 +703,17 @@ class AutoFishingAction(CustomAction):
                             if is_reel_pressed and self.stop_reel_in(context):
                                 is_reel_pressed = False
                             last_reel_click_time = 0.0
-                            logger.info(f"[执行钓鱼] 当前张力 {tension_num}% 超过{max_tension}% -> 收线键切换为 节奏模式")
+                            logger.debug("[执行钓鱼] 当前张力 {}% 超过{}% -> 收线键切换为 节奏模式", tension_num, max_tension)
                         else:
-                            logger.info(f"[执行钓鱼] 当前张力 {tension_num}% 低于{max_tension}% -> 收线键切换为 长按模式")
+                            logger.debug("[执行钓鱼] 当前张力 {}% 低于{}% -> 收线键切换为 长按模式", tension_num, max_tension)
 
             # 首次开始收线后的保护时间内，不做“丢失张力即退出”的判断
             if now - init_time > check_delay and tension_num is None:
                 no_tension_count += 1
                 if no_tension_count >= max_no_tension_count:
-                    self.used_bait_count += 1  # type: ignore
-                    logger.info(f"[执行钓鱼] 连续 {max_no_tension_count} 次未检测到张力，等待一会检测'继续钓鱼'按钮...")
+                    state.used_bait_count += 1
+                    counter("AutoFishing", "used_bait_count", state.used_bait_count)
+                    logger.info("[执行钓鱼] 连续 {} 次未检测到张力，等待一会检测'继续钓鱼'按钮...", max_no_tension_count)
                     del img
                     if is_reel_pressed:
                         self.stop_reel_in(context)
@@ -635,12 +742,12 @@ class AutoFishingAction(CustomAction):
                     pass
                 elif is_bow_pressed:
                     # 不同方向且当前还按着：先松开
-                    logger.info("[执行钓鱼] 方向变化且上次方向键未松开 -> 先松开方向键")
+                    logger.debug("[执行钓鱼] 方向变化且上次方向键未松开 -> 先松开方向键")
                     if self.stop_bow(context):
                         is_bow_pressed = False
                 else:
                     # 不同方向且当前已松开：切换并按住新方向
-                    logger.info(f"[执行钓鱼] 方向变化 -> 切换并按住新方向: {confirmed_arrow}")
+                    logger.debug("[执行钓鱼] 方向变化 -> 切换并按住新方向: {}", confirmed_arrow)
                     if self.start_bow(context, confirmed_arrow):
                         is_bow_pressed = True
                         last_arrow_direction = confirmed_arrow
@@ -762,12 +869,13 @@ class AutoFishingAction(CustomAction):
             return False
         return True
 
-    def check_fishing_result(self, context: Context, img: numpy.ndarray) -> None:
+    def check_fishing_result(self, context: Context, state: FishingRun, img: numpy.ndarray) -> None:
         """
         检查该次成功的钓鱼结果
 
         Args:
             context: 控制器上下文
+            state: 本次运行的状态
             img: 钓鱼结果截图
         
         Returns:
@@ -784,14 +892,14 @@ class AutoFishingAction(CustomAction):
         rare = "未知"
         if rarity_result and rarity_result.hit:
             fish_rarity = rarity_result.best_result.text  # type: ignore
-            rare = get_best_match_single(fish_rarity, self.FISH_RARITY_LIST)
+            rare = FISH_RARITY_INDEX.match(fish_rarity)
             # 计数
             if rare == "神话":
-                self.ssr_fish_count += 1  # type: ignore
+                state.ssr_fish_count += 1
             elif rare == "珍稀":
-                self.sr_fish_count += 1  # type: ignore
+                state.sr_fish_count += 1
             elif rare == "常见":
-                self.r_fish_count += 1  # type: ignore
+                state.r_fish_count += 1
         del rarity_result
 
         # 鱼名
@@ -805,7 +913,8 @@ class AutoFishingAction(CustomAction):
         fish = "未知"
         if fish_name_result and fish_name_result.hit:
             fish_name = fish_name_result.best_result.text  # type: ignore
-            fish = get_best_match_single(fish_name, self.FISH_NAME_LIST)
+            fish = FISH_NAME_INDEX.match(fish_name)
         del fish_name_result
 
-        logger.info(f"[钓鱼结果] 钓上了 [{fish}] 稀有度：[{rare}]")
+        logger.info("[钓鱼结果] 钓上了 [{}] 稀有度：[{}]", fish, rare)
+        counter("AutoFishing", "success_fishing_count", state.success_fishing_count, fish=fish, rarity=rare)
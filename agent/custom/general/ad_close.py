@@ -1,3 +1,4 @@
+import threading
 import time
 
 import numpy
@@ -6,49 +7,206 @@ from maa.context import Context, RecognitionDetail
 from maa.custom_action import CustomAction
 
 from agent.logger import logger
+from agent.utils.controller_scope import PerController
+from agent.utils.event_stream import counter, track_task
+from agent.utils.param_utils import ParamField, ParamSchema
+
+# 广告弹窗的识别节点
+AD_POPUP_NODE = "检测今日不再弹出按钮"
+# 截图检测的间隔（秒）
+AD_POLL_INTERVAL = 0.5
+# 开始检测或者关闭上一个弹窗后，连续这么久没有检测到弹窗才认为不会再弹出（秒）
+# 弹窗展示很慢，原来固定等 5 秒才检测，这里保持同样的等待，只是期间持续检测，出现就立即关闭
+AD_SETTLE_SECONDS = 5.0
+# 两次点击之间、关闭后等待弹窗消失的时间（秒）
+AD_CLICK_INTERVAL = 0.5
+# 阻塞模式的最长耗时（秒） | 防止广告一直关不掉时卡死
+AD_CLOSE_TIMEOUT = 60
+# 后台模式默认的持续检测时间（秒）
+AD_BACKGROUND_WATCH = 30.0
+# 后台模式截图检测的间隔（秒）
+AD_BACKGROUND_INTERVAL = 1.0
+
+CLOSE_AD_PARAMS = ParamSchema(
+    "CloseAd",
+    ParamField("background", bool, default=False),
+    ParamField("watch_seconds", float, default=AD_BACKGROUND_WATCH),
+)
 
 
 # 关闭所有广告
 @AgentServer.custom_action("CloseAd")
 class CloseAdAction(CustomAction):
 
+    @track_task("CloseAd")
     def run(
         self,
         context: Context,
-        _,
+        argv: CustomAction.RunArg,
     ) -> bool:
+        """
+        关闭所有广告
+
+        Args:
+            context: 控制器上下文
+            argv: 运行参数
+                - background: 是否在后台持续检测，默认 false，true 时立即返回，由后台线程在后续动作期间关闭弹窗
+                - watch_seconds: 后台检测的持续秒数，默认 30
+
+        Returns:
+            是否完成
+        """
+        params = CLOSE_AD_PARAMS.parse(argv.custom_action_param)
+        if params["background"]:
+            ad_watcher.get(context).start(context, params["watch_seconds"])
+            return True
         return close_ad(context)
 
-def close_ad(context: Context) -> bool:
+
+def close_ad(context: Context, task: str = "CloseAd") -> bool:
     """
-    关闭所有广告
+    关闭所有广告，连续 AD_SETTLE_SECONDS 秒检测不到弹窗后立即返回
 
     Args:
         context: 控制器上下文
+        task: 所属任务名，用于耗时统计
 
     Returns: 是否完成
 
     """
-    # 检测今日不再弹出按钮
+    # 与后台检测同时点击会重复关闭
+    ad_watcher.get(context).stop()
+    logger.info("开始检测并关闭可能的广告弹窗")
+    start = time.monotonic()
+    clean_since: float | None = None
+    closed = 0
     while not context.tasker.stopping:
-        # 展示太慢了，等5秒
-        logger.info("开始检测并关闭可能的广告弹窗")
-        time.sleep(5)
+        if time.monotonic() - start > AD_CLOSE_TIMEOUT:
+            logger.warning(f"关闭广告超过{AD_CLOSE_TIMEOUT}秒，不再等待")
+            break
         img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-        firm_result: RecognitionDetail | None = context.run_recognition("检测今日不再弹出按钮", img)
+        # 检测今日不再弹出按钮
+        firm_result: RecognitionDetail | None = context.run_recognition(AD_POPUP_NODE, img)
         if not firm_result:
             logger.warning("广告弹窗检测不可达！")
-            return True
+            break
         if firm_result.hit:
-            logger.info("检测到弹窗广告，准备关闭广告...")
-            # 点击不再弹出按钮
-            context.tasker.controller.post_click(263, 609).wait()
-            time.sleep(1)
-            # 点击关闭广告按钮
-            context.tasker.controller.post_click(1061, 157).wait()
-            time.sleep(1)
-        else:
+            dismiss_ad(context)
+            closed += 1
+            clean_since = None
+            continue
+        now = time.monotonic()
+        if clean_since is None:
+            clean_since = now
+        if now - clean_since >= AD_SETTLE_SECONDS:
             # 检测不到广告
-            return True
+            break
+        time.sleep(AD_POLL_INTERVAL)
 
+    report_ad_close(task, "blocking", time.monotonic() - start, closed)
     return True
+
+
+def dismiss_ad(context: Context) -> None:
+    """
+    关闭一个已经识别到的广告弹窗：点击今日不再弹出，再点击关闭
+
+    Args:
+        context: 控制器上下文
+    """
+    logger.info("检测到弹窗广告，准备关闭广告...")
+    # 点击不再弹出按钮
+    context.tasker.controller.post_click(263, 609).wait()
+    time.sleep(AD_CLICK_INTERVAL)
+    # 点击关闭广告按钮
+    context.tasker.controller.post_click(1061, 157).wait()
+    time.sleep(AD_CLICK_INTERVAL)
+
+
+def report_ad_close(task: str, mode: str, seconds: float, closed: int) -> None:
+    """记录一次关闭广告实际花费的时间"""
+    logger.info("[关闭广告] {} 模式耗时 {:.1f} 秒，关闭广告 {} 个", mode, seconds, closed)
+    counter(task, "close_ad_ms", round(seconds * 1000), mode=mode, closed=closed)
+
+
+class AdWatcher:
+    """
+    后台广告检测：在后续动作执行期间由后台线程持续检测，出现弹窗就关闭
+
+    每个控制器一个实例，同一时间只有一个后台线程，重复启动只会延长检测时间。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # 每个后台线程有自己的停止标记，停止时还没退出的旧线程不会影响之后启动的新线程
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._deadline = 0.0
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None
+
+    def start(self, context: Context, duration: float = AD_BACKGROUND_WATCH, task: str = "CloseAd") -> None:
+        """
+        开始或延长后台检测
+
+        Args:
+            context: 控制器上下文
+            duration: 从现在开始持续检测的秒数
+            task: 所属任务名，用于耗时统计
+        """
+        with self._lock:
+            self._deadline = max(self._deadline, time.monotonic() + duration)
+            if self._thread is not None:
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._watch, args=(context, task, self._stop), name="ad-watcher", daemon=True
+            )
+            self._thread.start()
+        logger.info("[关闭广告] 后台检测广告弹窗 {} 秒", duration)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """停止后台检测并等待线程结束，等待超时也会立即释放，之后的 start 会启动新线程"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._thread = None
+            self._deadline = 0.0
+            self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _watch(self, context: Context, task: str, stop: threading.Event) -> None:
+        start = time.monotonic()
+        closed = 0
+        try:
+            while not stop.is_set() and not context.tasker.stopping:
+                with self._lock:
+                    if time.monotonic() >= self._deadline:
+                        # 在锁内结束，保证之后的 start 会启动新线程
+                        if self._thread is threading.current_thread():
+                            self._thread = None
+                        break
+                img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+                firm_result: RecognitionDetail | None = context.run_recognition(AD_POPUP_NODE, img)
+                if firm_result and firm_result.hit:
+                    dismiss_ad(context)
+                    closed += 1
+                    continue
+                stop.wait(AD_BACKGROUND_INTERVAL)
+        except Exception as exc:
+            logger.warning(f"[关闭广告] 后台检测异常: {exc}")
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    self._deadline = 0.0
+            report_ad_close(task, "background", time.monotonic() - start, closed)
+
+
+# 全局后台广告检测 | 每个控制器一份，后台线程只操作自己的控制器
+ad_watcher = PerController(AdWatcher)
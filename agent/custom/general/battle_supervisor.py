@@ -0,0 +1,326 @@
+"""战斗监督：视角旋转、复活、副本退出检测、自动战斗确认作为周期任务在同一个循环中协作执行，同一轮的识别共用一张截图。"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy
+from maa.agent.agent_server import AgentServer
+from maa.context import Context, RecognitionDetail
+from maa.custom_action import CustomAction
+
+from agent.custom.app_manage_action import wait_for_switch
+from agent.logger import logger
+from agent.utils.event_stream import counter, track_task
+from agent.utils.param_utils import ParamField, ParamSchema
+
+# 没有到期任务时的最长等待（秒） | 保证能及时响应停止
+MAX_IDLE_WAIT = 1.0
+
+# 结束原因
+STOP_EXIT_INSTANCE = "exit_instance"
+STOP_TIMEOUT = "timeout"
+STOP_STOPPING = "stopping"
+
+# 野外的就近复活按钮，副本中的复活按钮由调用方传入对应的节点
+FIELD_REVIVE_NODE = "点击就近复活按钮"
+
+BATTLE_SUPERVISE_PARAMS = ParamSchema(
+    "BattleSupervise",
+    ParamField("rotate_times", int, default=3),
+    ParamField("rotate_interval", float, default=1.0),
+    ParamField("revive_interval", float, default=10.0),
+    ParamField("revive_node", str, default=FIELD_REVIVE_NODE),
+    ParamField("exit_interval", float, default=5.0),
+    ParamField("auto_attack_interval", float, default=15.0),
+    ParamField("timeout", int, default=0),
+    ParamField("wait_switch", bool, default=True),
+)
+
+# 任务函数：(上下文, 本轮截图或 None) -> 结束原因，None 表示继续
+JobFunc = Callable[[Context, "numpy.ndarray | None"], "str | None"]
+
+
+@dataclass(slots=True)
+class SupervisorJob:
+    """
+    战斗监督中的一个周期任务
+
+    Attributes:
+        name: 任务名
+        period: 执行周期（秒）
+        func: 任务函数，返回结束原因则结束整个监督
+        needs_frame: 是否需要截图
+        max_runs: 最多执行次数，0 表示不限制
+        delay: 第一次执行前的等待（秒）
+    """
+
+    name: str
+    period: float
+    func: JobFunc
+    needs_frame: bool = True
+    max_runs: int = 0
+    delay: float = 0.0
+    next_run: float = 0.0
+    runs: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return 0 < self.max_runs <= self.runs
+
+
+class BattleSupervisor:
+    """
+    战斗监督循环
+
+    每一轮只截一张图，交给所有本轮到期且需要截图的任务；任务按周期的截止时间调度，互不阻塞。
+
+    用法:
+        supervisor = BattleSupervisor(context, "UnstableSpacePoint")
+        supervisor.add_job(rotate_view_job, period=1, needs_frame=False, max_runs=3)
+        supervisor.add_job(instance_exit_job, period=5, delay=5)
+        reason = supervisor.run()
+    """
+
+    def __init__(self, context: Context, task: str) -> None:
+        """
+        Args:
+            context: 控制器上下文
+            task: 所属任务名，用于日志和事件
+        """
+        self.context = context
+        self.task = task
+        self.jobs: list[SupervisorJob] = []
+        self.ticks = 0
+        self.frames = 0
+        # 所有任务使用截图的总次数 | 除以 frames 即每张截图平均被几个任务共用
+        self.frame_uses = 0
+
+    def add_job(self, func: JobFunc, period: float, name: str | None = None,
+                needs_frame: bool = True, max_runs: int = 0, delay: float = 0.0) -> SupervisorJob:
+        """
+        添加一个周期任务
+
+        Args:
+            func: 任务函数
+            period: 执行周期（秒）
+            name: 任务名，默认使用函数名
+            needs_frame: 是否需要截图
+            max_runs: 最多执行次数，0 表示不限制
+            delay: 第一次执行前的等待（秒），默认立即执行
+
+        Returns:
+            添加的任务
+        """
+        job = SupervisorJob(name or getattr(func, "__name__", "job"), period, func, needs_frame, max_runs, delay)
+        self.jobs.append(job)
+        return job
+
+    def run(self, timeout: float = 0) -> str:
+        """
+        执行监督循环，直到某个任务返回结束原因、超时或者被停止
+
+        Args:
+            timeout: 超时时间（秒），0 表示不限制
+
+        Returns:
+            结束原因
+        """
+        start = time.monotonic()
+        for job in self.jobs:
+            job.next_run = start + job.delay
+        reason = STOP_STOPPING
+        try:
+            while not self.context.tasker.stopping:
+                now = time.monotonic()
+                if timeout and now - start > timeout:
+                    reason = STOP_TIMEOUT
+                    break
+                due = [job for job in self.jobs if not job.finished and job.next_run <= now]
+                if not due:
+                    pending = [job.next_run for job in self.jobs if not job.finished]
+                    wait = min(pending) - now if pending else MAX_IDLE_WAIT
+                    time.sleep(min(MAX_IDLE_WAIT, max(0.0, wait)))
+                    continue
+                result = self._tick(due)
+                if result is not None:
+                    reason = result
+                    break
+        finally:
+            self.report(reason)
+        return reason
+
+    def _tick(self, due: list[SupervisorJob]) -> str | None:
+        self.ticks += 1
+        frame = None
+        consumers = sum(1 for job in due if job.needs_frame)
+        if consumers:
+            frame = self.context.tasker.controller.post_screencap().wait().get()
+            self.frames += 1
+            self.frame_uses += consumers
+        for job in due:
+            job_start = time.monotonic()
+            result = job.func(self.context, frame if job.needs_frame else None)
+            elapsed = time.monotonic() - job_start
+            job.runs += 1
+            job.total_seconds += elapsed
+            job.max_seconds = max(job.max_seconds, elapsed)
+            # 按周期推进，落后时不补执行
+            job.next_run = max(job.next_run + job.period, time.monotonic())
+            if result is not None:
+                logger.info("[战斗监督] {} 结束监督: {}", job.name, result)
+                return result
+        return None
+
+    def stats(self) -> dict:
+        """各任务的执行次数和耗时，以及截图共用情况"""
+        return {
+            "ticks": self.ticks,
+            "frames": self.frames,
+            "frames_shared_per_tick": round(self.frame_uses / self.frames, 2) if self.frames else 0.0,
+            "jobs": {
+                job.name: {
+                    "runs": job.runs,
+                    "avg_ms": round(job.total_seconds / job.runs * 1000) if job.runs else 0,
+                    "max_ms": round(job.max_seconds * 1000),
+                }
+                for job in self.jobs
+            },
+        }
+
+    def report(self, reason: str) -> None:
+        stats = self.stats()
+        logger.info(
+            "[战斗监督] 结束原因: {}，共 {} 轮，截图 {} 张，每张截图平均被 {} 个任务共用",
+            reason, stats["ticks"], stats["frames"], stats["frames_shared_per_tick"],
+        )
+        for name, job_stats in stats["jobs"].items():
+            logger.debug("[战斗监督] {}: 执行 {runs} 次，平均 {avg_ms} ms，最长 {max_ms} ms", name, **job_stats)
+            counter(self.task, f"supervisor_{name}_avg_ms", job_stats["avg_ms"], runs=job_stats["runs"])
+        counter(self.task, "supervisor_frames_shared_per_tick", stats["frames_shared_per_tick"], frames=stats["frames"])
+
+
+def rotate_view_job(context: Context, _frame: numpy.ndarray | None) -> None:
+    """旋转一次视角，防止脱仇"""
+    # 滑动时间：500ms，触控点：1
+    context.tasker.controller.post_swipe(708, 273, 581, 273, 500, 1, 1).wait()
+
+
+def make_revive_job(revive_node: str = FIELD_REVIVE_NODE) -> JobFunc:
+    """
+    生成复活任务：在本轮截图中识别到复活按钮就执行节点的点击动作，冷却未到点不了也不要紧，等下一次
+
+    Args:
+        revive_node: 复活按钮的 pipeline 节点，需要带识别和点击动作
+
+    Returns:
+        任务函数
+    """
+
+    def revive_job(context: Context, frame: numpy.ndarray | None) -> None:
+        detail: RecognitionDetail | None = context.run_recognition(revive_node, frame)
+        if detail and detail.hit:
+            logger.info("[战斗监督] 检测到角色死亡，尝试复活")
+            context.run_action(revive_node, box=detail.box)
+
+    return revive_job
+
+
+# 野外的就近复活
+revive_job = make_revive_job()
+
+
+def instance_exit_job(context: Context, frame: numpy.ndarray | None) -> str | None:
+    """识别不到副本退出按钮说明已经离开副本"""
+    detail: RecognitionDetail | None = context.run_recognition("图片识别副本退出按钮", frame)
+    if detail and not detail.hit:
+        return STOP_EXIT_INSTANCE
+    return None
+
+
+def auto_attack_job(context: Context, frame: numpy.ndarray | None) -> None:
+    """识别到开自动战斗按钮说明自动战斗被关掉了，重新打开 | 在战斗技能页面时识别不到，等下一次"""
+    detail: RecognitionDetail | None = context.run_recognition("图片识别开自动战斗", frame)
+    if detail and detail.hit:
+        logger.info("[战斗监督] 自动战斗已关闭，重新打开")
+        context.tasker.controller.post_click(1196, 391).wait()
+
+
+def supervise_instance_battle(
+    context: Context,
+    task: str,
+    rotate_times: int = 3,
+    rotate_interval: float = 1.0,
+    revive_interval: float = 10.0,
+    revive_node: str = FIELD_REVIVE_NODE,
+    exit_interval: float = 5.0,
+    auto_attack_interval: float = 15.0,
+    timeout: float = 0,
+) -> str:
+    """
+    副本战斗监督：旋转视角、复活、确认自动战斗，直到离开副本
+
+    Args:
+        context: 控制器上下文
+        task: 所属任务名
+        rotate_times: 旋转视角次数，0 表示整场战斗持续旋转
+        rotate_interval: 旋转视角间隔（秒）
+        revive_interval: 复活检测间隔（秒）
+        revive_node: 复活按钮的 pipeline 节点
+        exit_interval: 副本退出检测间隔（秒），进入后第一次检测也等待这么久，刚进副本时退出按钮可能还没出现
+        auto_attack_interval: 自动战斗确认间隔（秒），0 表示不确认
+        timeout: 超时时间（秒），0 表示不限制
+
+    Returns:
+        结束原因
+    """
+    supervisor = BattleSupervisor(context, task)
+    supervisor.add_job(rotate_view_job, max(1.0, rotate_interval), "rotate_view", needs_frame=False,
+                       max_runs=max(0, rotate_times))
+    supervisor.add_job(instance_exit_job, exit_interval, "instance_exit", delay=exit_interval)
+    supervisor.add_job(make_revive_job(revive_node), revive_interval, "revive")
+    if auto_attack_interval > 0:
+        supervisor.add_job(auto_attack_job, auto_attack_interval, "auto_attack")
+    return supervisor.run(timeout)
+
+
+# 副本战斗监督 | 供协会狩猎、委托等 pipeline 流程在进入副本后调用
+@AgentServer.custom_action("BattleSupervise")
+class BattleSuperviseAction(CustomAction):
+
+    @track_task("BattleSupervise")
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> bool:
+        """
+        副本战斗监督，直到离开副本
+
+        Args:
+            context: 控制器上下文
+            argv: 运行参数
+                - rotate_times: 旋转视角次数，默认 3，0 表示持续旋转
+                - rotate_interval: 旋转视角间隔秒数，默认 1
+                - revive_interval: 复活检测间隔秒数，默认 10
+                - revive_node: 复活按钮的 pipeline 节点，默认野外的就近复活
+                - exit_interval: 副本退出检测间隔秒数，默认 5
+                - auto_attack_interval: 自动战斗确认间隔秒数，默认 15，0 表示不确认
+                - timeout: 超时秒数，默认 0 不限制
+                - wait_switch: 离开副本后是否等待回到主页面，默认是；之后还有结算界面的流程传 false
+
+        Returns:
+            是否离开了副本
+        """
+        params = dict(BATTLE_SUPERVISE_PARAMS.parse(argv.custom_action_param))
+        wait_switch = params.pop("wait_switch")
+        reason = supervise_instance_battle(context, "BattleSupervise", **params)
+        if reason != STOP_EXIT_INSTANCE:
+            return False
+        if wait_switch:
+            wait_for_switch(context)
+        return True
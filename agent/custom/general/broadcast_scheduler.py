@@ -0,0 +1,179 @@
+"""聊天频道定时广播调度：基于单调时钟的截止时间，多个广播任务共用一个循环，同一频道的到期任务合并发送。"""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+# 广播周期下限（秒）
+MIN_BROADCAST_INTERVAL = 30
+# 合并窗口（秒） | 某个频道有任务到期时，同一频道在此时间内即将到期的任务一起提前发送
+COALESCE_WINDOW = 10
+
+
+@dataclass(slots=True)
+class BroadcastJob:
+    """
+    一个定时广播任务
+
+    Attributes:
+        name: 任务名，用于日志
+        channel: 聊天频道名，例如 世界 / 协会
+        message: 原始消息内容，可以包含 ${当前人数} 等变量
+        interval: 发送周期（秒）
+        limit: 发送次数上限，0 表示不限制
+        jitter: 每次发送在截止时间后随机延后的最大秒数，避免发送时间过于规律
+        channel_ids: 世界频道分线ID列表，非世界频道忽略
+        need_team: 消息是否需要队伍人数信息
+        force_send: 队伍已满时是否还需要发送
+    """
+
+    name: str
+    channel: str
+    message: str
+    interval: float
+    limit: int = 0
+    jitter: float = 0.0
+    channel_ids: tuple[str, ...] = ()
+    need_team: bool = False
+    force_send: bool = False
+    # 以下为调度状态
+    sent_count: int = 0
+    # 不含抖动的周期基准时间，只按周期累加，不受发送耗时影响
+    base_due: float = 0.0
+    next_due: float = 0.0
+    # 每次发送相对目标时间的延迟（秒），合并提前发送时为负数
+    delays: list[float] = field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return 0 < self.limit <= self.sent_count
+
+    def schedule(self, base_due: float, rng: random.Random) -> None:
+        """设置下一次的基准时间，并叠加随机抖动"""
+        self.base_due = base_due
+        self.next_due = base_due + (rng.uniform(0, self.jitter) if self.jitter > 0 else 0.0)
+
+
+class BroadcastScheduler:
+    """
+    多任务广播调度器
+
+    每个任务的下一次发送时间 = 上一次的基准时间 + 周期，与发送本身的耗时无关，所以周期不会漂移；
+    如果一次发送耗时超过了若干个周期，会直接跳到下一个未来的周期，而不是连续补发。
+    """
+
+    def __init__(
+        self,
+        jobs: list[BroadcastJob],
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Args:
+            jobs: 广播任务列表，第一次发送立即开始
+            clock: 单调时钟
+            sleep: 等待函数
+            seed: 抖动的随机种子
+        """
+        self.jobs = jobs
+        self.clock = clock
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        now = clock()
+        for job in jobs:
+            job.schedule(now, self._rng)
+
+    @property
+    def active_jobs(self) -> list[BroadcastJob]:
+        return [job for job in self.jobs if not job.finished]
+
+    def due_batches(self, now: float) -> dict[str, list[BroadcastJob]]:
+        """当前到期的任务，按频道分组 | 同一频道的任务只需要打开一次聊天框"""
+        active = self.active_jobs
+        due_channels = {job.channel for job in active if job.next_due <= now}
+        batches: dict[str, list[BroadcastJob]] = {}
+        for job in active:
+            if job.channel in due_channels and job.next_due <= now + COALESCE_WINDOW:
+                batches.setdefault(job.channel, []).append(job)
+        return batches
+
+    def restore(self, job: BroadcastJob, sent_count: int, due_in: float) -> None:
+        """
+        恢复中断前的进度
+
+        Args:
+            job: 广播任务
+            sent_count: 已发送次数
+            due_in: 距离下一次发送的秒数，已经过期则立即发送
+        """
+        job.sent_count = sent_count
+        job.schedule(self.clock() + max(0.0, due_in), self._rng)
+
+    def mark_sent(self, job: BroadcastJob, sent_at: float) -> None:
+        """记录一次发送，并按周期推进下一次的基准时间"""
+        job.sent_count += 1
+        job.delays.append(sent_at - job.next_due)
+        base_due = job.base_due + job.interval
+        now = self.clock()
+        if job.interval <= 0:
+            base_due = now
+        elif base_due <= now:
+            # 落后超过一个周期：跳过错过的周期
+            base_due += job.interval * math.ceil((now - base_due) / job.interval)
+        job.schedule(base_due, self._rng)
+
+    def run(
+        self,
+        send_batch: Callable[[str, list[BroadcastJob]], object],
+        stopping: Callable[[], bool],
+        max_wait: float = 2.0,
+        after_batch: Callable[[], object] | None = None,
+    ) -> None:
+        """
+        调度循环，直到所有任务都达到发送上限或者被停止
+
+        Args:
+            send_batch: 发送一个频道的一批任务，参数为 (频道名, 任务列表)
+            stopping: 是否需要停止
+            max_wait: 单次最长等待秒数，保证能及时响应停止
+            after_batch: 每批发送并推进调度之后调用，例如保存断点
+        """
+        while not stopping():
+            active = self.active_jobs
+            if not active:
+                return
+            now = self.clock()
+            batches = self.due_batches(now)
+            if not batches:
+                next_due = min(job.next_due for job in active)
+                self.sleep(min(max_wait, max(0.0, next_due - now)))
+                continue
+            for channel, jobs in batches.items():
+                if stopping():
+                    return
+                sent_at = self.clock()
+                send_batch(channel, jobs)
+                # 无论成功与否都算一轮，与原来的循环发送一致，避免失败时连续重试刷屏
+                for job in jobs:
+                    self.mark_sent(job, sent_at)
+                if after_batch is not None:
+                    after_batch()
+
+    def report(self) -> list[dict]:
+        """每个任务的实际发送时间与目标时间的偏差统计（秒）"""
+        result = []
+        for job in self.jobs:
+            delays = job.delays
+            result.append({
+                "name": job.name,
+                "channel": job.channel,
+                "sent": job.sent_count,
+                "avg_delay": round(sum(delays) / len(delays), 2) if delays else 0.0,
+                "max_delay": round(max(delays), 2) if delays else 0.0,
+            })
+        return result
@@ -0,0 +1,89 @@
+"""聊天频道状态：记录最后一次确认的世界频道分线ID，减少发送消息时的切换和识别。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from agent.utils.controller_scope import PerController
+
+# 频道记录有效期（秒） | 超过后重新识别，防止两次任务之间手动切换了频道
+CHANNEL_STATE_TTL = 10 * 60
+# 切换前识别一次频道ID的耗时（秒）：等待 2 秒 + 截图识别
+PRE_SWITCH_OCR_COST = 2.5
+# 原来逐个点击数字键时每个数字之后的等待（秒）
+DIGIT_INTERVAL = 1.0
+# 切换一次分线的默认耗时（秒），实际切换后按指数滑动平均更新
+DEFAULT_SWITCH_COST = 8.0
+# 滑动平均系数 | 新测量值的权重
+COST_SMOOTHING = 0.3
+
+
+class ChatChannelState:
+    """
+    最后一次确认的世界频道分线ID
+
+    只有识别确认过的ID才会记录；切换后识别失败、重启游戏等情况需要调用 invalidate。
+    """
+
+    def __init__(self) -> None:
+        # 发言任务可能在多个线程中同时读写
+        self._lock = threading.RLock()
+        self.channel_id: str | None = None
+        self.confirmed_at = 0.0
+        self.switch_cost = DEFAULT_SWITCH_COST
+        # 本轮估算节省的秒数
+        self.round_saved = 0.0
+
+    @property
+    def current_id(self) -> str | None:
+        """仍在有效期内的当前分线ID，未知返回 None"""
+        with self._lock:
+            if self.channel_id is None or time.monotonic() - self.confirmed_at > CHANNEL_STATE_TTL:
+                return None
+            return self.channel_id
+
+    def confirm(self, channel_id: str) -> None:
+        """识别确认了当前分线ID"""
+        with self._lock:
+            self.channel_id = channel_id
+            self.confirmed_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """当前分线未知"""
+        with self._lock:
+            self.channel_id = None
+
+    def record_switch_cost(self, seconds: float) -> None:
+        """记录一次实际切换分线的耗时"""
+        with self._lock:
+            self.switch_cost += COST_SMOOTHING * (seconds - self.switch_cost)
+
+    def save(self, seconds: float) -> None:
+        """累计本轮节省的秒数"""
+        with self._lock:
+            self.round_saved += seconds
+
+    def order(self, channel_id_list: list[str]) -> list[str]:
+        """
+        调整分线顺序，从当前所在的分线开始，之后按原顺序循环
+
+        Args:
+            channel_id_list: 需要发送的分线ID列表
+
+        Returns:
+            调整后的列表，当前分线未知或不在列表中时保持原顺序
+        """
+        with self._lock:
+            current_id = self.current_id
+            if current_id is None or current_id not in channel_id_list:
+                return list(channel_id_list)
+            index = channel_id_list.index(current_id)
+            if index:
+                # 原顺序下第一个分线需要多切换一次
+                self.save(self.switch_cost)
+            return channel_id_list[index:] + channel_id_list[:index]
+
+
+# 全局聊天频道状态 | 每个控制器一份，同一个控制器上的发言任务共用
+chat_channel_state = PerController(ChatChannelState)
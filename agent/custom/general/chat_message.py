@@ -1,4 +1,5 @@
 import re
+import threading
 import time
 
 import numpy
@@ -7,37 +8,129 @@ from maa.context import Context, RecognitionDetail
 from maa.custom_action import CustomAction
 
 from agent.attach.common_attach import get_chat_channel, get_chat_loop_interval, get_chat_loop_limit, \
-    get_chat_message_content, get_chat_channel_id_list, get_chat_message_need_team, get_full_team_force_send
+    get_chat_message_content, get_chat_channel_id_list, get_chat_message_need_team, get_full_team_force_send, \
+    get_team_info_ttl
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
 from agent.constant.world_channel import CHANNEL_DATA
+from agent.custom.general.broadcast_scheduler import MIN_BROADCAST_INTERVAL, BroadcastJob, BroadcastScheduler
+from agent.custom.general.chat_channel_state import DIGIT_INTERVAL, PRE_SWITCH_OCR_COST, chat_channel_state
 from agent.custom.general.general import default_ensure_main_page
-from agent.custom.general.power_saving_mode import default_exit_power_save
+from agent.custom.general.precondition import MainPageToken, precondition_engine
 from agent.logger import logger
+from agent.utils.checkpoint import Checkpoint, config_key
+from agent.utils.controller_scope import PerController
+from agent.utils.event_stream import counter, recognition, recovery, track_task
+from agent.utils.param_utils import CustomActionParamError, ParamField, ParamSchema
+
+SEND_MESSAGE_LOOP_PARAMS = ParamSchema(
+    "SendMessageLoop",
+    ParamField("jobs", list, default=()),
+)
+
+
+class TeamInfoCache:
+    """
+    队伍信息缓存：获取一次队伍信息需要打开协会页面约 20 秒，在有效期内直接复用上次的结果
+
+    除了有效期，还会记录获取时主界面上是否处于队伍中（一张截图的模板匹配），
+    加入或者离开队伍后提前失效。重新获取到的信息与缓存不一致时，
+    说明上次获取之后用缓存发出的消息人数已经过时，计入 stale_sends。
+    """
+
+    def __init__(self) -> None:
+        # 计数和缓存内容一起更新
+        self._lock = threading.RLock()
+        self.info: tuple[int, int, str] | None = None
+        self.in_team: bool | None = None
+        self.updated_at = 0.0
+        # 当前缓存被用于发送的次数
+        self.sends_since_refresh = 0
+        self.hits = 0
+        self.refreshes = 0
+        self.stale_sends = 0
+
+    def get(self, ttl: float, in_team: bool) -> tuple[int, int, str] | None:
+        """
+        获取仍然有效的缓存
+
+        Args:
+            ttl: 有效期（秒），0 表示不使用缓存
+            in_team: 当前主界面上是否处于队伍中
+
+        Returns:
+            (当前人数, 总人数, 队伍名)，缓存失效返回 None
+        """
+        with self._lock:
+            if self.info is None or ttl <= 0:
+                return None
+            if in_team != self.in_team:
+                logger.info("[队伍信息缓存] 检测到队伍状态变化，提前重新获取队伍信息")
+                return None
+            if time.monotonic() - self.updated_at > ttl:
+                return None
+            self.hits += 1
+            self.sends_since_refresh += 1
+            return self.info
+
+    def put(self, info: tuple[int, int, str], in_team: bool) -> None:
+        """记录新获取的队伍信息"""
+        with self._lock:
+            if self.info is not None and info != self.info:
+                self.stale_sends += self.sends_since_refresh
+            self.info = info
+            self.in_team = in_team
+            self.updated_at = time.monotonic()
+            # 刚获取的这次也会用于发送
+            self.sends_since_refresh = 1
+            self.refreshes += 1
+
+    def invalidate(self) -> None:
+        """删除缓存，例如获取失败时"""
+        with self._lock:
+            self.info = None
+            self.sends_since_refresh = 0
+
+
+# 全局队伍信息缓存 | 每个控制器一份，不同模拟器上的账号在不同的队伍里
+team_info_cache = PerController(TeamInfoCache)
 
 
 # 循环发送聊天频道消息
 @AgentServer.custom_action("SendMessageLoop")
 class SendMessageLoopAction(CustomAction):
 
+    @track_task("SendMessageLoop")
     def run(
         self,
         context: Context,
-        _,
+        argv: CustomAction.RunArg,
     ) -> bool:
-        # 循环周期间隔时间
-        loop_interval = get_chat_loop_interval(context)
-        if loop_interval and loop_interval < 30:
-            logger.error("如需设置循环周期间隔，则时间必须大于30秒")
+        """
+        按周期循环发送聊天频道消息，支持多个广播任务
+
+        Args:
+            context: 控制器上下文
+            argv: 运行参数
+                - jobs: 广播任务列表，每个任务可以设置 name / channel / message / interval / limit / jitter /
+                  channel_ids / need_team / force_send，未设置的字段使用界面上的聊天参数；
+                  不传则只有一个使用界面参数的任务
+        """
+        try:
+            raw_jobs = SEND_MESSAGE_LOOP_PARAMS.parse(argv.custom_action_param)["jobs"]
+            jobs = build_broadcast_jobs(context, raw_jobs)
+        except CustomActionParamError as e:
+            logger.error("周期性聊天频道发言参数错误: {}", e)
+            return False
+        if not jobs:
             return False
-        # 发送消息次数上限
-        limit = get_chat_loop_limit(context)
-        return send_message_loop(context, loop_interval, limit)
+        return send_message_loop(context, jobs)
 
 
 # 发送聊天频道消息
 @AgentServer.custom_action("SendMessage")
 class SendMessageAction(CustomAction):
 
+    @track_task("SendMessage")
     def run(
         self,
         context: Context,
@@ -46,76 +139,189 @@ class SendMessageAction(CustomAction):
         return send_message(context)
 
 
-# 发送循环消息
-def send_message_loop(context: Context, loop_interval, limit, check_interval = 2) -> bool:
+def build_broadcast_jobs(context: Context, raw_jobs: tuple = ()) -> list[BroadcastJob]:
     """
-    发送循环消息
+    根据参数构建广播任务列表，未设置的字段使用界面上的聊天参数
 
     Args:
         context: 控制器上下文
-        loop_interval: 发送消息任务循环间隔
-        limit: 发送消息次数上限
-        check_interval: 检查间隔，默认2秒一次
+        raw_jobs: custom_action_param 中的 jobs 列表
+
+    Returns:
+        广播任务列表
+
+    Raises:
+        CustomActionParamError: 任务参数不合法时抛出
     """
-    # 已发送次数
-    send_count = 0
-    # 距离上次发送已经等待的时间
-    elapsed = loop_interval
-
-    # 循环发送
-    while not context.tasker.stopping:
-        if 0 < limit <= send_count:
-            break
+    defaults = {
+        "channel": get_chat_channel(context),
+        "message": get_chat_message_content(context),
+        "interval": get_chat_loop_interval(context),
+        "limit": get_chat_loop_limit(context),
+        "jitter": 0,
+        "channel_ids": get_chat_channel_id_list(context),
+        "need_team": get_chat_message_need_team(context),
+        "force_send": get_full_team_force_send(context),
+    }
+    jobs = []
+    for index, raw_job in enumerate(raw_jobs or ({},)):
+        if not isinstance(raw_job, dict):
+            raise CustomActionParamError(f"jobs[{index}] 必须是 JSON 对象")
+        spec = {**defaults, **{key: value for key, value in raw_job.items() if value is not None}}
+        channel_ids = spec["channel_ids"]
+        if isinstance(channel_ids, str):
+            channel_ids = channel_ids.split(",") if channel_ids else []
+        try:
+            job = BroadcastJob(
+                name=str(raw_job.get("name") or f"广播{index + 1}"),
+                channel=str(spec["channel"]),
+                message=str(spec["message"]),
+                interval=float(spec["interval"]),
+                limit=int(spec["limit"]),
+                jitter=max(0.0, float(spec["jitter"])),
+                channel_ids=tuple(str(channel_id).strip() for channel_id in channel_ids),
+                need_team=bool(spec["need_team"]),
+                force_send=bool(spec["force_send"]),
+            )
+        except (TypeError, ValueError) as e:
+            raise CustomActionParamError(f"jobs[{index}] 参数类型错误: {e}") from e
+        if job.channel not in CHANNEL_DATA:
+            raise CustomActionParamError(f"{job.name}: 未知的聊天频道 {job.channel}")
+        if not job.message:
+            raise CustomActionParamError(f"{job.name}: 需要发送的消息内容为空，请先设置内容")
+        if job.interval and job.interval < MIN_BROADCAST_INTERVAL:
+            raise CustomActionParamError(f"{job.name}: 如需设置循环周期间隔，则时间必须大于{MIN_BROADCAST_INTERVAL}秒")
+        jobs.append(job)
+    return jobs
+
 
-        # 每 2 秒检测一次状态
-        time.sleep(check_interval)
-        elapsed += check_interval
-
-        # 只有当累计等待时间达到或超过 loop_interval 才发送
-        if elapsed >= loop_interval:
-            send_message(context)
-            send_count += 1
-            # 把已累计时间清零（或减去一个周期，用于更精细的补偿）
-            elapsed = 0
-            logger.info(f"[循环消息] 已完成发送消息 {send_count} 轮")
+# 发送循环消息
+def send_message_loop(context: Context, jobs: list[BroadcastJob]) -> bool:
+    """
+    按截止时间循环发送消息，同一频道同时到期的任务在一次打开聊天框中发送
+
+    Args:
+        context: 控制器上下文
+        jobs: 广播任务列表
+    """
+    scheduler = BroadcastScheduler(jobs)
+    # 崩溃前的进度 | 任务配置不变时恢复已发送次数和下一次发送时间，继续遵守发送次数上限
+    checkpoint = Checkpoint(context, "SendMessageLoop", config_key(
+        [(job.name, job.channel, job.message, job.interval, job.limit, job.channel_ids) for job in jobs]
+    ))
+    for job, (sent_count, due_at) in zip(jobs, checkpoint.state.get("jobs", [])):
+        scheduler.restore(job, sent_count, due_at - time.time())
+
+    def save_checkpoint() -> None:
+        now = scheduler.clock()
+        checkpoint.save(jobs=[
+            [job.sent_count, round(time.time() + job.next_due - now, 1)] for job in jobs
+        ])
+
+    def send_batch(channel_name: str, batch: list[BroadcastJob]) -> bool:
+        for job in batch:
+            delay = scheduler.clock() - job.next_due
+            logger.debug("[循环消息] {} 实际发送比计划晚 {:.1f} 秒", job.name, delay)
+            counter("SendMessageLoop", "broadcast_delay_ms", round(delay * 1000), job=job.name)
+        result = send_channel_messages(context, channel_name, batch)
+        for job in batch:
+            logger.info("[循环消息] {} 已完成发送消息 {} 轮", job.name, job.sent_count + 1)
+        return result
+
+    scheduler.run(send_batch, lambda: context.tasker.stopping, after_batch=save_checkpoint)
+    checkpoint.clear()
+
+    for item in scheduler.report():
+        logger.info(
+            "[循环消息] {name}（{channel}）共发送 {sent} 轮，比计划平均晚 {avg_delay} 秒，最多晚 {max_delay} 秒",
+            **item,
+        )
     return True
 
 
 # 发送消息
+@track_task("send_message")
 def send_message(context: Context) -> bool:
-    # 退出省电模式
-    default_exit_power_save(context)
-    time.sleep(1)
-    # 确保回到主界面
-    default_ensure_main_page(context, strict=False)
-    time.sleep(1)
-
-    # 本轮成功次数
-    success_count = 0
-
-    # 0. 变量检查
     message_content_raw = get_chat_message_content(context)
     if not message_content_raw:
         logger.error("需要发送的消息内容为空，请先设置内容")
         return False
-    channel_name = get_chat_channel(context)
-    channel_id_list = get_chat_channel_id_list(context)
-    need_team = get_chat_message_need_team(context)
-    force_send = get_full_team_force_send(context)
-
-    # 1. 获取队伍人数信息(如果需要)
-    if need_team:
-        current_num, total_num, team_name = get_team_info(context, force_send)
+    job = BroadcastJob(
+        name="聊天频道发言",
+        channel=get_chat_channel(context),
+        message=message_content_raw,
+        interval=0,
+        channel_ids=tuple(get_chat_channel_id_list(context)),
+        need_team=get_chat_message_need_team(context),
+        force_send=get_full_team_force_send(context),
+    )
+    return send_channel_messages(context, job.channel, [job])
+
+
+def resolve_messages(
+    context: Context, jobs: list[BroadcastJob], token: MainPageToken | None = None
+) -> list[tuple[BroadcastJob, str]]:
+    """
+    替换消息中的队伍变量，队伍信息一批只获取一次
+
+    Args:
+        context: 控制器上下文
+        jobs: 同一频道的广播任务
+        token: 主页面凭证，有效时复用其截图
+
+    Returns:
+        (任务, 最终发送的消息) 列表，队伍已满且不强制发送的任务不在结果中
+    """
+    team_info = None
+    messages = []
+    for job in jobs:
+        if not job.need_team:
+            messages.append((job, job.message))
+            continue
+        if team_info is None:
+            team_info = get_team_info_cached(context, token)
+        current_num, total_num, team_name = team_info
         if not total_num:
-            return False
-        message_content = handle_message(message_content_raw, current_num, total_num, team_name)
-        time.sleep(1)
-    else:
-        message_content = message_content_raw
+            continue
+        if not job.force_send and current_num >= total_num:
+            logger.warning("当前队伍人数已满，{} 将跳过此次发送消息！", job.name)
+            continue
+        messages.append((job, handle_message(job.message, current_num, total_num, team_name)))
+    return messages
 
-    # 2. 检测并打开聊天框
-    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+
+def send_channel_messages(context: Context, channel_name: str, jobs: list[BroadcastJob]) -> bool:
+    """
+    打开一次聊天框，把同一频道的多个任务的消息依次发送出去
+
+    Args:
+        context: 控制器上下文
+        channel_name: 频道名
+        jobs: 该频道的广播任务
+
+    Returns:
+        是否至少成功发送了一条消息
+    """
+    # 退出省电模式并确保回到主界面
+    engine = precondition_engine.get(context)
+    token = engine.ensure(context, strict=False)
+
+    # 本轮成功次数
+    success_count = 0
+
+    # 1. 获取队伍人数信息(如果需要)，替换消息变量
+    messages = resolve_messages(context, jobs, token)
+    if not messages:
+        return False
+
+    # 2. 检测并打开聊天框 | 主页面凭证仍然有效时直接用确认主页面的截图（获取过队伍信息时是回到主页面后的新凭证）
+    latest_token = engine.token
+    if engine.is_valid(latest_token):
+        img: numpy.ndarray = latest_token.frame  # type: ignore
+    else:
+        img = context.tasker.controller.post_screencap().wait().get()
     chat_button: RecognitionDetail | None = context.run_recognition("检测聊天按钮", img)
+    recognition("send_message", "检测聊天按钮", bool(chat_button and chat_button.hit))
     if not chat_button or not chat_button.hit:
         logger.error("未检测到聊天按钮，无法发送消息")
         return False
@@ -143,9 +349,10 @@ def send_message(context: Context) -> bool:
         time.sleep(2)
     if not need_next:
         logger.error(f"未检测到 {channel_name} 频道，无法发送消息")
+        recovery("send_message", "channel_not_found", channel=channel_name)
         context.run_action("ESC")
         return False
-        
+
     # 点击对应文字的中间位置
     point_x = int(x + w / 2)
     point_y = int(y + h / 2)
@@ -154,103 +361,154 @@ def send_message(context: Context) -> bool:
     # 如果不是世界频道就做个假的循环
     if not channel_id_dict:
         channel_id_list = ["0"]
+    else:
+        # 多个任务的分线ID合并去重，保持顺序，每个分线只切换一次；从当前所在的分线开始
+        channel_id_list = list(dict.fromkeys(channel_id for job, _ in messages for channel_id in job.channel_ids))
+        channel_state = chat_channel_state.get(context)
+        channel_state.round_saved = 0.0
+        channel_id_list = channel_state.order(channel_id_list)
+    total_count = 0
     # 根据世界频道分线ID列表循环处理
     for channel_id in channel_id_list:
         if context.tasker.stopping:
             context.run_action("ESC")
-            return True
+            return success_count > 0
 
+        channel_messages = [(job, message) for job, message in messages
+                            if not channel_id_dict or channel_id in job.channel_ids]
+        total_count += len(channel_messages)
         # 4. 切换世界频道分线（如果需要）
-        need_next = change_channel(channel_id, channel_id_dict, context, 1)
+        need_next = change_channel(channel_id, channel_id_dict, context)
         if not need_next:
             continue
-        # 5. 点击输入框
-        time.sleep(2)
-        context.tasker.controller.post_click(275, 680).wait()
-        # 6. 输入内容
-        time.sleep(2)
-        context.run_action("输入聊天框内容", pipeline_override={
-            "输入聊天框内容": {
-                "action": {
-                    "type": "InputText",
-                    "param": {
-                        "input_text": message_content
-                    }
-                }
-            }
-        })
-        # 7. 点击确定按钮
-        time.sleep(2)
-        context.tasker.controller.post_click(1217, 668).wait()
-        # 8. 检测并点击发送图标
-        time.sleep(2)
-        img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-        send_button: RecognitionDetail | None = context.run_recognition("检测发送消息按钮", img)
-        if send_button and send_button.hit:
-            context.tasker.controller.post_click(807, 681).wait()
-            success_count += 1
-            logger.info(f"已成功向 {channel_name} 频道 {channel_id} 发送消息内容")
-        else:
-            logger.error(f"向 {channel_name} 频道 {channel_id} 发送消息内容失败：识别不到发送按钮")
-
-    logger.info(f"===== 本轮发送 {channel_name} 频道消息已经成功：{success_count} / {len(channel_id_list)} ====")
+        for job, message in channel_messages:
+            if input_and_send(context, message):
+                success_count += 1
+                logger.info(f"已成功向 {channel_name} 频道 {channel_id} 发送消息内容（{job.name}）")
+            else:
+                logger.error(f"向 {channel_name} 频道 {channel_id} 发送消息内容失败：识别不到发送按钮")
+
+    logger.info(f"===== 本轮发送 {channel_name} 频道消息已经成功：{success_count} / {total_count} ====")
+    counter("send_message", "messages_sent", success_count, channel=channel_name, total=total_count)
+    if channel_id_dict:
+        channel_state = chat_channel_state.get(context)
+        logger.info("[频道记录] 本轮减少切换和识别约节省 {:.1f} 秒", channel_state.round_saved)
+        counter("send_message", "channel_seconds_saved", round(channel_state.round_saved, 1))
 
     # 9. 结束并关闭
     time.sleep(2)
     default_ensure_main_page(context, strict=False)
-    return True
+    return success_count > 0
 
 
-def change_channel(channel_id: str, channel_id_dict: dict, context: Context, interval: float = 0.5) -> bool:
+def input_and_send(context: Context, message_content: str) -> bool:
     """
-    根据 channel_id 切换频道
+    在已经打开的聊天框中输入并发送一条消息
 
     Args:
-        channel_id: 频道ID
-        channel_id_dict: 频道ID坐标字典
         context: 控制器上下文
-        interval: 每次按键之间的间隔秒数，默认 0.5
+        message_content: 消息内容
 
     Returns:
-        切换成功与否
+        是否识别到发送按钮并点击
     """
-    # 没有频道ID字典 | 说明不是世界频道直接进行下一步
-    if not channel_id_dict:
-        return True
-    
-    # 检测切换前的频道ID
+    # 5. 点击输入框
+    time.sleep(2)
+    context.tasker.controller.post_click(275, 680).wait()
+    # 6. 输入内容
+    time.sleep(2)
+    context.run_action("输入聊天框内容", pipeline_override={
+        "输入聊天框内容": {
+            "action": {
+                "type": "InputText",
+                "param": {
+                    "input_text": message_content
+                }
+            }
+        }
+    })
+    # 7. 点击确定按钮
+    time.sleep(2)
+    context.tasker.controller.post_click(1217, 668).wait()
+    # 8. 检测并点击发送图标
     time.sleep(2)
     img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-    old_channel: RecognitionDetail | None = context.run_recognition(
+    send_button: RecognitionDetail | None = context.run_recognition("检测发送消息按钮", img)
+    recognition("send_message", "检测发送消息按钮", bool(send_button and send_button.hit))
+    if not send_button or not send_button.hit:
+        return False
+    context.tasker.controller.post_click(807, 681).wait()
+    return True
+
+
+def ocr_channel_id(context: Context) -> str | None:
+    """识别聊天框中当前的世界频道分线ID，识别不到返回 None"""
+    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+    channel: RecognitionDetail | None = context.run_recognition(
         "通用文字识别",
         img,
         pipeline_override={
             "通用文字识别": {"expected": "[0-9]+", "roi": [234, 22, 75, 32]}
         },
     )
-    if not old_channel or not old_channel.hit:
-        logger.warning("无法识别到切换前的频道ID，将跳过此次发送！")
-        return False
-    old_channel_id_raw = old_channel.best_result.text  # type: ignore
-    old_channel_id = re.search(r"\d+", old_channel_id_raw).group()  # type: ignore
-    logger.info(f"切换前的频道ID：{old_channel_id}")
+    if not channel or not channel.hit:
+        return None
+    search = re.search(r"\d+", channel.best_result.text)  # type: ignore
+    return search.group() if search else None
+
+
+def change_channel(channel_id: str, channel_id_dict: dict, context: Context) -> bool:
+    """
+    根据 channel_id 切换频道
+
+    当前分线有仍然有效的记录且与目标不同时跳过切换前的识别，数字键一次性全部提交，切换后识别确认并更新记录。
+    记录显示已经在目标分线时仍然识别一次确认，记录过时也不会发到错误的分线。
+
+    Args:
+        channel_id: 频道ID
+        channel_id_dict: 频道ID坐标字典
+        context: 控制器上下文
+
+    Returns:
+        切换成功与否
+    """
+    # 没有频道ID字典 | 说明不是世界频道直接进行下一步
+    if not channel_id_dict:
+        return True
+
+    channel_state = chat_channel_state.get(context)
+    # 检测切换前的频道ID | 反正需要切换时才信任记录，不需要切换时要确认记录没有过时
+    old_channel_id = channel_state.current_id
+    if old_channel_id is not None and old_channel_id != channel_id:
+        channel_state.save(PRE_SWITCH_OCR_COST)
+        logger.info(f"切换前的频道ID（已记录）：{old_channel_id}")
+    else:
+        time.sleep(2)
+        old_channel_id = ocr_channel_id(context)
+        if old_channel_id is None:
+            logger.warning("无法识别到切换前的频道ID，将跳过此次发送！")
+            return False
+        channel_state.confirm(old_channel_id)
+        logger.info(f"切换前的频道ID：{old_channel_id}")
 
     # 判断是否已经符合要求
     if old_channel_id == channel_id:
         logger.info("当前已经是所需要发送的频道了，将开始发送消息...")
         return True
 
+    switch_start = time.monotonic()
     # 点击开始切换
     context.tasker.controller.post_click(275, 41).wait()
     time.sleep(2)
 
-    # 输入
-    for digit in channel_id:
-        if digit not in channel_id_dict:
-            continue
-        x, y = channel_id_dict[digit]
-        context.tasker.controller.post_click(x, y).wait()
-        time.sleep(interval)
+    # 输入 | 所有数字键一次性提交到控制器队列，按顺序执行，只等待最后一个完成
+    digit_jobs = [
+        context.tasker.controller.post_click(*channel_id_dict[digit])
+        for digit in channel_id if digit in channel_id_dict
+    ]
+    for job in digit_jobs:
+        job.wait()
+    channel_state.save(DIGIT_INTERVAL * len(digit_jobs))
 
     # 识别并点击切换按钮
     img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
@@ -263,28 +521,24 @@ def change_channel(channel_id: str, channel_id_dict: dict, context: Context, int
     )
     if not switch_result or not switch_result.hit:
         logger.warning(f"聊天世界频道: {channel_id} 识别切换频道按钮失败，将跳过此次发送！")
+        # 键盘可能还开着，分线状态不确定
+        channel_state.invalidate()
         return False
     context.tasker.controller.post_click(359, 208).wait()
-    
+
     # 检测切换后的频道ID
     time.sleep(2)
-    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
-    new_channel: RecognitionDetail | None = context.run_recognition(
-        "通用文字识别",
-        img,
-        pipeline_override={
-            "通用文字识别": {"expected": "[0-9]+", "roi": [234, 22, 75, 32]}
-        },
-    )
-    if not new_channel or not new_channel.hit:
+    new_channel_id = ocr_channel_id(context)
+    channel_state.record_switch_cost(time.monotonic() - switch_start)
+    if new_channel_id is None:
         logger.warning("无法识别到切换后频道ID，可能识别有误，但仍将继续完成此次发送！")
+        channel_state.invalidate()
         return True
-    new_channel_id_raw = new_channel.best_result.text  # type: ignore
-    new_channel_id = re.search(r"\d+", new_channel_id_raw).group()  # type: ignore
+    channel_state.confirm(new_channel_id)
     logger.info(f"切换后频道ID：{new_channel_id}")
 
     # 判断是否成功切换
-    if str(new_channel_id) != channel_id:
+    if new_channel_id != channel_id:
         logger.warning("频道切换失败，可能是频道人数已满，将跳过此次发送！")
         return False
 
@@ -292,6 +546,49 @@ def change_channel(channel_id: str, channel_id_dict: dict, context: Context, int
     return True
 
 
+def get_team_info_cached(context: Context, token: MainPageToken | None = None) -> tuple[int, int, str]:
+    """
+    获取队伍信息，缓存有效时直接复用，需要在主界面调用
+
+    队伍已满时也会返回实际人数，是否跳过发送由调用方根据 force_send 判断。
+
+    Args:
+        context: 控制器上下文
+        token: 主页面凭证，有效时直接使用其截图检测是否在队伍中
+
+    Returns:
+        (当前人数, 总人数, 队伍名)，获取失败返回 (0, 0, '')
+    """
+    if precondition_engine.get(context).is_valid(token):
+        img: numpy.ndarray = token.frame  # type: ignore
+    else:
+        img = context.tasker.controller.post_screencap().wait().get()
+    in_team_detail: RecognitionDetail | None = context.run_recognition("当前在五人队伍中", img)
+    in_team = bool(in_team_detail and in_team_detail.hit)
+
+    cache = team_info_cache.get(context)
+    cached = cache.get(get_team_info_ttl(context), in_team)
+    if cached is not None:
+        logger.info("[队伍信息缓存] 使用缓存的队伍信息：{} | {} / {}", cached[2], cached[0], cached[1])
+        counter("send_message", "team_info_cache_hits", cache.hits)
+        return cached
+
+    # 统一按强制发送获取，队伍已满时再由调用方按各任务的设置过滤
+    team_info = get_team_info(context, True)
+    time.sleep(1)
+    if not team_info[1]:
+        cache.invalidate()
+        return team_info
+    stale_sends = cache.stale_sends
+    cache.put(team_info, in_team)
+    if cache.stale_sends != stale_sends:
+        logger.info("[队伍信息缓存] 队伍人数已变化，之前有 {} 次发送使用了过时的队伍信息",
+                    cache.stale_sends - stale_sends)
+        counter("send_message", "team_info_stale_sends", cache.stale_sends)
+    counter("send_message", "team_info_refreshes", cache.refreshes)
+    return team_info
+
+
 def get_team_info(context: Context, force_send: bool = False) -> tuple[int, int, str]:
     """
     获取队伍信息，必须是加入协会状态。
@@ -306,7 +603,8 @@ def get_team_info(context: Context, force_send: bool = False) -> tuple[int, int,
             队伍信息，或队伍已满且 ``force_send`` 为 False 时，返回
             ``(0, 0, "")`` 表示未获取到有效的队伍信息或本次发送被跳过。
     """
-    # 先按U打开协会页面
+    # 先按U打开协会页面，离开主页面后之前的凭证作废
+    precondition_engine.get(context).invalidate()
     time.sleep(2)
     context.tasker.controller.post_click_key(ANDROID_KEY_EVENT_DATA["KEYCODE_U"]).wait()
 
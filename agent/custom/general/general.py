@@ -12,12 +12,15 @@ from maa.custom_action import CustomAction
 from maa.custom_recognition import CustomRecognition
 
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
+from agent.custom.general.precondition import precondition_engine
 from agent.logger import logger
+from agent.utils.event_stream import track_task
 
 
 # 返回主页面
 @AgentServer.custom_action("return_main_page")
 class ReturnMainPageAction(CustomAction):
+    @track_task("return_main_page")
     def run(
         self,
         context: Context,
@@ -86,11 +89,13 @@ def default_ensure_main_page(
         context: Context,
         max_retry: int = 10,
         interval_sec: float = 1.0,
-        strict: bool = False
+        strict: bool = False,
 ) -> None:
     """
     默认的确保主界面方法
 
+    确认在主页面后会发放主页面凭证（见 precondition），之后的辅助函数可以通过 precondition_engine.get(context).token 复用。
+
     Args:
         context: 控制器上下文
         max_retry: 最大重试次数（按返回键的最多次数）。
@@ -101,16 +106,18 @@ def default_ensure_main_page(
     Returns:
         None
     """
+    engine = precondition_engine.get(context)
     try:
         for _ in range(max_retry):
             # 任务强制中止判断
             if context.tasker.stopping:
                 break
-            img = context.tasker.controller.post_screencap().wait().get()
+            img = engine.capture(context)
             detail: RecognitionDetail | None = context.run_recognition(
                 "图片识别是否在主页面", img
             )
             if detail and detail.hit:
+                engine.issue(img)
                 logger.info("[EnsureMainPage] 已在主页面")
                 break
             context.tasker.controller.post_click_key(
@@ -0,0 +1,174 @@
+"""分线选择：记录每条分线的历史结果（切换是否成功、加载耗时、钓鱼台是否满人、能否暴打陈敏等），按期望成功率和耗时给出候选分线顺序。"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from maa.context import Context
+
+from agent.logger import logger
+from agent.utils.controller_scope import controller_id
+
+CURRENT_DIR = Path(__file__).parent
+PROJECT_ROOT = CURRENT_DIR.parent.parent.parent
+STORE_FILEPATH = PROJECT_ROOT / "agent" / "line_stats.json"
+
+# 切换分线本身的结果
+SWITCH = "switch"
+# 各业务的结果
+FISHING = "fishing"
+CHEN_MIN = "chen_min"
+COCOON = "cocoon"
+
+# 历史结果的半衰期（秒） | 分线人数随时段变化，越旧的记录权重越低
+DECAY_HALF_LIFE = 6 * 60 * 60
+# 切换一次分线的固定耗时（秒）：按 P、输入、确认、前往之间的等待
+SWITCH_OVERHEAD = 15.0
+# 没有记录时的场景加载耗时（秒）
+DEFAULT_LOAD_TIME = 15.0
+# 加载耗时的滑动平均系数 | 新测量值的权重
+LOAD_TIME_SMOOTHING = 0.3
+
+
+def _decay(stat: list[float], now: float) -> tuple[float, float]:
+    """按半衰期衰减后的 (成功次数, 总次数)"""
+    success, total, updated_at = stat
+    factor = 0.5 ** (max(0.0, now - updated_at) / DECAY_HALF_LIFE)
+    return success * factor, total * factor
+
+
+class LineSelector:
+    """
+    分线选择服务，所有需要切线的任务共用，结果持久化到本地文件
+
+    每条分线按结果类型记录 [衰减后的成功次数, 衰减后的总次数, 更新时间]，
+    成功率使用 (成功 + 1) / (总数 + 2) 估计，没有记录的分线成功率为 0.5。
+    分线的历史结果所有控制器共用，当前所在的分线按控制器分开记录。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # 多个控制器同时切线时会并发记录结果并写文件
+        self._lock = threading.RLock()
+        # 分线 -> {结果类型: [成功, 总数, 更新时间], "load_time": 加载耗时}
+        self._lines: dict[str, dict] = {}
+        self._loaded = False
+        # 控制器 -> 本次会话中最后一次切换成功的分线，未知时没有记录
+        self._current: dict[str, str] = {}
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict):
+            self._lines = data.get("lines", {})
+
+    def _save(self) -> None:
+        try:
+            self.path.write_text(
+                json.dumps({"lines": self._lines}, ensure_ascii=False, separators=(",", ":")),
+                encoding="utf-8",
+            )
+        except OSError as e:
+            logger.debug("[分线选择] 写入失败: {}", e)
+
+    def _line(self, line: str) -> dict:
+        if not self._loaded:
+            self._load()
+        return self._lines.setdefault(line, {})
+
+    def record(self, line: str, kind: str, success: bool) -> None:
+        """
+        记录一次结果
+
+        Args:
+            line: 分线ID
+            kind: 结果类型：SWITCH / FISHING / CHEN_MIN / COCOON
+            success: 是否成功
+        """
+        with self._lock:
+            now = time.time()
+            stats = self._line(line)
+            success_count, total = _decay(stats.get(kind, [0.0, 0.0, now]), now)
+            stats[kind] = [round(success_count + bool(success), 4), round(total + 1, 4), round(now)]
+            self._save()
+
+    def current_line(self, context: Context) -> str | None:
+        """控制器当前所在的分线，未知返回 None"""
+        with self._lock:
+            return self._current.get(controller_id(context))
+
+    def record_switch(self, context: Context, line: str, success: bool, load_seconds: float | None = None) -> None:
+        """记录控制器一次切换分线的结果，成功时同时记录场景加载耗时"""
+        with self._lock:
+            if success:
+                self._current[controller_id(context)] = line
+                if load_seconds is not None:
+                    stats = self._line(line)
+                    previous = stats.get("load_time")
+                    stats["load_time"] = round(
+                        load_seconds if previous is None else previous + LOAD_TIME_SMOOTHING * (load_seconds - previous), 2
+                    )
+            self.record(line, SWITCH, success)
+
+    def record_current(self, context: Context, kind: str, success: bool) -> None:
+        """记录控制器当前所在分线的业务结果，当前分线未知时忽略"""
+        with self._lock:
+            current_line = self.current_line(context)
+            if current_line is not None:
+                self.record(current_line, kind, success)
+
+    def success_rate(self, line: str, kind: str) -> float:
+        """衰减后的成功率估计"""
+        with self._lock:
+            stat = self._line(line).get(kind)
+            if stat is None:
+                return 0.5
+            success, total = _decay(stat, time.time())
+            return (success + 1) / (total + 2)
+
+    def expected_cost(self, line: str, purpose: str | None = None) -> float:
+        """切换到该分线并且业务成功一次的期望耗时（秒）"""
+        with self._lock:
+            probability = self.success_rate(line, SWITCH)
+            if purpose:
+                probability *= self.success_rate(line, purpose)
+            cost = SWITCH_OVERHEAD + self._line(line).get("load_time", DEFAULT_LOAD_TIME)
+            return cost / probability
+
+    def rank(self, context: Context, candidates: list[str], purpose: str | None = None) -> list[str]:
+        """
+        按期望耗时从小到大排序候选分线，期望相同时保持原顺序，控制器当前所在的分线放到最后
+
+        Args:
+            context: 控制器上下文
+            candidates: 候选分线
+            purpose: 业务结果类型，None 表示只看切换本身
+
+        Returns:
+            排序后的分线列表
+        """
+        with self._lock:
+            current_line = self.current_line(context)
+            ranked = sorted(
+                candidates,
+                key=lambda line: (line == current_line, self.expected_cost(line, purpose)),
+            )
+            logger.debug("[分线选择] {} 候选顺序: {}", purpose or SWITCH, ranked)
+            return ranked
+
+    def invalidate_current(self, context: Context) -> None:
+        """控制器当前所在分线未知（重启游戏等）"""
+        with self._lock:
+            self._current.pop(controller_id(context), None)
+
+
+# 全局分线选择服务
+line_selector = LineSelector(STORE_FILEPATH)
@@ -0,0 +1,106 @@
+"""地图列表布局缓存：记录每张地图在地图列表中的位置和是否需要滚动，按资源版本失效。"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from pathlib import Path
+
+from agent.logger import logger
+
+CURRENT_DIR = Path(__file__).parent
+PROJECT_ROOT = CURRENT_DIR.parent.parent.parent
+CACHE_FILEPATH = PROJECT_ROOT / "agent" / "map_layout_cache.json"
+# 地图列表的 OCR 区域
+MAP_LIST_ROI = (13, 288, 246, 341)
+# 用缓存位置确认时，在缓存的文字框四周扩大的像素
+CONFIRM_MARGIN = 12
+
+_VERSION_PATTERN = re.compile(r'"version"\s*:\s*"([^"]*)"')
+
+
+def read_resource_version() -> str:
+    """读取 interface.json 中的资源版本号，安装目录和开发目录都兼容，读不到返回空字符串"""
+    for path in (PROJECT_ROOT / "interface.json", PROJECT_ROOT / "assets" / "interface.json"):
+        try:
+            match = _VERSION_PATTERN.search(path.read_text(encoding="utf-8"))
+        except OSError:
+            continue
+        if match:
+            return match.group(1)
+    return ""
+
+
+def confirm_roi(box: list[int]) -> list[int]:
+    """根据缓存的文字框计算确认用的 OCR 区域，限制在地图列表区域内"""
+    x, y, w, h = box
+    roi_x, roi_y, roi_w, roi_h = MAP_LIST_ROI
+    left = max(roi_x, x - CONFIRM_MARGIN)
+    top = max(roi_y, y - CONFIRM_MARGIN)
+    right = min(roi_x + roi_w, x + w + CONFIRM_MARGIN)
+    bottom = min(roi_y + roi_h, y + h + CONFIRM_MARGIN)
+    return [left, top, max(1, right - left), max(1, bottom - top)]
+
+
+class MapLayoutCache:
+    """
+    地图名 -> {"scrolled": 是否需要先滚动列表, "box": 文字框 [x, y, w, h]}
+
+    地图列表只跟随游戏版本变化，缓存文件记录资源版本号，版本不一致时整体作废。
+    """
+
+    def __init__(self, path: Path, version: str) -> None:
+        self.path = path
+        # 缓存字典和文件写入共用一把锁
+        self._lock = threading.RLock()
+        self.version = version
+        self._layouts: dict[str, dict] = {}
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict) and data.get("version") == self.version:
+            self._layouts = data.get("maps", {})
+
+    def _save(self) -> None:
+        try:
+            self.path.write_text(
+                json.dumps({"version": self.version, "maps": self._layouts}, ensure_ascii=False, indent=4),
+                encoding="utf-8",
+            )
+        except OSError as e:
+            logger.debug("[地图列表缓存] 写入失败: {}", e)
+
+    def get(self, map_name: str) -> dict | None:
+        """获取地图的缓存布局，没有返回 None"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return self._layouts.get(map_name)
+
+    def put(self, map_name: str, scrolled: bool, box: list[int]) -> None:
+        """记录地图在列表中的位置"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            layout = {"scrolled": scrolled, "box": [int(v) for v in box]}
+            if self._layouts.get(map_name) != layout:
+                self._layouts[map_name] = layout
+                self._save()
+
+    def invalidate(self, map_name: str) -> None:
+        """确认失败时删除该地图的缓存"""
+        with self._lock:
+            if self._layouts.pop(map_name, None) is not None:
+                self._save()
+
+
+# 全局地图列表布局缓存
+map_layout_cache = MapLayoutCache(CACHE_FILEPATH, read_resource_version())
@@ -78,7 +78,7 @@ def attack_rotate_view(context: Context, rotate_times: int = 0, interval: int =
 
     Args:
         context: 控制器上下文
-        rotate_times: 旋转次数，rotate_times >= 0，0为不限次数
+        rotate_times: 旋转次数，rotate_times >= 0，0为不限次数（直到任务停止）
         interval: 每次旋转的间隔，interval >= 1
 
     Returns: 是否成功
@@ -90,8 +90,8 @@ def attack_rotate_view(context: Context, rotate_times: int = 0, interval: int =
 
     # 旋转视角
     if rotate_times == 0:
-        # 不限次数的情况下进行持续旋转
-        while True:
+        # 不限次数的情况下进行持续旋转 | 需要同时做其他检测时请使用 battle_supervisor
+        while not context.tasker.stopping:
             # 滑动时间：1，触控点：1
             context.tasker.controller.post_swipe(708, 273, 581, 273, 500, 1, 1).wait()
             time.sleep(interval)
@@ -104,18 +104,20 @@ def attack_rotate_view(context: Context, rotate_times: int = 0, interval: int =
     return True
 
 
-def check_alive(context: Context, only_check: bool = False) -> bool:
+def check_alive(context: Context, only_check: bool = False, img: numpy.ndarray | None = None) -> bool:
     """
     检测是否存活 | 一般10秒检测一次就行
 
     Args:
         context: 控制器上下文
         only_check: 是否只检测而不复活，默认否
+        img: 已有的截图，不传则重新截图
 
     Returns: only_check=True时返回是否活着；only_check=False时返回无意义
 
     """
-    img: numpy.ndarray = context.tasker.controller.post_screencap().wait().get()
+    if img is None:
+        img = context.tasker.controller.post_screencap().wait().get()
     detail: RecognitionDetail | None = context.run_recognition("点击就近复活按钮", img)
     if detail and not detail.hit:
         # 未识别到复活按钮 | 说明还活蹦乱跳的
@@ -7,6 +7,7 @@ from typing import Callable, Protocol, Any
 from maa.context import Context
 from maa.custom_action import CustomAction
 
+from agent.custom.general.precondition import MainPageToken, precondition_engine
 from agent.logger import logger
 
 
@@ -14,12 +15,15 @@ class ExitPowerSaveFunc(Protocol):
     def __call__(self, context: Context) -> Any: ...
 
 
-def default_exit_power_save(context: Context) -> None:
+def default_exit_power_save(context: Context, token: MainPageToken | None = None) -> None:
     """默认的退出省电模式逻辑
 
     Args:
         context (Context): 当前上下文
+        token (MainPageToken | None): 主页面凭证，仍然有效时说明不在省电模式，直接跳过
     """
+    if precondition_engine.get(context).is_valid(token):
+        return
     try:
         # 示例：
         img = context.tasker.controller.post_screencap().wait().get()
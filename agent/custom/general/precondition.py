@@ -0,0 +1,174 @@
+"""动作前置条件：一张截图判断省电模式 + 主页面，确认在主页面后发放凭证，之后的辅助函数凭凭证跳过重复检测。"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable
+
+import numpy
+from maa.context import Context, RecognitionDetail
+from maa.custom_action import CustomAction
+
+from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
+from agent.logger import logger
+from agent.utils.controller_scope import PerController
+
+# 画面分类
+POWER_SAVE = "power_save"
+MAIN_PAGE = "main_page"
+OTHER = "other"
+
+# 主页面凭证的有效期（秒） | 超过后不能再跳过检测，期间有点击 / 按键的调用方不应该再传凭证
+MAIN_PAGE_TOKEN_TTL = 5.0
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class MainPageToken:
+    """
+    主页面已确认的凭证
+
+    Attributes:
+        frame_index: 确认时的截图序号
+        verified_at: 确认时间（单调时钟）
+        frame: 确认时的截图，后续只需要主页面截图的识别可以直接复用
+    """
+
+    frame_index: int
+    verified_at: float
+    frame: numpy.ndarray
+
+
+class PreconditionEngine:
+    """
+    一张截图判断当前画面是 省电模式 / 主页面 / 其他，只执行需要的恢复步骤
+
+    原来的 exit_power_saving_mode + ensure_main_page 两个装饰器各截一次图各识别一次，
+    这里在主页面时只需要一张截图一次识别。
+    """
+
+    def __init__(self) -> None:
+        self.frame_index = 0
+        self.token: MainPageToken | None = None
+        # 截图序号和凭证的更新加锁，截图本身不在锁内
+        self._lock = threading.Lock()
+
+    def capture(self, context: Context) -> numpy.ndarray:
+        """截图并递增截图序号"""
+        with self._lock:
+            self.frame_index += 1
+        return context.tasker.controller.post_screencap().wait().get()
+
+    def classify(self, context: Context, img: numpy.ndarray) -> str:
+        """
+        判断画面类型，主页面最常见所以先识别主页面
+
+        Returns:
+            POWER_SAVE / MAIN_PAGE / OTHER
+        """
+        main_page: RecognitionDetail | None = context.run_recognition("图片识别是否在主页面", img)
+        if main_page and main_page.hit:
+            return MAIN_PAGE
+        power_save: RecognitionDetail | None = context.run_recognition("识别是否在省电模式", img)
+        if power_save and power_save.hit:
+            return POWER_SAVE
+        return OTHER
+
+    def is_valid(self, token: MainPageToken | None) -> bool:
+        """凭证是否是最新的且仍在有效期内"""
+        return (
+            token is not None
+            and token is self.token
+            and time.monotonic() - token.verified_at <= MAIN_PAGE_TOKEN_TTL
+        )
+
+    def issue(self, img: numpy.ndarray) -> MainPageToken:
+        """刚刚用 img 确认了在主页面，发放新的凭证"""
+        with self._lock:
+            self.token = MainPageToken(self.frame_index, time.monotonic(), img)
+            return self.token
+
+    def invalidate(self) -> None:
+        """画面已经离开主页面"""
+        with self._lock:
+            self.token = None
+
+    def ensure(
+        self,
+        context: Context,
+        max_retry: int = 10,
+        interval_sec: float = 1.0,
+        strict: bool = False,
+    ) -> MainPageToken | None:
+        """
+        退出省电模式并回到主页面
+
+        Args:
+            context: 控制器上下文
+            max_retry: 最大重试次数（截图判断的最多次数）
+            interval_sec: 按返回键之后的等待秒数
+            strict: True 时若最终仍未回到主页面则抛出异常
+
+        Returns:
+            主页面凭证，失败或被停止返回 None
+        """
+        for _ in range(max_retry):
+            if context.tasker.stopping:
+                return None
+            img = self.capture(context)
+            state = self.classify(context, img)
+            if state == MAIN_PAGE:
+                token = self.issue(img)
+                logger.info("[Precondition] 已在主页面（截图 #{}）", token.frame_index)
+                return token
+            self.invalidate()
+            if state == POWER_SAVE:
+                logger.debug("[Precondition] 尝试退出省电模式")
+                context.run_task(entry="从省电模式唤醒")
+                continue
+            context.tasker.controller.post_click_key(ANDROID_KEY_EVENT_DATA["KEYCODE_ESCAPE"]).wait()
+            time.sleep(max(0.0, interval_sec))
+
+        msg = "[Precondition] 无法回到主页面，已达到最大尝试次数"
+        logger.error(msg)
+        if strict:
+            raise RuntimeError(msg)
+        return None
+
+
+# 全局前置条件引擎 | 每个控制器一份，凭证只对发放它的控制器有效
+precondition_engine = PerController(PreconditionEngine)
+
+
+def ensure_ready(
+    max_retry: int = 10,
+    interval_sec: float = 1.0,
+    strict: bool = False,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """方法装饰器：在 run 执行前退出省电模式并回到主页面，替代叠加 exit_power_saving_mode + ensure_main_page。
+
+    run 中可以通过 precondition_engine.get(context).token 取得主页面凭证，传给支持凭证的辅助函数跳过重复检测。
+
+    Args:
+        max_retry: 最大重试次数。
+        interval_sec: 按返回键之后的等待秒数。
+        strict: True 时若最终仍未回到主页面则抛出异常；
+                False 时仅记录错误日志后继续执行被装饰的方法。
+    """
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(self: CustomAction, context: Context, *args: Any, **kwargs: Any):
+            try:
+                precondition_engine.get(context).ensure(context, max_retry, interval_sec, strict)
+            except Exception as exc:
+                logger.exception(f"[Precondition] 执行前置条件失败: {exc}")
+                if strict:
+                    raise
+            return fn(self, context, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
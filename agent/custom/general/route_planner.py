@@ -0,0 +1,198 @@
+"""会话级位置追踪 + 传送/导航路线规划。"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from agent.logger import logger
+from agent.utils.controller_scope import PerController
+
+# 各类操作的默认耗时（秒），实际执行后按指数滑动平均更新
+# 默认值只用于估计总耗时，相关耗时都实测过之前不会规划中转路线
+DEFAULT_COSTS = {
+    # 按 M 打开地图并确认
+    "open_map": 4.0,
+    # 打开地图后展开地图列表、OCR、点击地图（不含打开地图）
+    "switch_map": 6.0,
+    # 点击传送按钮到回到主页面
+    "teleport": 12.0,
+    # 同一张地图内导航，每像素（地图界面坐标）耗时
+    "navigate_px": 0.1,
+    # 起点未知时导航到达目的地点的耗时
+    "navigate_unknown": 60.0,
+}
+# 滑动平均系数 | 新测量值的权重
+COST_SMOOTHING = 0.3
+# 位置记录有效期（秒） | 超过后视为未知，防止两次任务之间手动移动了角色
+LOCATION_TTL = 15 * 60
+
+
+@dataclass(slots=True)
+class RoutePlan:
+    """
+    路线规划结果
+
+    Attributes:
+        skip: 已经在目的地点，无需任何操作
+        switch_map: 是否需要切换地图
+        via: 导航前先传送到的传送点，None 表示直接前往
+        estimated_cost: 预估耗时（秒）
+    """
+
+    skip: bool = False
+    switch_map: bool = True
+    via: str | None = None
+    estimated_cost: float = 0.0
+
+
+def _distance(a: dict, b: dict) -> float:
+    return math.hypot(a["x"] - b["x"], a["y"] - b["y"])
+
+
+class LocationTracker:
+    """
+    会话级位置追踪：每次传送成功 / 导航确认到达后更新当前所在地图和地点，并记录各类操作的实测耗时
+
+    导航只有在调用方确认到达（例如识别到入口按钮）后才算在地点上，调用方移动角色后需要调用 left_point。
+    """
+
+    def __init__(self) -> None:
+        # 位置记录的读写加锁，多个线程同时导航时不会读到一半更新的状态
+        self._lock = threading.RLock()
+        self.map_name: str | None = None
+        self.point: str | None = None
+        self.point_xy: dict | None = None
+        self.at_point = False
+        self.updated_at = 0.0
+        self.costs = dict(DEFAULT_COSTS)
+        # 已经有实测值的耗时类型
+        self.measured: set[str] = set()
+        # 进行中的导航：(地图, 地点, 坐标, 起点坐标, 开始时间)
+        self._pending_navigation: tuple[str, str, dict, dict | None, float] | None = None
+
+    @property
+    def fresh(self) -> bool:
+        """位置记录是否仍在有效期内"""
+        with self._lock:
+            return self.map_name is not None and time.time() - self.updated_at <= LOCATION_TTL
+
+    @property
+    def current_map(self) -> str | None:
+        """当前所在地图，未知返回 None"""
+        with self._lock:
+            return self.map_name if self.fresh else None
+
+    def record_cost(self, kind: str, seconds: float) -> None:
+        """记录一次操作的实测耗时"""
+        with self._lock:
+            # 第一次实测直接替换默认值
+            previous = self.costs.get(kind) if kind in self.measured else None
+            self.measured.add(kind)
+            self.costs[kind] = seconds if previous is None else previous + COST_SMOOTHING * (seconds - previous)
+
+    def update(self, map_name: str, point: str | None = None, point_xy: dict | None = None, at_point: bool = True) -> None:
+        """传送成功后更新当前位置"""
+        with self._lock:
+            self.map_name = map_name
+            self.point = point
+            self.point_xy = point_xy
+            self.at_point = at_point and point is not None
+            self.updated_at = time.time()
+            self._pending_navigation = None
+
+    def start_navigation(self, map_name: str, point: str, point_xy: dict) -> None:
+        """导航开始后记录目的地，等待调用方确认到达"""
+        with self._lock:
+            start_xy = self.point_xy if self.current_map == map_name else None
+            self._pending_navigation = (map_name, point, point_xy, start_xy, time.time())
+            # 到达之前只能确定在目标地图上
+            self.map_name = map_name
+            self.point = None
+            self.point_xy = None
+            self.at_point = False
+            self.updated_at = time.time()
+
+    def arrive(self) -> None:
+        """调用方确认已经到达导航目的地点，同时记录导航耗时"""
+        with self._lock:
+            if self._pending_navigation is None:
+                return
+            map_name, point, point_xy, start_xy, start_time = self._pending_navigation
+            elapsed = time.time() - start_time
+            if start_xy is not None:
+                self.record_cost("navigate_px", elapsed / max(1.0, _distance(start_xy, point_xy)))
+            else:
+                self.record_cost("navigate_unknown", elapsed)
+            self.update(map_name, point, point_xy)
+            logger.debug("[位置追踪] 已到达 {}：{}，导航耗时 {:.1f} 秒", map_name, point, elapsed)
+
+    def left_point(self) -> None:
+        """角色离开了记录的地点（走动 / 进副本等），仍然认为在同一张地图上"""
+        with self._lock:
+            self.at_point = False
+            self._pending_navigation = None
+
+    def invalidate(self) -> None:
+        """位置未知（重启游戏 / 传送失败等）"""
+        with self._lock:
+            self.map_name = None
+            self.point = None
+            self.point_xy = None
+            self.at_point = False
+            self._pending_navigation = None
+
+    def plan(self, dest_map: str, dest_point: str, type_str: str, point_data: dict, teleport_data: dict) -> RoutePlan:
+        """
+        规划到达目的地点的路线
+
+        Args:
+            dest_map: 目的地图
+            dest_point: 目的地点
+            type_str: 类型：传送 | 导航
+            point_data: 目的地点所在的地点数据MAP
+            teleport_data: 可用于中转的传送点数据MAP
+
+        Returns:
+            路线规划结果
+        """
+        with self._lock:
+            costs = self.costs
+            current_map = self.current_map
+            if current_map == dest_map and self.at_point and self.point == dest_point:
+                return RoutePlan(skip=True)
+
+            need_switch = current_map != dest_map
+            open_cost = costs["open_map"] + (costs["switch_map"] if need_switch else 0.0)
+            if type_str != "导航":
+                return RoutePlan(switch_map=need_switch, estimated_cost=open_cost + costs["teleport"])
+
+            dest_xy = point_data[dest_map][dest_point]
+            if not need_switch and self.point_xy is not None:
+                direct_kind = "navigate_px"
+                direct_cost = open_cost + costs["navigate_px"] * _distance(self.point_xy, dest_xy)
+            else:
+                direct_kind = "navigate_unknown"
+                direct_cost = open_cost + costs["navigate_unknown"]
+            plan = RoutePlan(switch_map=need_switch, estimated_cost=direct_cost)
+            if not {"teleport", "navigate_px", direct_kind} <= self.measured:
+                # 还在用默认耗时：保持直接导航，等实测数据说明中转更快再规划中转
+                return plan
+
+            # 先传送到离目的地点最近的传送点再导航 | 第二段已经在目标地图上，不需要再切换地图
+            for via_point, via_xy in teleport_data.get(dest_map, {}).items():
+                via_cost = (
+                    open_cost
+                    + costs["teleport"]
+                    + costs["open_map"]
+                    + costs["navigate_px"] * _distance(via_xy, dest_xy)
+                )
+                if via_cost < plan.estimated_cost:
+                    plan = RoutePlan(switch_map=need_switch, via=via_point, estimated_cost=via_cost)
+            return plan
+
+
+# 全局位置追踪 | 每个控制器一份，同一个控制器上的所有任务共用
+location_tracker = PerController(LocationTracker)
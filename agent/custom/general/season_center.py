@@ -8,15 +8,16 @@ from maa.custom_action import CustomAction
 
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
 from agent.logger import logger
-from .general import ensure_main_page
+from agent.utils.event_stream import track_task
 from .power_saving_mode import exit_power_saving_mode
+from .precondition import ensure_ready
 
 
 # 打开赛季中心页面
 @AgentServer.custom_action("open_season_center_page")
 class OpenSeasonCenterAction(CustomAction):
-    @exit_power_saving_mode()
-    @ensure_main_page(strict=True)
+    @track_task("open_season_center_page")
+    @ensure_ready(strict=True)
     def run(
         self,
         context: Context,
@@ -43,8 +44,8 @@ class OpenSeasonCenterAction(CustomAction):
 # 领取今日活跃度奖励
 @AgentServer.custom_action("claim_today_activity_rewards")
 class ClaimDailyActivityRewardAction(CustomAction):
-    @exit_power_saving_mode()
-    @ensure_main_page(strict=True)
+    @track_task("claim_today_activity_rewards")
+    @ensure_ready(strict=True)
     def run(
         self,
         context: Context,
@@ -66,8 +67,8 @@ class ClaimDailyActivityRewardAction(CustomAction):
 # 打开补偿商店页面
 @AgentServer.custom_action("open_compensation_shop_page")
 class OpenCompensationShopAction(CustomAction):
-    @exit_power_saving_mode()
-    @ensure_main_page(strict=True)
+    @track_task("open_compensation_shop_page")
+    @ensure_ready(strict=True)
     def run(
         self,
         context: Context,
@@ -93,6 +94,7 @@ class OpenCompensationShopAction(CustomAction):
 # 在玩法补偿商店页面购买所有可购买的补偿商品
 @AgentServer.custom_action("buy_all_gameplay_compensation_shop_items")
 class BuyAllGameplayCompensationShopItemsAction(CustomAction):
+    @track_task("buy_all_gameplay_compensation_shop_items")
     @exit_power_saving_mode()
     def run(
         self,
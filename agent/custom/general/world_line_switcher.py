@@ -7,14 +7,18 @@ from maa.custom_action import CustomAction
 
 from agent.attach.common_attach import get_area_change_timeout, get_world_line_id_list
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
+from agent.custom.general.line_selector import line_selector
 from agent.custom.general.power_saving_mode import default_exit_power_save
+from agent.custom.general.precondition import precondition_engine
 from agent.logger import logger
+from agent.utils.event_stream import controller, recovery, track_task
 
 
 # 切换分线
 @AgentServer.custom_action("SwitchLine")
 class SwitchLineAction(CustomAction):
 
+    @track_task("SwitchLine")
     def run(
         self,
         context: Context,
@@ -23,13 +27,18 @@ class SwitchLineAction(CustomAction):
         line_list = get_world_line_id_list(context)
         return switch_line(context, line_list)
 
-def switch_line(context: Context, line_list: list[str]) -> bool:
+
+@track_task("switch_line")
+def switch_line(context: Context, line_list: list[str], purpose: str | None = None) -> bool:
     """
     尝试根据列表切换分线，直到成功或列表为空
 
+    备选分线会先按历史结果排序（见 line_selector），每次尝试的结果和场景加载耗时都会被记录。
+
     Args:
         context: 控制器上下文
         line_list: 备选分线列表
+        purpose: 切线的业务结果类型，例如 line_selector.FISHING，用于排序
 
     Returns: 是否完成
 
@@ -40,10 +49,12 @@ def switch_line(context: Context, line_list: list[str]) -> bool:
 
     # 是否正在尝试切换
     is_trying = False
+    line_str = ""
 
-    default_exit_power_save(context)
+    # 调用方刚确认过主页面（例如钓鱼台满人时先回到主页面）就不用再截图检测省电模式
+    default_exit_power_save(context, precondition_engine.get(context).token)
 
-    for line_str in line_list:
+    for line_str in line_selector.rank(context, line_list, purpose):
         if context.tasker.stopping:
             return True
         # 按 P 键打开分线列表
@@ -53,6 +64,7 @@ def switch_line(context: Context, line_list: list[str]) -> bool:
         context.tasker.controller.post_click(989, 672).wait()
         time.sleep(3)
         # 输入分线名称
+        controller("switch_line", "input_text", line=line_str)
         context.run_action("输入聊天框内容", pipeline_override={
             "输入聊天框内容": {
                 "action": {
@@ -79,10 +91,15 @@ def switch_line(context: Context, line_list: list[str]) -> bool:
         if detail and not detail.hit:
             is_trying = True
             break
+        # 前往当前所在的分线本来就会失败，不计入这条分线的切换结果
+        if line_str != line_selector.current_line(context):
+            line_selector.record_switch(context, line_str, False)
+        recovery("switch_line", "try_next_line", line=line_str)
 
     # 切换失败
     if not is_trying:
         logger.error(f"分线列表中所有分线均切换失败！")
+        recovery("switch_line", "all_lines_failed", lines=len(line_list))
         # 切换失败了需要再按一下 P 返回
         context.tasker.controller.post_click_key(ANDROID_KEY_EVENT_DATA["KEYCODE_P"]).wait()
         time.sleep(1)
@@ -100,10 +117,16 @@ def switch_line(context: Context, line_list: list[str]) -> bool:
         if area_change_result and area_change_result.hit:
             del area_change_result, img
             logger.info(f"检测到已经成功切换场景，分线切换已完成！")
+            line_selector.record_switch(context, line_str, True, time.time() - start_time)
             return True
         del area_change_result, img
         time.sleep(2)
 
+    if context.tasker.stopping:
+        return False
+
     # 超时场景未切换完成
     logger.error(f"切换场景超时，未检测到主页面，请检查应用状态！")
+    line_selector.record_switch(context, line_str, False)
+    line_selector.invalidate_current(context)
     return False
@@ -1,24 +1,34 @@
 import time
+from typing import Callable
 
 import numpy
 from maa.agent.agent_server import AgentServer
 from maa.context import Context, RecognitionDetail, Rect
 from maa.custom_action import CustomAction
-from rapidfuzz import fuzz
 
 from agent.attach.common_attach import get_dest_tele_map, get_dest_navigate_point, get_dest_tele_point, \
     get_dest_navi_map
 from agent.constant.key_event import ANDROID_KEY_EVENT_DATA
-from agent.constant.map_point import MAP_POINT_DATA, NAVIGATE_DATA
+from agent.constant.map_point import MAP_POINT_DATA, NAVIGATE_DATA, find_point_map
+from agent.constant.ocr_confusion import OCR_CONFUSION
 from agent.custom.app_manage_action import get_area_change_timeout
 from agent.custom.general.general import default_ensure_main_page
 from agent.custom.general.power_saving_mode import exit_power_saving_mode
+from agent.custom.general.line_selector import line_selector
+from agent.custom.general.map_layout_cache import MAP_LIST_ROI, confirm_roi, map_layout_cache
+from agent.custom.general.route_planner import location_tracker
 from agent.logger import logger
+from agent.utils.event_stream import recognition, recovery, track_task
+from agent.utils.fuzzy_utils import score_batch
+
+# 位置记录显示已在目的地点时，调用方用画面确认的超时时间（秒）
+ARRIVAL_CONFIRM_TIMEOUT = 4
 
 
 @AgentServer.custom_action("TeleportPoint")
 class TeleportPointAction(CustomAction):
 
+    @track_task("TeleportPoint")
     @exit_power_saving_mode()
     def run(
         self,
@@ -37,6 +47,7 @@ class TeleportPointAction(CustomAction):
 @AgentServer.custom_action("NavigatePoint")
 class NavigatePointAction(CustomAction):
 
+    @track_task("NavigatePoint")
     @exit_power_saving_mode()
     def run(
         self,
@@ -52,7 +63,15 @@ class NavigatePointAction(CustomAction):
         return teleport_or_navigate(context, dest_map, dest_navigate_point, "导航", NAVIGATE_DATA)
 
 
-def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str, type_str: str, point_data: dict) -> bool:
+@track_task("teleport_or_navigate")
+def teleport_or_navigate(
+    context: Context,
+    dest_map: str | None,
+    dest_point: str,
+    type_str: str,
+    point_data: dict,
+    confirm: Callable[[Context], bool] | None = None,
+) -> bool:
     """
     传送 或者 导航
     
@@ -62,6 +81,8 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
         dest_point: 目的地点
         type_str: 类型：传送 | 导航
         point_data: 地点数据MAP
+        confirm: 从画面确认已经在目的地点的函数，例如识别入口按钮；位置记录显示已在目的地点时，
+            只有确认通过才跳过传送 / 导航，不传则总是前往
 
     Returns:
         是否成功
@@ -73,21 +94,80 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
         return False
     if dest_map is None and dest_point is not None:
         # 目的地点不为空，但目的地图为空：自动判断地图
-        for map_name, locations in point_data.items():
-            if dest_point in locations:
-                dest_map = map_name
-                break
+        dest_map = find_point_map(point_data, dest_point)
     if dest_map not in point_data:
         logger.error(f"暂不支持的地图：{dest_map}，可能是命名不同或暂未支持")
         return False
     if dest_point not in point_data[dest_map]:
         logger.error(f"暂不支持的{type_str}点：{dest_map}-{dest_point}，可能是命名不同或暂未支持")
         return False
+
+    # 根据当前位置规划路线
+    tracker = location_tracker.get(context)
+    plan = tracker.plan(dest_map, dest_point, type_str, point_data, MAP_POINT_DATA)  # type: ignore
+    if plan.skip:
+        if confirm is not None and confirm(context):
+            logger.info(f"当前已经在 [{dest_map}：{dest_point}]，无需{type_str}")
+            return True
+        # 记录之后角色可能被 pipeline 或手动移动过，画面没有确认就按不在地点上重新规划
+        logger.info(f"位置记录显示已在 [{dest_map}：{dest_point}]，但画面未确认，继续{type_str}")
+        tracker.left_point()
+        plan = tracker.plan(dest_map, dest_point, type_str, point_data, MAP_POINT_DATA)  # type: ignore
+    need_switch_map = plan.switch_map
+    if plan.via:
+        logger.info(f"路线规划：先传送至 [{dest_map}：{plan.via}] 再导航，预计耗时 {plan.estimated_cost:.0f} 秒")
+        if go_to_point(context, dest_map, plan.via, "传送", MAP_POINT_DATA, need_switch_map):  # type: ignore
+            need_switch_map = False
+            time.sleep(2)
+        else:
+            logger.warning("中转传送失败，将直接前往目的地点")
+            need_switch_map = True
+
+    success = go_to_point(context, dest_map, dest_point, type_str, point_data, need_switch_map)  # type: ignore
+    if not success and not need_switch_map and not context.tasker.stopping:
+        # 跳过了切换地图但是失败了：位置记录可能不准确，完整走一遍
+        logger.warning("按记录的位置跳过切换地图后失败，重新切换地图后再试一次")
+        success = go_to_point(context, dest_map, dest_point, type_str, point_data, True)  # type: ignore
+    return success
+
+
+def go_to_point(context: Context, dest_map: str, dest_point: str, type_str: str, point_data: dict, need_switch_map: bool = True) -> bool:
+    """
+    打开地图并传送 / 导航到指定地点，完成后更新位置追踪
+
+    Args:
+        context: 控制器上下文
+        dest_map: 目的地图
+        dest_point: 目的地点
+        type_str: 类型：传送 | 导航
+        point_data: 地点数据MAP
+        need_switch_map: 是否需要切换地图，已经在目的地图上时传 False
+
+    Returns:
+        是否成功
+    """
+    success = _go_to_point(context, dest_map, dest_point, type_str, point_data, need_switch_map)
+    if not success or need_switch_map or type_str != "导航":
+        # 换了地图或者传送后不一定还在原来的分线，业务结果不能再记到原来的分线上
+        line_selector.invalidate_current(context)
+    xy = point_data[dest_map][dest_point]
+    tracker = location_tracker.get(context)
+    if not success:
+        tracker.invalidate()
+    elif type_str == "导航":
+        tracker.start_navigation(dest_map, dest_point, xy)
+    else:
+        # 只有传送点才能确定传送后就在地点上，传送到导航点的图标附近时仍然需要再导航过去
+        tracker.update(dest_map, dest_point, xy, at_point=point_data is MAP_POINT_DATA)
+    return success
+
+
+def _go_to_point(context: Context, dest_map: str, dest_point: str, type_str: str, point_data: dict, need_switch_map: bool) -> bool:
     # 场景切换超时时间
     area_change_timeout = get_area_change_timeout(context)
 
     # 1. 切换地图
-    need_next = switch_map(context, dest_map)  # type: ignore
+    need_next = switch_map(context, dest_map, skip_map_list=not need_switch_map)
     if not need_next:
         return False
     time.sleep(2)
@@ -112,6 +192,7 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
     if is_direct_tp and not is_direct_tp.hit:
         # 3.1 不能直接过去：继续选择地点
         logger.info("无法直接过去，可能是图标重合，继续选择")
+        recovery("teleport_or_navigate", "reselect_overlapping_icon", point=dest_point)
         img = context.tasker.controller.post_screencap().wait().get()
         ocr_result: RecognitionDetail | None = context.run_recognition(
             "通用文字识别",
@@ -130,14 +211,11 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
         # 匹配图标名优先用别称
         alias = xy.get("alias", dest_point)
         # 重新用fuzzy匹配赋分 | 更安全更稳定，尤其是在背景可能变化的地图地点这里
-        for item in ocr_result.all_results:
-            score = fuzz.ratio(item.text, alias)  # type: ignore
-            item.score = score  # type: ignore
-        # 重新根据匹配分数排序
-        sorted_items = sorted(
-            ocr_result.all_results, key=lambda obj: obj.score, reverse=True  # type: ignore
-        )
-        item = sorted_items[0]
+        # 所有文本框一次性打分，取分数最高的一个；打分前归并 OCR 易混淆字符
+        items = ocr_result.all_results
+        texts = [OCR_CONFUSION.canonicalize(item.text) for item in items]  # type: ignore
+        scores = score_batch(texts, [OCR_CONFUSION.canonicalize(alias)])[:, 0]
+        item = items[int(scores.argmax())]
         rect = Rect(*item.box)  # type: ignore
         logger.info(f"目的地点： {rect}, {item.text}")  # type: ignore
         point_x = int(rect.x + rect.w / 2)
@@ -156,12 +234,14 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
 
     # 4. 点击按钮过去
     context.tasker.controller.post_click(1000, 650).wait()
+    arrive_start = time.time()
     logger.info(f"点击进行{type_str}至 [{dest_map}：{dest_point}] 等待{type_str}完成...")
     time.sleep(5)
 
     # 5. 再次识别是否已经打开地图：是就说明当前状态无法导航
     img = context.tasker.controller.post_screencap().wait().get()
     is_open_map: RecognitionDetail | None = context.run_recognition("图片识别是否已经打开地图", img)
+    recognition("teleport_or_navigate", "图片识别是否已经打开地图", bool(is_open_map and is_open_map.hit))
     if is_open_map and is_open_map.hit:
         logger.error("检测到当前状态无法导航，请检查当前是否无法上载具！")
         return False
@@ -176,6 +256,8 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
         if area_change_result and area_change_result.hit:
             del area_change_result, img
             logger.info(f"检测到已经成功切换场景，传送已完成，如果是导航请自行等待到达目的地点！")
+            if type_str != "导航":
+                location_tracker.get(context).record_cost("teleport", time.time() - arrive_start)
             return True
         del area_change_result, img
         time.sleep(2)
@@ -186,16 +268,32 @@ def teleport_or_navigate(context: Context, dest_map: str | None, dest_point: str
 
 
 # 切换地图
-def switch_map(context: Context, dest_map: str) -> bool:
+def switch_map(context: Context, dest_map: str, skip_map_list: bool = False) -> bool:
+    """
+    打开地图并切换到目的地图
+
+    Args:
+        context: 控制器上下文
+        dest_map: 目的地图
+        skip_map_list: 已经在目的地图上时传 True，只打开地图不再展开地图列表
+
+    Returns:
+        是否成功
+    """
     # 1. 打开地图
+    open_start = time.time()
     context.tasker.controller.post_click_key(ANDROID_KEY_EVENT_DATA["KEYCODE_M"]).wait()
     time.sleep(3)
 
     # 2. 是否已经打开地图了
     img = context.tasker.controller.post_screencap().wait().get()
     is_open_map: RecognitionDetail | None = context.run_recognition("图片识别是否已经打开地图", img)
-    if not is_open_map or not is_open_map.hit:
+    if is_open_map and is_open_map.hit:
+        # 只记录一次就打开的耗时，回主界面重试的耗时不代表正常情况
+        location_tracker.get(context).record_cost("open_map", time.time() - open_start)
+    else:
         logger.warning("无法检测地图左下角标识，开始尝试先回到主界面...")
+        recovery("teleport_or_navigate", "map_not_open_return_main_page")
         default_ensure_main_page(context, strict=True)
         # 再次打开地图
         context.tasker.controller.post_click_key(ANDROID_KEY_EVENT_DATA["KEYCODE_M"]).wait()
@@ -212,34 +310,48 @@ def switch_map(context: Context, dest_map: str) -> bool:
                 logger.error("仍然无法检测地图左下角标识，请检查是否在剧情中或其他异常情况！")
                 return False
 
+    if skip_map_list:
+        logger.info(f"当前已经在地图 [{dest_map}]，跳过切换地图")
+        return True
+
     # 3. 点击左下角按钮展开地图
+    list_start = time.time()
     context.tasker.controller.post_click(150, 666).wait()
     time.sleep(1)
 
-    # 4. OCR搜索地图名字并点击
-    img = context.tasker.controller.post_screencap().wait().get()
-    ocr_result: RecognitionDetail | None = context.run_recognition(
-        "通用文字识别",
-        img,
-        pipeline_override={
-            "通用文字识别": {"expected": dest_map, "roi": [13, 288, 246, 341]}
-        },
-    )
-    if not ocr_result or not ocr_result.hit:
-        # 5. 第一次识别失败：说明地图可能比较多，需要滚动一下再次识别
-        logger.info("第一次识别失败，尝试滚动后再次识别地图名字...")
-        context.tasker.controller.post_swipe(100, 606, 100, 120, 1500).wait()
-        img = context.tasker.controller.post_screencap().wait().get()
-        ocr_result: RecognitionDetail | None = context.run_recognition(
-            "通用文字识别",
-            img,
-            pipeline_override={
-                "通用文字识别": {"expected": dest_map, "roi": [13, 288, 246, 341]}
-            },
-        )
+    # 4. 有缓存的列表布局：按缓存的滚动状态直接定位，只在缓存位置附近 OCR 确认一次
+    ocr_result: RecognitionDetail | None = None
+    scrolled = False
+    layout = map_layout_cache.get(dest_map)
+    if layout:
+        if layout["scrolled"]:
+            context.tasker.controller.post_swipe(100, 606, 100, 120, 1500).wait()
+            scrolled = True
+        ocr_result = ocr_map_name(context, dest_map, confirm_roi(layout["box"]))
         if not ocr_result or not ocr_result.hit:
-            logger.error("两次识别后还是无法识别到地图名字，地图切换失败！")
-            return False
+            logger.info("地图列表缓存位置确认失败，缓存已失效，重新识别地图名字...")
+            map_layout_cache.invalidate(dest_map)
+            if scrolled:
+                # 滚回列表顶部，按完整流程重新识别
+                context.tasker.controller.post_swipe(100, 120, 100, 606, 1500).wait()
+                scrolled = False
+            ocr_result = None
+
+    # 5. 没有缓存或缓存失效：OCR搜索地图名字
+    if ocr_result is None:
+        ocr_result = ocr_map_name(context, dest_map, list(MAP_LIST_ROI))
+        if not ocr_result or not ocr_result.hit:
+            # 第一次识别失败：说明地图可能比较多，需要滚动一下再次识别
+            logger.info("第一次识别失败，尝试滚动后再次识别地图名字...")
+            recovery("teleport_or_navigate", "scroll_map_list", map=dest_map)
+            context.tasker.controller.post_swipe(100, 606, 100, 120, 1500).wait()
+            scrolled = True
+            ocr_result = ocr_map_name(context, dest_map, list(MAP_LIST_ROI))
+            if not ocr_result or not ocr_result.hit:
+                logger.error("两次识别后还是无法识别到地图名字，地图切换失败！")
+                return False
+        map_layout_cache.put(dest_map, scrolled, list(ocr_result.best_result.box))  # type: ignore
+
     # 6. 获得最好结果坐标
     item = ocr_result.best_result
     rect = Rect(*item.box)  # type: ignore
@@ -248,4 +360,17 @@ def switch_map(context: Context, dest_map: str) -> bool:
     point_y = int(rect.y + rect.h / 2)
     # 7. 选择地图
     context.tasker.controller.post_click(point_x, point_y).wait()
+    location_tracker.get(context).record_cost("switch_map", time.time() - list_start)
     return True
+
+
+def ocr_map_name(context: Context, dest_map: str, roi: list[int]) -> RecognitionDetail | None:
+    """截图并在地图列表的指定区域内 OCR 地图名字"""
+    img = context.tasker.controller.post_screencap().wait().get()
+    return context.run_recognition(
+        "通用文字识别",
+        img,
+        pipeline_override={
+            "通用文字识别": {"expected": dest_map, "roi": roi}
+        },
+    )
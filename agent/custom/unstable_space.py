@@ -6,32 +6,37 @@ from maa.custom_action import CustomAction, RecognitionDetail
 
 from agent.constant.map_point import NAVIGATE_DATA
 from agent.custom.app_manage_action import wait_for_switch
-from agent.custom.general.general import ensure_main_page
-from agent.custom.general.move_battle import ensure_into_instance, auto_attack, attack_rotate_view, check_alive
-from agent.custom.general.power_saving_mode import exit_power_saving_mode
-from agent.custom.teleport_action import teleport_or_navigate
+from agent.custom.general.battle_supervisor import STOP_EXIT_INSTANCE, supervise_instance_battle
+from agent.custom.general.move_battle import ensure_into_instance, auto_attack
+from agent.custom.general.precondition import ensure_ready
+from agent.custom.general.route_planner import location_tracker
+from agent.custom.teleport_action import ARRIVAL_CONFIRM_TIMEOUT, teleport_or_navigate
 from agent.logger import logger
+from agent.utils.event_stream import track_task
 
 
 @AgentServer.custom_action("UnstableSpacePoint")
 class UnstableSpacePointAction(CustomAction):
 
-    @exit_power_saving_mode()
-    @ensure_main_page()
+    @track_task("UnstableSpacePoint")
+    @ensure_ready()
     def run(
         self,
         context: Context,
         _,
     ) -> bool:
         # 先导航过去
-        teleport_or_navigate(context, "阿斯特里斯", "不稳定空间", "导航", NAVIGATE_DATA)
+        teleport_or_navigate(context, "阿斯特里斯", "不稳定空间", "导航", NAVIGATE_DATA,
+                             confirm=lambda c: ensure_space_entry(c, ARRIVAL_CONFIRM_TIMEOUT))
         # 循环检测进入不稳定空间的按钮
         has_entry = ensure_space_entry(context)
         if not has_entry:
             return False
+        location_tracker.get(context).arrive()
 
         # 点击进入不稳定空间
         context.tasker.controller.post_click(916, 345).wait()
+        location_tracker.get(context).left_point()
         # 选择单双人挑战
         time.sleep(2)
         context.tasker.controller.post_click(915, 591).wait()
@@ -47,26 +52,14 @@ class UnstableSpacePointAction(CustomAction):
         logger.info("打开自动战斗...")
         auto_attack(context, 1)
 
-        # 旋转3次视角防止脱仇
+        # 旋转3次视角防止脱仇，同时检测副本状态和角色存活状态
         logger.info("旋转3次视角防止脱仇然后继续战斗...")
-        attack_rotate_view(context, 3, 1)
-
-        # 开始检测副本状态和角色存活状态
-        while not context.tasker.stopping:
-            # 检测是否还在副本内
-            img = context.tasker.controller.post_screencap().wait().get()
-            is_into_instance = context.run_recognition("图片识别副本退出按钮", img)
-
-            if is_into_instance and not is_into_instance.hit:  # 不在副本内
-                # 等待场景切换完成
-                logger.info("战斗完成，等待返回主界面...")
-                wait_for_switch(context)
-                return True  # 结束任务
-
-            # 检测是否存活并复活
-            check_alive(context)
-
-            time.sleep(5)
+        reason = supervise_instance_battle(context, "UnstableSpacePoint", rotate_times=3, rotate_interval=1)
+        if reason == STOP_EXIT_INSTANCE:
+            # 等待场景切换完成
+            logger.info("战斗完成，等待返回主界面...")
+            wait_for_switch(context)
+            return True  # 结束任务
 
         logger.error("不稳定空间战斗被手动终止或者出现异常！")
         return False
@@ -96,6 +89,6 @@ def ensure_space_entry(context: Context, timeout: int = 120) -> bool:
             return True
         del ocr_result, img
         time.sleep(2)
-    logger.error("超 120 秒未到达不稳定空间的入口！")
+    logger.error(f"超 {timeout} 秒未到达不稳定空间的入口！")
     return False
 
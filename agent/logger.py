@@ -2,31 +2,112 @@
 
 from __future__ import annotations
 
+import atexit
 import sys
-from datetime import datetime
+import threading
+from pathlib import Path
+from typing import TextIO
 
 from loguru import logger as _logger
 
+# WARNING 及以上级别的日志立即刷新，不等待批量
+URGENT_LEVEL_NO = 30
+# 批量写出的时间阈值（秒）和大小阈值（字符数）
+FLUSH_INTERVAL = 0.2
+MAX_BUFFER_SIZE = 64 * 1024
 
-def sink_function(message) -> None:
+
+def format_record(record) -> str:
     """根据日志级别生成前缀并拼接消息"""
-    try:
-        record = message.record
-        level_name = record.get('level', 'INFO').name
-        prefix = level_name.lower() + ":"
-        log_time = record.get('time', datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
-        msg = record.get('message', '')
-        # 重新根据格式要求组合
-        text = f"{prefix} [{log_time}] {msg}\n"
-        sys.stdout.write(text)
-        sys.stdout.flush()
-    except Exception as e:
-        sys.stderr.write(f"error: [LOG SINK ERROR] {e}\n")
+    level_name = record["level"].name
+    log_time = record["time"].strftime('%Y-%m-%d %H:%M:%S')
+    return f"{level_name.lower()}: [{log_time}] {record['message']}\n"
+
+
+class BufferedSink:
+    """
+    批量写出的日志 sink：按时间或大小阈值合并写入，WARNING 及以上立即刷新
+
+    原 sink 每条日志都 write + flush 一次，钓鱼等热循环中大量 INFO 日志会频繁触发系统调用；
+    这里把日志先攒在内存里，由后台线程每 flush_interval 秒统一写出一次。
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_buffer_size: int = MAX_BUFFER_SIZE,
+        urgent_level_no: int = URGENT_LEVEL_NO,
+    ) -> None:
+        """
+        Args:
+            stream: 输出流，不传时每次写出都取当前的 sys.stdout
+            flush_interval: 时间阈值（秒）
+            max_buffer_size: 大小阈值（字符数）
+            urgent_level_no: 达到该级别的日志立即刷新
+        """
+        self._stream = stream
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size
+        self.urgent_level_no = urgent_level_no
+        self._buffer: list[str] = []
+        self._buffer_size = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._flush_worker, name="log-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __call__(self, message) -> None:
+        try:
+            record = message.record
+            text = format_record(record)
+            with self._lock:
+                self._buffer.append(text)
+                self._buffer_size += len(text)
+                if (
+                    self._closed.is_set()
+                    or record["level"].no >= self.urgent_level_no
+                    or self._buffer_size >= self.max_buffer_size
+                ):
+                    self._flush_locked()
+        except Exception as e:
+            sys.stderr.write(f"error: [LOG SINK ERROR] {e}\n")
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        data = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffer_size = 0
+        stream = self._stream or sys.stdout
+        stream.write(data)
+        stream.flush()
+
+    def flush(self) -> None:
+        """立即写出缓冲区中的全部日志"""
+        try:
+            with self._lock:
+                self._flush_locked()
+        except Exception as e:
+            sys.stderr.write(f"error: [LOG SINK ERROR] {e}\n")
+
+    def _flush_worker(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        """停止后台线程并写出剩余日志；关闭后的日志改为逐条直接写出"""
+        self._closed.set()
+        self.flush()
+
 
 # 重新配置默认输出，确保格式统一且线程安全。
+# enqueue=True：日志调用方只负责入队，格式化和写出都在 loguru 的后台线程中完成
 _logger.remove()
-_logger.add(
-    sink_function,
+stdout_sink = BufferedSink()
+_stdout_handler_id = _logger.add(
+    stdout_sink,
     # level="INFO",
     level="DEBUG",
     enqueue=True,
@@ -34,6 +115,64 @@ _logger.add(
     diagnose=False,
 )
 
+
+def set_log_level(level: str) -> None:
+    """
+    调整控制台输出的日志级别，低于该级别的日志在入队前就会被丢弃，不会格式化
+
+    Args:
+        level: 日志级别名，例如 "INFO"
+    """
+    global _stdout_handler_id
+    try:
+        _logger.remove(_stdout_handler_id)
+    except ValueError:
+        # 本文件被以其他模块名再次加载时会移除所有 handler，这里的 id 已经失效
+        pass
+    _stdout_handler_id = _logger.add(
+        stdout_sink,
+        level=level.upper(),
+        enqueue=True,
+        backtrace=True,
+        diagnose=False,
+    )
+
+
+def add_file_sink(
+    path: Path,
+    level: str = "DEBUG",
+    rotation: str = "20 MB",
+    retention: str = "7 days",
+    compression: str = "zip",
+) -> int:
+    """
+    额外输出到按大小轮转、压缩归档的日志文件，适合长时间挂机
+
+    Args:
+        path: 日志文件路径
+        level: 日志级别
+        rotation: 轮转条件
+        retention: 旧日志保留时长
+        compression: 旧日志压缩格式
+
+    Returns:
+        loguru handler id
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return _logger.add(
+        str(path),
+        level=level.upper(),
+        format="{level}: [{time:YYYY-MM-DD HH:mm:ss}] {message}",
+        rotation=rotation,
+        retention=retention,
+        compression=compression,
+        encoding="utf-8",
+        enqueue=True,
+        backtrace=True,
+        diagnose=False,
+    )
+
+
 logger = _logger
 
-__all__ = ["logger"]
+__all__ = ["logger", "set_log_level", "add_file_sink"]
@@ -1,65 +1,106 @@
+import argparse
 import importlib
+import importlib.metadata
+import json
+import re
 import subprocess
 import sys
+import threading
 from pathlib import Path
-import hashlib
+from contextlib import nullcontext
 from utils import print_info, print_warning, print_error, print_debug
+from utils.startup_profiler import StartupProfiler, check_startup_budget
 
 # 获取：当前目录 / 项目根目录 / wheels目录 的绝对路径
 CURRENT_DIR = Path(__file__).parent.resolve()
 PROJECT_ROOT = CURRENT_DIR.parent
 WHEELS_DIR = PROJECT_ROOT / "deps" / "wheels"
-PYPROJECT_TOML_FILEPATH = PROJECT_ROOT / "pyproject.toml"
+# 构建时生成的插件清单 | 存在时启用懒加载
+PLUGIN_MANIFEST_FILEPATH = CURRENT_DIR / "plugin_manifest.json"
 
 
-# 计算 pyproject.toml 的 hash 值，用于判断依赖是否变更
-def calculate_file_hash(file_path: Path) -> str:
-    """计算文件的 SHA256 哈希值"""
-    sha256_hash = hashlib.sha256()
-    with file_path.open("rb") as f:
-        # 逐块读取文件内容，避免一次性加载大文件
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+def normalize_dist_name(name: str) -> str:
+    """按 PEP 503 规范化包名，便于比较 wheel 文件名与已安装包的元数据"""
+    return re.sub(r"[-_.]+", "-", name).lower()
 
 
-def check_req_ready() -> bool:
-    """通过尝试 import maa 来检查依赖是否安装完成"""
-    try:
-        import maa  # noqa: F401
+def read_required_wheels(wheels_dir: Path) -> dict[str, tuple[str, Path]]:
+    """
+    从离线 wheels 目录解析出完整的依赖集合 | 该目录由 download_wheels.py 按锁定版本下载，包含全部传递依赖
+
+    Returns:
+        规范化包名 -> (版本号, wheel 文件路径)
+    """
+    required: dict[str, tuple[str, Path]] = {}
+    if not wheels_dir.exists():
+        return required
+    for wheel in wheels_dir.glob("*.whl"):
+        # wheel 文件名格式: {name}-{version}(-{build})?-{python}-{abi}-{platform}.whl
+        parts = wheel.name[:-4].split("-")
+        if len(parts) < 5:
+            continue
+        required[normalize_dist_name(parts[0])] = (parts[1], wheel)
+    return required
+
 
-        _ = maa
+def read_installed_dists(site_packages: Path) -> dict[str, str]:
+    """
+    读取独立 python 环境 site-packages 中已安装的包，只读元数据不导入任何模块
 
-        print_info("maa imported successfully")
+    Returns:
+        规范化包名 -> 版本号
+    """
+    installed: dict[str, str] = {}
+    if not site_packages.exists():
+        return installed
+    for dist in importlib.metadata.distributions(path=[str(site_packages)]):
+        name = dist.metadata["Name"]
+        if name:
+            installed[normalize_dist_name(name)] = dist.version
+    return installed
+
+
+def check_req_ready() -> bool:
+    """通过 importlib.metadata 检查 maafw 是否已安装，避免完整导入 maa 的开销"""
+    try:
+        version = importlib.metadata.version("maafw")
+        print_info(f"maafw {version} is installed")
         return True
-    except ImportError:
-        print_error("maa import failed")
+    except importlib.metadata.PackageNotFoundError:
+        print_error("maafw is not installed")
         return False
 
 
 def init_python_env():
-    """离线安装 pip, setuptools, wheel 以及项目依赖"""
-    # 判断依赖是否有变更
-    hash_file_path = PROJECT_ROOT / ".pyproject_hash"
-    current_hash = calculate_file_hash(PYPROJECT_TOML_FILEPATH)
-    previous_hash = ""
-    if hash_file_path.exists():
-        with hash_file_path.open("r") as f:
-            previous_hash = f.read().strip()
-    else:
-        print_info("首次运行，需安装依赖")
-    if current_hash == previous_hash and check_req_ready():
+    """离线增量安装依赖：只安装版本变化或缺失的包，卸载不再需要的包"""
+    embed_python_path = PROJECT_ROOT / "python"
+    site_packages = (embed_python_path / "Lib" / "site-packages").resolve()
+    managed_file_path = PROJECT_ROOT / ".python_deps.json"
+
+    # 1. 计算需要安装 / 卸载的差异
+    required = read_required_wheels(WHEELS_DIR)
+    installed = read_installed_dists(site_packages)
+    to_install = [
+        wheel for name, (version, wheel) in sorted(required.items())
+        if installed.get(name) != version
+    ]
+    # 只卸载之前由本安装器安装、且新版本不再需要的包，不动用户自己装的包
+    previous_managed: dict[str, str] = {}
+    if managed_file_path.exists():
+        try:
+            previous_managed = json.loads(managed_file_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            print_warning("已安装依赖记录文件损坏，将忽略")
+    to_remove = sorted(name for name in previous_managed if name not in required and name in installed)
+
+    if not to_install and not to_remove and check_req_ready():
         print_info("依赖未变更，跳过安装步骤")
         return
-    else:
-        print_info("依赖有变更, 需要安装/更新依赖")
-        with hash_file_path.open("w") as f:
-            f.write(current_hash)
 
     print_info(f"===== 开始安装/更新 Python 依赖 =====")
+    print_info(f"需要安装/更新 {len(to_install)} 个包，需要卸载 {len(to_remove)} 个包")
 
     # 检查 python 文件夹和可执行文件
-    embed_python_path = PROJECT_ROOT / "python"
     if not embed_python_path.exists():
         print_info("请先运行 install.py 脚本安装 Python 运行环境")
         print_info(
@@ -75,58 +116,57 @@ def init_python_env():
         )
         sys.exit(1)
 
-    # 检查 pip 安装脚本
-    get_pip_script = PROJECT_ROOT / "deps" / "get-pip.py"
-    if not get_pip_script.exists():
-        print_info("无法找到 get-pip.py，请检查 deps 文件夹是否正确")
-        print_info(
-            "Cannot find get-pip.py, please check if the deps folder is correct."
+    # 2. 没有 pip 时才需要通过 get-pip.py 引导安装
+    if "pip" not in installed:
+        get_pip_script = PROJECT_ROOT / "deps" / "get-pip.py"
+        if not get_pip_script.exists():
+            print_info("无法找到 get-pip.py，请检查 deps 文件夹是否正确")
+            print_info(
+                "Cannot find get-pip.py, please check if the deps folder is correct."
+            )
+            sys.exit(1)
+        subprocess.check_call(
+            [
+                str(python_executable),
+                str(get_pip_script),
+                "--no-index",
+                f"--find-links={WHEELS_DIR}",
+                "--no-warn-script-location",
+            ]
         )
-        sys.exit(1)
+        to_install = [wheel for wheel in to_install if normalize_dist_name(wheel.name.split("-")[0]) != "pip"]
 
-    # 安装 pip
-    subprocess.check_call(
-        [
-            str(python_executable),
-            str(get_pip_script),
-            "--no-index",
-            f"--find-links={WHEELS_DIR}",
-            "--no-warn-script-location",
-        ]
-    )
+    # 3. 卸载不再需要的包
+    if to_remove:
+        print_info(f"卸载: {', '.join(to_remove)}")
+        subprocess.check_call(
+            [str(python_executable), "-m", "pip", "uninstall", "-y", *to_remove]
+        )
 
-    # 安装 setuptools 和 wheel
-    subprocess.check_call(
-        [
-            str(python_executable),
-            "-m",
-            "pip",
-            "install",
-            "--no-index",
-            f"--find-links={WHEELS_DIR}",
-            "--no-warn-script-location",
-            "setuptools",
-            "wheel",
-        ]
-    )
+    # 4. 一次性安装差异部分 | wheels 目录已包含全部传递依赖，无需再做依赖解析
+    if to_install:
+        print_info(f"安装/更新: {', '.join(wheel.name for wheel in to_install)}")
+        subprocess.check_call(
+            [
+                str(python_executable),
+                "-m",
+                "pip",
+                "install",
+                "--no-index",
+                f"--find-links={WHEELS_DIR}",
+                "--no-deps",
+                "--no-warn-script-location",
+                *[str(wheel) for wheel in to_install],
+            ]
+        )
 
-    # 安装项目依赖
-    subprocess.check_call(
-        [
-            str(python_executable),
-            "-m",
-            "pip",
-            "install",
-            "--no-index",
-            f"--find-links={WHEELS_DIR}",
-            "--no-build-isolation",
-            "--no-warn-script-location",
-            f"{PROJECT_ROOT}",
-        ]
+    # 记录本次安装器管理的包，供下次计算需要卸载的包
+    managed_file_path.write_text(
+        json.dumps({name: version for name, (version, _) in required.items()}, indent=4),
+        encoding="utf-8",
     )
 
     # 补充独立 python 环境的 site-packages 扫描路径
-    site_packages = (PROJECT_ROOT / "python" / "Lib" / "site-packages").resolve()
     if site_packages.exists() and str(site_packages) not in sys.path:
         sys.path.insert(0, str(site_packages))
 
@@ -136,7 +176,100 @@ def init_python_env():
     print_info("===== Python 依赖安装/更新 已完成 =====")
 
 
+def validate_resource_params(manifest: dict | None = None) -> None:
+    """
+    校验资源中自定义动作的参数 | 配置错误在加载时就暴露，而不是运行到一半才报错
+
+    Args:
+        manifest: 插件清单，传入时使用清单中的参数声明，不需要导入动作模块
+    """
+    from agent.logger import logger
+    from agent.utils.param_utils import schemas_from_manifest, validate_pipeline_params
+
+    schemas = schemas_from_manifest(manifest.get("params", {})) if manifest else None
+    for resource_dir in (PROJECT_ROOT / "resource", PROJECT_ROOT / "assets" / "resource"):
+        if not resource_dir.exists():
+            continue
+        for pipeline_dir in resource_dir.glob("*/pipeline"):
+            for error in validate_pipeline_params(pipeline_dir, schemas):
+                logger.error(f"自定义动作参数配置错误: {error}")
+        break
+
+
+def load_agent_plugins(
+    manifest_path: Path | None = PLUGIN_MANIFEST_FILEPATH,
+    profiler: StartupProfiler | None = None,
+) -> dict | None:
+    """
+    加载 agent 包下的模组：有插件清单时只注册懒加载代理，否则全量导入
+
+    Args:
+        manifest_path: 插件清单路径，传 None 强制全量导入
+        profiler: 启动耗时分析器，传入时记录每个模组的加载耗时
+
+    Returns:
+        使用的插件清单，全量导入时返回 None
+    """
+    from agent.logger import logger
+    from agent.module_loader import load_plugin_manifest, load_plugins, register_lazy_plugins
+
+    manifest = load_plugin_manifest(manifest_path, PROJECT_ROOT) if manifest_path else None
+    if manifest:
+        count = register_lazy_plugins(manifest)
+        logger.info(f"> 已按插件清单注册 {count} 个懒加载代理")
+        validate_resource_params(manifest)
+        return manifest
+
+    # 加载 agent 包下所有的模块
+    for item in CURRENT_DIR.iterdir():
+        # 跳过 __pycache__
+        if item.is_dir() and item.name != "__pycache__":
+            plugins = load_plugins(str(item), f"agent.{item.name}")
+            if profiler:
+                for plugin in plugins:
+                    profiler.record_plugin(plugin.name, plugin.load_time)
+            logger.info(f"> 子模块 {item.name} 加载完成！")
+    validate_resource_params()
+    return None
+
+
+def parse_agent_args(argv: list[str]) -> tuple[str, argparse.Namespace]:
+    """
+    解析 agent 启动参数，MaaFW 传入的 identifier 总是最后一个位置参数
+
+    Returns:
+        (identifier, 启动耗时分析 / 日志相关选项)
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile-startup", action="store_true", help="记录启动耗时并输出 JSON 报告")
+    parser.add_argument(
+        "--profile-output",
+        type=Path,
+        default=Path("debug") / "startup_profile.json",
+        help="启动耗时报告的输出路径",
+    )
+    parser.add_argument(
+        "--startup-budget-ms",
+        type=float,
+        default=0,
+        help="启动耗时预算（毫秒），超出时退出并返回非 0，<= 0 表示不检查",
+    )
+    parser.add_argument("--log-level", default=None, help="控制台日志级别，默认 DEBUG")
+    parser.add_argument("--log-file", type=Path, default=None, help="额外输出到按大小轮转并压缩的日志文件")
+    options, rest = parser.parse_known_args(argv[1:])
+    identifier = rest[-1] if rest else argv[-1]
+    return identifier, options
+
+
 def main():
+    identifier, options = parse_agent_args(sys.argv)
+    profiler = StartupProfiler() if options.profile_startup else None
+    if profiler:
+        profiler.install()
+
+    def phase(name: str):
+        return profiler.phase(name) if profiler else nullcontext()
+
     # 开发时应当注释下面这行, 编译时自动解除注释
     # init_python_env()
 
@@ -144,27 +277,49 @@ def main():
         sys.path.insert(0, str(PROJECT_ROOT))
 
     # 导入MAA工具
-    from maa.agent.agent_server import AgentServer
-    from maa.toolkit import Toolkit
+    with phase("import maa"):
+        from maa.agent.agent_server import AgentServer
+        from maa.toolkit import Toolkit
 
     # 导入基础包
-    from agent.logger import logger
-    from agent.module_loader import load_plugins
+    from agent.logger import logger, set_log_level, add_file_sink
+    from agent.module_loader import preload_lazy_plugins
+
+    if options.log_level:
+        set_log_level(options.log_level)
+    if options.log_file:
+        add_file_sink(options.log_file)
 
     logger.info("===== 开始初始化MAA程序 =====")
 
-    # 加载 agent 包下所有的模块
-    for item in CURRENT_DIR.iterdir():
-        # 跳过 __pycache__
-        if item.is_dir() and item.name != "__pycache__":
-            load_plugins(str(item), f"agent.{item.name}")
-            logger.info(f"> 子模块 {item.name} 加载完成！")
+    with phase("load_plugins"):
+        manifest = load_agent_plugins(profiler=profiler)
 
     logger.info("===== MAA程序初始化完成 =====")
 
     # 启动MAA主程序
-    Toolkit.init_option("./")
-    AgentServer.start_up(sys.argv[-1])
+    with phase("Toolkit.init_option"):
+        Toolkit.init_option("./")
+    with phase("AgentServer.start_up"):
+        AgentServer.start_up(identifier)
+
+    # 输出启动耗时报告，超出预算时直接失败
+    if profiler:
+        profiler.uninstall()
+        report = profiler.write_report(options.profile_output)
+        logger.info(f"启动耗时 {report['total_ms']}ms，报告已写入: {options.profile_output}")
+        over_budget = check_startup_budget(report, options.startup_budget_ms)
+        if over_budget:
+            logger.error(over_budget)
+            AgentServer.shut_down()
+            sys.exit(1)
+
+    # 懒加载模式下，启动完成后再在后台预热模组 | 资源参数已经在 start_up 之前按清单校验过
+    if manifest:
+        threading.Thread(
+            target=preload_lazy_plugins, args=(manifest,), name="plugin-warm-up", daemon=True
+        ).start()
+
     AgentServer.join()
     AgentServer.shut_down()
 
@@ -1,16 +1,24 @@
 """类似 NoneBot 的模组加载器"""
+import ast
 import importlib
+import json
 import os
 import re
-from typing import Set, Optional
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Set, Optional, Tuple
 
-from logger import logger
+from agent.logger import logger
 
 
 class Plugin:
-    def __init__(self, name: str, module):
+    def __init__(self, name: str, module, load_time: float = 0.0):
         self.name = name
         self.module = module
+        # 导入耗时（秒）
+        self.load_time = load_time
 
     def __repr__(self):
         return f"<Plugin name={self.name}>"
@@ -19,11 +27,13 @@ class Plugin:
 def load_plugin(module_name: str, no_fast: bool = False) -> Optional[Plugin]:
     """加载单个模组模块"""
     try:
+        start = time.perf_counter()
         module = importlib.import_module(module_name)
+        load_time = time.perf_counter() - start
         if no_fast and getattr(module, "fast", False):
             return None
         logger.info(f"Load {module_name} successfully.")
-        return Plugin(module_name, module)
+        return Plugin(module_name, module, load_time)
     except Exception as e:
         logger.error(f"Load {module_name} failed: {e}")
         return None
@@ -81,3 +91,265 @@ def load_plugins(plugin_dir: str,
                 loaded_plugins.add(plugin)
 
     return loaded_plugins
+
+
+# ===================== 懒加载插件注册表 =====================
+# 构建时扫描 @AgentServer.custom_action / custom_recognition 装饰器生成清单，
+# 运行时先注册轻量代理，首次调用时才导入真正的模块，缩短 agent 启动时间。
+# 清单中同时记录各动作的参数声明，启动时不导入动作模块也能校验 pipeline 参数。
+
+PLUGIN_MANIFEST_VERSION = 2
+
+# 参数声明中支持静态提取的字段类型
+_PARAM_TYPE_NAMES = {"int", "float", "bool", "str", "list"}
+
+# 装饰器方法名 -> 清单中的分类
+_DECORATOR_KINDS = {
+    "custom_action": "actions",
+    "custom_recognition": "recognitions",
+}
+
+# 已解析出的真实实例：(分类, 名称) -> 实例
+_resolved_plugins: Dict[Tuple[str, str], Any] = {}
+# 导入真实模块时的全局锁 | 截获注册期间需要临时替换 AgentServer 的注册方法
+_resolve_lock = threading.RLock()
+
+
+def _decorator_registration(decorator: ast.expr) -> Optional[Tuple[str, str]]:
+    """解析形如 @AgentServer.custom_action("name") 的装饰器，返回 (分类, 名称)"""
+    if not isinstance(decorator, ast.Call) or not isinstance(decorator.func, ast.Attribute):
+        return None
+    kind = _DECORATOR_KINDS.get(decorator.func.attr)
+    if not kind or not decorator.args:
+        return None
+    name_node = decorator.args[0]
+    if not isinstance(name_node, ast.Constant) or not isinstance(name_node.value, str):
+        return None
+    return kind, name_node.value
+
+
+def _param_field(call: ast.expr) -> Optional[Dict[str, Any]]:
+    """解析形如 ParamField("name", int, default=0) 的调用，返回清单中的字段声明；无法静态确定时返回 None"""
+    if not isinstance(call, ast.Call) or getattr(call.func, "id", None) != "ParamField" or not call.args:
+        return None
+    name_node = call.args[0]
+    if not isinstance(name_node, ast.Constant) or not isinstance(name_node.value, str):
+        return None
+    keywords = {keyword.arg: keyword.value for keyword in call.keywords}
+    type_node = call.args[1] if len(call.args) > 1 else keywords.get("type")
+    type_name = getattr(type_node, "id", None) if type_node is not None else "str"
+    item_type_node = keywords.get("item_type")
+    item_type = getattr(item_type_node, "id", None) if item_type_node is not None else None
+    if type_name not in _PARAM_TYPE_NAMES or (item_type_node is not None and item_type not in _PARAM_TYPE_NAMES):
+        return None
+    choices = None
+    if "choices" in keywords:
+        try:
+            choices = list(ast.literal_eval(keywords["choices"]))
+        except ValueError:
+            return None
+    return {
+        "name": name_node.value,
+        "type": type_name,
+        # 只需要知道是否必填，默认值本身不参与校验
+        "required": len(call.args) < 3 and "default" not in keywords,
+        "choices": choices,
+        "item_type": item_type,
+    }
+
+
+def _param_schema(call: ast.expr) -> Optional[Tuple[str, list]]:
+    """解析形如 ParamSchema("动作名", ParamField(...), ...) 的调用，返回 (动作名, 字段声明列表)"""
+    if not isinstance(call, ast.Call) or getattr(call.func, "id", None) != "ParamSchema" or not call.args:
+        return None
+    name_node = call.args[0]
+    if not isinstance(name_node, ast.Constant) or not isinstance(name_node.value, str):
+        return None
+    fields = [_param_field(arg) for arg in call.args[1:]]
+    if None in fields:
+        logger.warning(f"动作 {name_node.value} 的参数声明无法静态解析，启动时不校验其参数")
+        return None
+    return name_node.value, fields
+
+
+def scan_plugin_registrations(agent_dir: Path, module_prefix: str = "agent") -> Dict[str, Any]:
+    """
+    静态扫描 agent 目录下所有模块的注册装饰器和参数声明，不导入任何模块
+
+    Args:
+        agent_dir: agent 目录
+        module_prefix: 模块导入前缀
+
+    Returns:
+        插件清单: {"version": 2, "actions": {名称: {"module", "class"}}, "recognitions": {...},
+                   "params": {动作名: [字段声明]}}
+    """
+    manifest: Dict[str, Any] = {
+        "version": PLUGIN_MANIFEST_VERSION, "actions": {}, "recognitions": {}, "params": {},
+    }
+    for path in sorted(agent_dir.rglob("*.py")):
+        relative = path.relative_to(agent_dir).with_suffix("")
+        if any(part.startswith("_") for part in relative.parts):
+            continue
+        module_name = ".".join((module_prefix, *relative.parts))
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        for node in tree.body:
+            if isinstance(node, ast.Assign):
+                schema = _param_schema(node.value)
+                if schema:
+                    manifest["params"][schema[0]] = schema[1]
+                continue
+            if not isinstance(node, ast.ClassDef):
+                continue
+            for decorator in node.decorator_list:
+                registration = _decorator_registration(decorator)
+                if not registration:
+                    continue
+                kind, name = registration
+                if name in manifest[kind]:
+                    raise ValueError(f"重复注册的插件名: {name} ({module_name} / {manifest[kind][name]['module']})")
+                manifest[kind][name] = {"module": module_name, "class": node.name}
+    return manifest
+
+
+def write_plugin_manifest(agent_dir: Path, manifest_path: Path, module_prefix: str = "agent") -> Dict[str, Any]:
+    """扫描并写出插件清单文件，供构建脚本调用"""
+    manifest = scan_plugin_registrations(agent_dir, module_prefix)
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=4), encoding="utf-8")
+    return manifest
+
+
+def load_plugin_manifest(manifest_path: Path, project_root: Path) -> Optional[Dict[str, Any]]:
+    """
+    读取插件清单，清单缺失、版本不符或引用的模块文件不存在时返回 None
+
+    Args:
+        manifest_path: 清单文件路径
+        project_root: 项目根目录，用于检查清单中的模块文件是否存在
+
+    Returns:
+        插件清单 或 None
+    """
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"插件清单读取失败，将全量加载模组: {e}")
+        return None
+    if manifest.get("version") != PLUGIN_MANIFEST_VERSION:
+        logger.warning("插件清单版本不符，将全量加载模组")
+        return None
+    modules = {entry["module"] for kind in _DECORATOR_KINDS.values() for entry in manifest.get(kind, {}).values()}
+    for module_name in modules:
+        if not (project_root / Path(*module_name.split("."))).with_suffix(".py").exists():
+            logger.warning(f"插件清单已过期，找不到模块 {module_name}，将全量加载模组")
+            return None
+    return manifest
+
+
+@contextmanager
+def _capture_registrations():
+    """导入真实模块期间截获 AgentServer 的注册调用，把实例交给代理而不是重复注册"""
+    from maa.agent.agent_server import AgentServer
+
+    def capture(kind: str):
+        def register(name: str, *args: Any, **kwargs: Any) -> bool:
+            instance = args[0] if args else next(iter(kwargs.values()))
+            _resolved_plugins.setdefault((kind, name), instance)
+            return True
+
+        return staticmethod(register)
+
+    original_action = AgentServer.__dict__["register_custom_action"]
+    original_recognition = AgentServer.__dict__["register_custom_recognition"]
+    AgentServer.register_custom_action = capture("actions")
+    AgentServer.register_custom_recognition = capture("recognitions")
+    try:
+        yield
+    finally:
+        AgentServer.register_custom_action = original_action
+        AgentServer.register_custom_recognition = original_recognition
+
+
+def resolve_plugin(kind: str, name: str, module_name: str, class_name: str) -> Any:
+    """
+    获取插件的真实实例，首次调用时导入模块
+
+    Args:
+        kind: 分类 actions / recognitions
+        name: 注册名
+        module_name: 所在模块
+        class_name: 类名
+
+    Returns:
+        真实的 CustomAction / CustomRecognition 实例
+    """
+    key = (kind, name)
+    instance = _resolved_plugins.get(key)
+    if instance is not None:
+        return instance
+    with _resolve_lock:
+        instance = _resolved_plugins.get(key)
+        if instance is not None:
+            return instance
+        start = time.perf_counter()
+        with _capture_registrations():
+            module = importlib.import_module(module_name)
+        instance = _resolved_plugins.get(key)
+        if instance is None:
+            # 模块在截获前就被其他途径导入过：直接按类名实例化
+            instance = getattr(module, class_name)()
+            _resolved_plugins[key] = instance
+        logger.info(f"Lazy load {module_name} for {name} in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        return instance
+
+
+def register_lazy_plugins(manifest: Dict[str, Any]) -> int:
+    """
+    按清单向 AgentServer 注册代理，真实模块延迟到首次调用时导入
+
+    Args:
+        manifest: 插件清单
+
+    Returns:
+        注册的代理数量
+    """
+    from maa.agent.agent_server import AgentServer
+    from maa.custom_action import CustomAction
+    from maa.custom_recognition import CustomRecognition
+
+    class LazyCustomAction(CustomAction):
+        def __init__(self, name: str, module_name: str, class_name: str):
+            super().__init__()
+            self.target = ("actions", name, module_name, class_name)
+
+        def run(self, context, argv):
+            return resolve_plugin(*self.target).run(context, argv)
+
+    class LazyCustomRecognition(CustomRecognition):
+        def __init__(self, name: str, module_name: str, class_name: str):
+            super().__init__()
+            self.target = ("recognitions", name, module_name, class_name)
+
+        def analyze(self, context, argv):
+            return resolve_plugin(*self.target).analyze(context, argv)
+
+    count = 0
+    for name, entry in manifest.get("actions", {}).items():
+        AgentServer.register_custom_action(name, LazyCustomAction(name, entry["module"], entry["class"]))
+        count += 1
+    for name, entry in manifest.get("recognitions", {}).items():
+        AgentServer.register_custom_recognition(name, LazyCustomRecognition(name, entry["module"], entry["class"]))
+        count += 1
+    return count
+
+
+def preload_lazy_plugins(manifest: Dict[str, Any]) -> None:
+    """把清单中的所有插件都解析一遍，一般在启动完成后于后台线程调用"""
+    for kind in _DECORATOR_KINDS.values():
+        for name, entry in manifest.get(kind, {}).items():
+            try:
+                resolve_plugin(kind, name, entry["module"], entry["class"])
+            except Exception as e:
+                logger.error(f"Preload {entry['module']} for {name} failed: {e}")
@@ -0,0 +1,163 @@
+"""断点续跑：长时间运行的动作在廉价的时机把进度写入本地文件，agent 进程或 MaaFW 重启后读回，跳过已完成的准备步骤并继续遵守次数上限。"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from maa.context import Context
+
+from agent.logger import logger
+from agent.utils.controller_scope import controller_id
+
+CURRENT_DIR = Path(__file__).parent
+PROJECT_ROOT = CURRENT_DIR.parent.parent
+STORE_FILEPATH = PROJECT_ROOT / "agent" / "checkpoints.json"
+
+# 文件格式版本 | 格式变化时递增，旧版本的文件直接忽略
+CHECKPOINT_VERSION = 2
+# 断点有效期（秒） | 超过后认为不是崩溃后的立即恢复，重新开始
+CHECKPOINT_TTL = 30 * 60
+
+
+def config_key(*parts: Any) -> str:
+    """
+    由动作的配置生成断点的标识，配置变化后不会恢复旧的进度
+
+    Args:
+        parts: 影响进度含义的配置项，需要能序列化为 JSON
+
+    Returns:
+        配置的短哈希
+    """
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class CheckpointStore:
+    """
+    断点存储，所有任务共用一个文件
+
+    文件内容: {"version": 版本, "tasks": {条目名: {"key": 配置标识, "saved_at": 时间戳, "state": 进度}}}
+    条目名由 Checkpoint 生成（任务名@控制器标识），存储本身不关心格式。
+    写入时先写临时文件再替换，进程在写入过程中崩溃也不会留下损坏的文件。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._tasks: dict[str, dict] | None = None
+
+    def _load(self) -> dict[str, dict]:
+        if self._tasks is not None:
+            return self._tasks
+        self._tasks = {}
+        if not self.path.exists():
+            return self._tasks
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.debug("[断点] 读取失败: {}", e)
+            return self._tasks
+        if isinstance(data, dict) and data.get("version") == CHECKPOINT_VERSION:
+            self._tasks = data.get("tasks", {})
+        return self._tasks
+
+    def _write(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": CHECKPOINT_VERSION, "tasks": self._tasks},
+                    f, ensure_ascii=False, separators=(",", ":"),
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug("[断点] 写入失败: {}", e)
+
+    def load(self, task: str, key: str) -> dict[str, Any] | None:
+        """
+        读取任务的断点
+
+        Args:
+            task: 条目名，见 Checkpoint
+            key: 配置标识，与保存时不一致则不恢复
+
+        Returns:
+            进度，没有可恢复的断点返回 None
+        """
+        with self._lock:
+            entry = self._load().get(task)
+        if not entry or entry.get("key") != key:
+            return None
+        if time.time() - entry.get("saved_at", 0) > CHECKPOINT_TTL:
+            return None
+        return dict(entry.get("state", {}))
+
+    def save(self, task: str, key: str, state: dict[str, Any]) -> None:
+        """保存任务的断点"""
+        with self._lock:
+            self._load()[task] = {"key": key, "saved_at": round(time.time()), "state": state}
+            self._write()
+
+    def clear(self, task: str) -> None:
+        """任务正常结束，删除断点"""
+        with self._lock:
+            if self._load().pop(task, None) is not None:
+                self._write()
+
+
+# 全局断点存储
+checkpoint_store = CheckpointStore(STORE_FILEPATH)
+
+
+class Checkpoint:
+    """
+    单个控制器上单个任务的断点，动作中持有这个对象，在循环的廉价时机调用 save
+
+    按控制器分开保存，多个控制器同时运行同一个任务时互不覆盖；控制器的 uuid 在重启后不变，崩溃后仍能恢复。
+
+    用法:
+        checkpoint = Checkpoint(context, "AutoFishing", config_key(max_count, navigation))
+        if checkpoint.resumed:
+            count = checkpoint.state.get("count", 0)
+        ...
+        checkpoint.save(count=count)
+        ...
+        checkpoint.clear()
+    """
+
+    def __init__(self, context: Context, task: str, key: str, store: CheckpointStore = checkpoint_store) -> None:
+        """
+        Args:
+            context: 控制器上下文
+            task: 任务名
+            key: 配置标识，见 config_key
+            store: 断点存储
+        """
+        self.task = task
+        self.entry = f"{task}@{controller_id(context)}"
+        self.key = key
+        self.store = store
+        state = store.load(self.entry, key)
+        self.resumed = state is not None
+        self.state: dict[str, Any] = state or {}
+        if self.resumed:
+            logger.info("[断点] {} 从上次中断的进度继续: {}", task, self.state)
+
+    def save(self, **fields: Any) -> None:
+        """更新并保存进度"""
+        self.state.update(fields)
+        self.store.save(self.entry, self.key, self.state)
+
+    def clear(self) -> None:
+        """任务正常结束（包括手动停止），下次重新开始"""
+        self.state = {}
+        self.store.clear(self.entry)
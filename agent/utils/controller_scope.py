@@ -0,0 +1,53 @@
+"""控制器作用域：多个控制器在同一个 agent 进程中同时运行任务时，会话状态（位置、分线、频道、主页面凭证、断点等）按控制器分开保存。"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Generic, TypeVar
+
+from maa.context import Context
+
+T = TypeVar("T")
+
+
+def controller_id(context: Context) -> str:
+    """
+    控制器标识，同一个控制器的多次任务相同，不同控制器之间不同
+
+    Args:
+        context: 控制器上下文
+
+    Returns:
+        控制器的 uuid，取不到时使用 tasker 对象的标识
+    """
+    tasker = context.tasker
+    uuid = getattr(tasker.controller, "uuid", None)
+    return str(uuid) if uuid else f"tasker-{id(tasker)}"
+
+
+class PerController(Generic[T]):
+    """
+    每个控制器一份的会话状态，第一次访问时创建
+
+    用法:
+        location_tracker = PerController(LocationTracker)
+        location_tracker.get(context).arrive()
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        """
+        Args:
+            factory: 创建一份新状态
+        """
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._items: dict[str, T] = {}
+
+    def get(self, context: Context) -> T:
+        """当前控制器的状态"""
+        key = controller_id(context)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = self.factory()
+            return item
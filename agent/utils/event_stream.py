@@ -0,0 +1,215 @@
+"""结构化事件流：把自定义动作的关键事件写成紧凑的 JSONL，与 loguru 的文字日志并行输出，供离线统计分析。"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+# 事件类型
+TASK_START = "task_start"
+TASK_END = "task_end"
+RECOGNITION = "recognition"
+CONTROLLER = "controller"
+RECOVERY = "recovery"
+COUNTER = "counter"
+
+# 事件文件目录 | 与 MaaFW 的 debug 日志放在一起，按天分文件
+EVENT_DIR = Path("debug") / "events"
+# 队列上限 | 写线程跟不上时直接丢弃新事件并计数，不阻塞动作线程
+EVENT_QUEUE_SIZE = 10000
+# 写线程每批最多写出的事件数
+EVENT_BATCH_SIZE = 512
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_STOP = object()
+
+
+class EventStream:
+    """
+    结构化事件流，emit 只做入队，序列化和写文件都在后台线程中完成
+
+    每行一个事件: {"ts": 时间戳, "type": 事件类型, "task": 任务名, ...其他字段}
+    """
+
+    def __init__(self, directory: Path = EVENT_DIR, max_queue: int = EVENT_QUEUE_SIZE) -> None:
+        """
+        Args:
+            directory: 事件文件目录
+            max_queue: 队列上限，超出后丢弃新事件
+        """
+        self.directory = directory
+        self.enabled = True
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def emit(self, event_type: str, task: str | None = None, **fields: Any) -> None:
+        """
+        记录一个事件
+
+        Args:
+            event_type: 事件类型
+            task: 所属任务名
+            fields: 其他字段，需要可以 JSON 序列化（不能序列化的会转成字符串）
+        """
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        event = {"ts": round(time.time(), 3), "type": event_type, "task": task, **fields}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="event-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _writer(self) -> None:
+        dropped_reported = 0
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EVENT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(event is _STOP for event in batch)
+            events = [event for event in batch if event is not _STOP]
+            if self.dropped != dropped_reported:
+                events.append({"ts": round(time.time(), 3), "type": COUNTER, "task": None,
+                               "name": "events_dropped", "value": self.dropped})
+                dropped_reported = self.dropped
+            if events:
+                self._write(events)
+            if stop:
+                return
+
+    def _write(self, events: list[dict[str, Any]]) -> None:
+        # 同一批事件按日期分文件写出
+        lines: dict[str, list[str]] = {}
+        for event in events:
+            day = datetime.fromtimestamp(event["ts"]).strftime("%Y%m%d")
+            lines.setdefault(day, []).append(
+                json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str)
+            )
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for day, day_lines in lines.items():
+                with open(self.directory / f"events-{day}.jsonl", "a", encoding="utf-8") as f:
+                    f.write("\n".join(day_lines) + "\n")
+        except OSError:
+            # 事件流只用于统计，写失败不影响任务
+            self.dropped += len(events)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """写出队列中剩余的事件并停止写线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+# 全局事件流
+event_stream = EventStream()
+
+
+def emit(event_type: str, task: str | None = None, **fields: Any) -> None:
+    """向全局事件流记录一个事件"""
+    event_stream.emit(event_type, task, **fields)
+
+
+def recognition(task: str, node: str, hit: bool, **fields: Any) -> None:
+    """记录一次识别结果"""
+    event_stream.emit(RECOGNITION, task, node=node, hit=bool(hit), **fields)
+
+
+def controller(task: str, command: str, **fields: Any) -> None:
+    """记录一次控制器操作，例如 click / click_key / start_app"""
+    event_stream.emit(CONTROLLER, task, command=command, **fields)
+
+
+def recovery(task: str, branch: str, **fields: Any) -> None:
+    """记录一次异常恢复分支，例如 重连 / 重启游戏 / 切换分线"""
+    event_stream.emit(RECOVERY, task, branch=branch, **fields)
+
+
+def counter(task: str, name: str, value: int | float = 1, **fields: Any) -> None:
+    """记录一次计数器更新，value 为更新后的值或者本次增量"""
+    event_stream.emit(COUNTER, task, name=name, value=value, **fields)
+
+
+def _is_success(result: Any) -> bool:
+    # 兼容 bool 和 CustomAction.RunResult
+    return bool(getattr(result, "success", result))
+
+
+def track_task(task: str) -> Callable[[F], F]:
+    """
+    装饰器：在函数开始和结束时记录 task_start / task_end 事件，结束事件带耗时和是否成功
+
+    可以用于 CustomAction.run，也可以用于普通函数，返回值为 bool 或 RunResult 时据此判断是否成功。
+
+    用法:
+        @track_task("SwitchLine")
+        def switch_line(context, line_list) -> bool:
+            ...
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            event_stream.emit(TASK_START, task)
+            success = False
+            error = None
+            try:
+                result = func(*args, **kwargs)
+                success = _is_success(result)
+                return result
+            except Exception as exc:
+                error = repr(exc)
+                raise
+            finally:
+                fields: dict[str, Any] = {"success": success, "duration_ms": round((time.perf_counter() - start) * 1000)}
+                if error:
+                    fields["error"] = error
+                event_stream.emit(TASK_END, task, **fields)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+__all__ = [
+    "TASK_START",
+    "TASK_END",
+    "RECOGNITION",
+    "CONTROLLER",
+    "RECOVERY",
+    "COUNTER",
+    "EventStream",
+    "event_stream",
+    "emit",
+    "recognition",
+    "controller",
+    "recovery",
+    "counter",
+    "track_task",
+]
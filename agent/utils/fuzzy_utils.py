@@ -1,7 +1,16 @@
-from typing import cast, Any, List, Tuple
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import cast, Any, Callable, Iterable, List, Sequence, Tuple
 
 import numpy
 from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Levenshtein
+
+# FuzzyIndex 默认的查询结果缓存容量 | OCR 对同一条鱼的识别结果大量重复
+FUZZY_CACHE_SIZE = 1024
+# 查询数 * 候选数 超过该值时 cdist 使用全部 CPU 核心 | 小矩阵开线程的开销反而更大
+PARALLEL_CELLS_THRESHOLD = 50_000
 
 def get_best_match_single(query: str, choices: List[str], score_threshold: float = 60) -> str | None:
     """
@@ -68,6 +77,75 @@ def get_best_match_with_score(query: str, choices: List[str], score_threshold: f
     return choices[best_idx], best_score
 
 
+def score_batch(
+    queries: Sequence[str],
+    choices: Sequence[str],
+    scorer: Callable[..., float] = fuzz.ratio,
+    workers: int | None = None,
+) -> numpy.ndarray:
+    """
+    一次性计算所有 query 与所有候选的相似度矩阵
+
+    Args:
+        queries: 输入字符串列表
+        choices: 候选字符串列表
+        scorer: rapidfuzz 打分函数
+        workers: cdist 使用的线程数，不传时按矩阵大小自动选择 1 或 -1（全部核心）
+
+    Returns:
+        float32 分数矩阵 [len(queries), len(choices)]
+    """
+    if workers is None:
+        workers = -1 if len(queries) * len(choices) >= PARALLEL_CELLS_THRESHOLD else 1
+    return process.cdist(
+        queries=queries,
+        choices=choices,
+        scorer=cast(Any, scorer),
+        dtype=numpy.float32,
+        workers=workers,
+    )
+
+
+def match_batch_topk(
+    queries: Sequence[str],
+    choices: Sequence[str],
+    k: int = 1,
+    score_threshold: float = 60,
+    scorer: Callable[..., float] = fuzz.ratio,
+    workers: int | None = None,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Fuzzy 匹配多个 query 到候选列表，向量化地取出每个 query 分数最高的 k 个候选
+
+    Args:
+        queries: 输入字符串列表
+        choices: 候选字符串列表
+        k: 每个 query 返回的候选数量，超过候选数时取候选数
+        score_threshold: 分数阈值，低于此分数的位置索引记为 -1
+        scorer: rapidfuzz 打分函数
+        workers: cdist 使用的线程数，不传时自动选择
+
+    Returns:
+        (indices, scores)：形状均为 [len(queries), k]，按分数降序；
+        indices 为候选在 choices 中的下标（int32，不匹配为 -1），scores 为 float32 分数
+    """
+    k = max(0, min(k, len(choices)))
+    if not queries or k == 0:
+        return numpy.full((len(queries), k), -1, dtype=numpy.int32), numpy.zeros((len(queries), k), dtype=numpy.float32)
+
+    scores_matrix = score_batch(queries, choices, scorer, workers)
+    if k == 1:
+        top_idx = scores_matrix.argmax(axis=1)[:, None]
+    else:
+        # 先用 argpartition 取出前 k 个（无序），再只对这 k 列排序
+        top_idx = numpy.argpartition(scores_matrix, -k, axis=1)[:, -k:]
+        top_scores = numpy.take_along_axis(scores_matrix, top_idx, axis=1)
+        top_idx = numpy.take_along_axis(top_idx, numpy.argsort(-top_scores, axis=1, kind="stable"), axis=1)
+    top_scores = numpy.take_along_axis(scores_matrix, top_idx, axis=1)
+    top_idx = numpy.where(top_scores >= score_threshold, top_idx, -1).astype(numpy.int32)
+    return top_idx, top_scores
+
+
 def get_best_match_batch(queries: List[str], choices: List[str], score_threshold: float = 60) -> List[str | None]:
     """
     Fuzzy 匹配多个 query 到候选列表，分别返回分数最高的候选项
@@ -83,20 +161,8 @@ def get_best_match_batch(queries: List[str], choices: List[str], score_threshold
     if not choices or not queries:
         return [None] * len(queries)
 
-    scores_matrix = process.cdist(
-        queries=queries,
-        choices=choices,
-        scorer=cast(Any, fuzz.ratio),
-        dtype=numpy.float32
-    )
-
-    results = []
-    for i, scores in enumerate(scores_matrix):
-        best_idx = int(numpy.argmax(scores))
-        best_score = float(scores[best_idx])
-        results.append(choices[best_idx] if best_score >= score_threshold else None)
-
-    return results
+    indices, _ = match_batch_topk(queries, choices, 1, score_threshold)
+    return [choices[idx] if idx >= 0 else None for idx in indices[:, 0].tolist()]
 
 
 def get_best_match_batch_with_score(queries: List[str], choices: List[str], score_threshold: float = 60) -> List[Tuple[str, float] | None]:
@@ -114,17 +180,221 @@ def get_best_match_batch_with_score(queries: List[str], choices: List[str], scor
     if not choices or not queries:
         return [None] * len(queries)
 
-    scores_matrix = process.cdist(
-        queries=queries,
-        choices=choices,
-        scorer=cast(Any, fuzz.ratio),
-        dtype=numpy.float32
-    )
+    indices, scores = match_batch_topk(queries, choices, 1, score_threshold)
+    return [
+        (choices[idx], score) if idx >= 0 else None
+        for idx, score in zip(indices[:, 0].tolist(), scores[:, 0].tolist())
+    ]
+
+
+def normalize_text(text: str) -> str:
+    """
+    统一 OCR 文本和候选文本的格式：全角转半角（NFKC）、去掉所有空白、英文转小写
+
+    Args:
+        text: 原始字符串
+
+    Returns:
+        规范化后的字符串
+    """
+    return "".join(unicodedata.normalize("NFKC", text).split()).lower()
+
+
+class OcrConfusionTable:
+    """
+    OCR 易混淆字符表：把同组字符替换成同一个规范字符后再交给 rapidfuzz 打分
+
+    同组字符之间的替换不再扣分，其余编辑照常计分；替换在 str.translate 中完成，
+    打分仍然走 rapidfuzz 的 C 实现，不需要 Python 层的自定义 scorer。
+
+    用法:
+        table = OcrConfusionTable([["己", "已", "巳"], ["0", "o"]])
+        index = FuzzyIndex(choices, normalizer=table.canonicalize)
+    """
+
+    def __init__(self, groups: Iterable[Sequence[str]]) -> None:
+        """
+        Args:
+            groups: 易混淆字符组，每组第一个字符为规范字符；有交集的组会被合并
+        """
+        parent: dict[str, str] = {}
+
+        def find(char: str) -> str:
+            while parent.setdefault(char, char) != char:
+                parent[char] = parent[parent[char]]
+                char = parent[char]
+            return char
+
+        for group in groups:
+            chars = [normalize_text(char) for char in group]
+            chars = [char for char in chars if len(char) == 1]
+            for char in chars[1:]:
+                root_a, root_b = find(chars[0]), find(char)
+                if root_a != root_b:
+                    # 合并时保留先出现的规范字符
+                    first, second = sorted((root_a, root_b), key=list(parent).index)
+                    parent[second] = first
+        self._mapping: dict[str, str] = {char: find(char) for char in parent if find(char) != char}
+        self._table = str.maketrans(self._mapping)
+
+    @classmethod
+    def learn(cls, samples: Iterable[Tuple[str, str]], min_count: int = 2) -> "OcrConfusionTable":
+        """
+        从已记录的 OCR 错误中学习易混淆字符
+
+        Args:
+            samples: (OCR 结果, 正确文本) 列表
+            min_count: 同一对替换至少出现的次数，过滤偶发识别错误
+
+        Returns:
+            学习得到的易混淆字符表
+        """
+        counter: Counter[Tuple[str, str]] = Counter()
+        for ocr_text, truth in samples:
+            ocr_text, truth = normalize_text(ocr_text), normalize_text(truth)
+            for op in Levenshtein.editops(truth, ocr_text):
+                if op.tag == "replace":
+                    counter[(truth[op.src_pos], ocr_text[op.dest_pos])] += 1
+        return cls([pair for pair, count in counter.most_common() if count >= min_count])
+
+    @property
+    def groups(self) -> List[List[str]]:
+        """合并后的字符组，规范字符在前"""
+        groups: dict[str, List[str]] = {}
+        for char, root in self._mapping.items():
+            groups.setdefault(root, [root]).append(char)
+        return list(groups.values())
+
+    def canonicalize(self, text: str) -> str:
+        """
+        规范化文本并把易混淆字符统一替换为规范字符
+
+        Args:
+            text: 原始字符串
+
+        Returns:
+            可直接用于打分的字符串
+        """
+        return normalize_text(text).translate(self._table)
+
+    def __len__(self) -> int:
+        return len(self._mapping)
+
+
+class FuzzyIndex:
+    """
+    针对固定候选列表的模糊匹配索引，构建一次后重复使用
+
+    与 get_best_match_single 相比：
+    1. 候选项只在构建时规范化一次，不在每次查询时重复预处理
+    2. 使用 process.extractOne + score_cutoff，低于阈值的候选可以提前剪枝，不生成完整分数矩阵
+    3. 按原始 OCR 文本缓存匹配结果，相同文本直接命中缓存
+
+    用法:
+        FISH_NAME_INDEX = FuzzyIndex(FISH_LIST)
+        fish = FISH_NAME_INDEX.match(ocr_text) or "未知"
+    """
+
+    def __init__(
+        self,
+        choices: Sequence[str],
+        score_threshold: float = 60,
+        scorer: Callable[..., float] = fuzz.ratio,
+        cache_size: int = FUZZY_CACHE_SIZE,
+        normalizer: Callable[[str], str] = normalize_text,
+    ) -> None:
+        """
+        Args:
+            choices: 候选字符串列表，构建后不应再修改
+            score_threshold: 默认分数阈值，低于此分数视为不匹配
+            scorer: rapidfuzz 打分函数
+            cache_size: 查询结果缓存容量
+            normalizer: 打分前对 query 和候选的规范化函数，例如 OcrConfusionTable.canonicalize
+        """
+        self.choices: Tuple[str, ...] = tuple(choices)
+        self.score_threshold = score_threshold
+        self.scorer = scorer
+        self.normalizer = normalizer
+        self._normalized: List[str] = [normalizer(choice) for choice in self.choices]
+        # 规范化后完全相同的候选直接命中，无需打分 | 用不做字符归并的文本判断，避免易混淆字符把不同候选判成同一个
+        self._exact: dict[str, int] = {}
+        for idx, choice in enumerate(self.choices):
+            self._exact.setdefault(normalize_text(choice), idx)
+        self._match_cached = lru_cache(maxsize=cache_size)(self._match)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def _match(self, query: str, score_threshold: float) -> Tuple[str, float, int] | None:
+        key = normalize_text(query)
+        if not self.choices or not key:
+            return None
+        idx = self._exact.get(key)
+        if idx is not None:
+            return self.choices[idx], 100.0, idx
+        normalized = self.normalizer(query)
+        result = process.extractOne(
+            normalized,
+            self._normalized,
+            scorer=cast(Any, self.scorer),
+            processor=None,
+            score_cutoff=score_threshold,
+        )
+        if result is None:
+            return None
+        _, score, idx = result
+        return self.choices[idx], float(score), idx
+
+    def match_with_score(self, query: str, score_threshold: float | None = None) -> Tuple[str, float, int] | None:
+        """
+        匹配单个 query，返回分数最高的候选项
+
+        Args:
+            query: OCR 识别出的原始字符串
+            score_threshold: 分数阈值，不传使用构建时的默认阈值
+
+        Returns:
+            (最佳匹配字符串, 分数, 在 choices 中的索引)，或 None
+        """
+        if score_threshold is None:
+            score_threshold = self.score_threshold
+        return self._match_cached(query, score_threshold)
+
+    def match(self, query: str, score_threshold: float | None = None) -> str | None:
+        """
+        匹配单个 query，返回分数最高的候选项
+
+        Args:
+            query: OCR 识别出的原始字符串
+            score_threshold: 分数阈值，不传使用构建时的默认阈值
+
+        Returns:
+            最佳匹配字符串，或 None
+        """
+        result = self.match_with_score(query, score_threshold)
+        return result[0] if result else None
+
+    def match_batch(self, queries: Sequence[str], k: int = 1, score_threshold: float | None = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        一次匹配多个 query（例如一帧 OCR 的全部文本框），不经过单条查询缓存
+
+        Args:
+            queries: OCR 识别出的原始字符串列表
+            k: 每个 query 返回的候选数量
+            score_threshold: 分数阈值，不传使用构建时的默认阈值
+
+        Returns:
+            同 match_batch_topk，索引对应 self.choices
+        """
+        if score_threshold is None:
+            score_threshold = self.score_threshold
+        normalized = [self.normalizer(query) for query in queries]
+        return match_batch_topk(normalized, self._normalized, k, score_threshold, self.scorer)
 
-    results = []
-    for i, scores in enumerate(scores_matrix):
-        best_idx = int(numpy.argmax(scores))
-        best_score = float(scores[best_idx])
-        results.append((choices[best_idx], best_score) if best_score >= score_threshold else None)
+    def cache_info(self):
+        """查询结果缓存的命中统计"""
+        return self._match_cached.cache_info()
 
-    return results
+    def cache_clear(self) -> None:
+        """清空查询结果缓存"""
+        self._match_cached.cache_clear()
@@ -1,21 +1,33 @@
+from typing import Callable
+
 from agent.logger import logger
 
 
-def print_center_block(lines: list[str], total_width: int = 40, border_char: str = "#"):
+def print_center_block(lines: list[str] | Callable[[], list[str]], total_width: int = 40, border_char: str = "#"):
     """
     让多行文本在固定宽度内居中显示，并加边框。
 
+    日志级别不输出 INFO 时不会居中，也不会生成文本。
+
     Args:
-        lines: 要显示的文本（列表，每行一个字符串）
+        lines: 要显示的文本（列表，每行一个字符串），也可以传返回列表的函数，只在需要输出时调用
         total_width: 总宽度
         border_char: 边框字符
 
     Returns:
         打印的字符串
     """
-    # 打印顶部边框
-    logger.info(border_char * int(total_width * 1.3))
-    for line in lines:
-        logger.info(line.center(total_width))
+    border = border_char * int(total_width * 1.3)
+    rendered: list[str] = []
+
+    def render_border() -> str:
+        rendered.extend(lines() if callable(lines) else lines)
+        return border
+
+    # 打印顶部边框 | 只有 INFO 级别会输出时才会调用，之后再生成文本
+    logger.opt(lazy=True).info("{}", render_border)
+    for line in rendered:
+        logger.opt(lazy=True).info("{}", lambda line=line: line.center(total_width))
     # 打印底部边框
-    logger.info(border_char * int(total_width * 1.3))
+    if rendered:
+        logger.info(border)
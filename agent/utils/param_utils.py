@@ -3,7 +3,12 @@
 from __future__ import annotations
 
 import json
-from collections.abc import Iterable
+import re
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
 
@@ -11,6 +16,32 @@ class CustomActionParamError(ValueError):
     """在解析或校验 custom_action_param 时抛出的异常。"""
 
 
+# 未配置默认值的占位符 | 表示该字段必填
+REQUIRED: Any = object()
+
+# 参数解析结果缓存容量 | 同一节点的 custom_action_param 字符串在循环中是完全一致的
+PARAM_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=PARAM_CACHE_SIZE)
+def _load_json_cached(raw: str) -> Mapping[str, Any]:
+    """按原始字符串缓存 JSON 解析结果，返回只读视图避免被调用方篡改缓存。"""
+    if not raw:
+        raise CustomActionParamError("custom_action_param 不能为空")
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as exc:  # pragma: no cover - 抛错路径
+        raise CustomActionParamError("custom_action_param 不是合法的 JSON") from exc
+    if not isinstance(data, dict):
+        raise CustomActionParamError("custom_action_param 必须是 JSON 对象")
+    return MappingProxyType(data)
+
+
+def _is_missing(value: Any) -> bool:
+    """字段缺失判断：只有 None 和空字符串算缺失，0 / False 属于合法值。"""
+    return value is None or value == ""
+
+
 class CustomActionParam:
     """解析并校验 MaaFW custom_action_param 的辅助类。"""
 
@@ -28,15 +59,7 @@ class CustomActionParam:
 
     @staticmethod
     def _load_json(raw: str) -> dict[str, Any]:
-        if not raw:
-            raise CustomActionParamError("custom_action_param 不能为空")
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError as exc:  # pragma: no cover - 抛错路径
-            raise CustomActionParamError("custom_action_param 不是合法的 JSON") from exc
-        if not isinstance(data, dict):
-            raise CustomActionParamError("custom_action_param 必须是 JSON 对象")
-        return data
+        return dict(_load_json_cached(raw))
 
     @property
     def data(self) -> dict[str, Any]:
@@ -61,7 +84,7 @@ class CustomActionParam:
         missing: list[str] = []
         for key in keys:
             value = self._data.get(key)
-            if value:
+            if not _is_missing(value):
                 result[key] = value
             else:
                 missing.append(key)
@@ -69,3 +92,271 @@ class CustomActionParam:
             joined = ", ".join(missing)
             raise CustomActionParamError(f"缺少必要字段: {joined}")
         return result
+
+
+def _coerce_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise TypeError("bool 不能作为整数")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} 不是整数")
+    return int(value)
+
+
+def _coerce_float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise TypeError("bool 不能作为数字")
+    return float(value)
+
+
+def _coerce_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    raise ValueError(f"{value!r} 不是布尔值")
+
+
+def _coerce_str(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        raise TypeError("对象或数组不能作为字符串")
+    return str(value)
+
+
+# 类型 -> 转换函数
+_COERCERS: dict[type, Callable[[Any], Any]] = {
+    int: _coerce_int,
+    float: _coerce_float,
+    bool: _coerce_bool,
+    str: _coerce_str,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ParamField:
+    """custom_action_param 中单个字段的声明。
+
+    Args:
+        name: 字段名。
+        type: 字段类型，支持 int / float / bool / str / list。
+        default: 默认值，不传则为必填字段。
+        choices: 可选值集合，为空则不限制。
+        item_type: 当 type 为 list 时每个元素的类型。
+    """
+
+    name: str
+    type: type = str
+    default: Any = REQUIRED
+    choices: tuple[Any, ...] | None = None
+    item_type: type | None = None
+
+    def compile(self) -> Callable[[Mapping[str, Any]], Any]:
+        """把字段声明编译成一个直接从数据字典取值并转换的函数。"""
+        name = self.name
+        default = self.default
+        choices = frozenset(self.choices) if self.choices else None
+        if self.type is list:
+            item_coerce = _COERCERS.get(self.item_type) if self.item_type else None
+
+            def coerce(value: Any) -> Any:
+                if not isinstance(value, list):
+                    raise TypeError("需要数组")
+                if item_coerce is None:
+                    return tuple(value)
+                return tuple(item_coerce(item) for item in value)
+        else:
+            coerce = _COERCERS[self.type]
+        type_name = self.type.__name__
+
+        def getter(data: Mapping[str, Any]) -> Any:
+            value = data.get(name)
+            if _is_missing(value):
+                if default is REQUIRED:
+                    raise CustomActionParamError(f"缺少必要字段: {name}")
+                return default
+            try:
+                value = coerce(value)
+            except (TypeError, ValueError) as exc:
+                raise CustomActionParamError(f"字段 {name} 需要 {type_name} 类型: {exc}") from exc
+            if choices is not None and value not in choices:
+                raise CustomActionParamError(f"字段 {name} 的值 {value!r} 不在可选范围 {sorted(choices)} 内")
+            return value
+
+        return getter
+
+
+# 动作名 -> 参数声明
+_SCHEMA_REGISTRY: dict[str, ParamSchema] = {}
+
+
+class ParamSchema:
+    """自定义动作的参数声明，构造时编译成校验函数，并按原始字符串缓存解析结果。
+
+    用法:
+        RUN_PIPELINE_NODE_PARAMS = ParamSchema(
+            "run_pipeline_node",
+            ParamField("pipeline_node_name", str),
+        )
+        params = RUN_PIPELINE_NODE_PARAMS.parse(argv.custom_action_param)
+    """
+
+    def __init__(self, action_name: str, *fields: ParamField, register: bool = True) -> None:
+        """
+        Args:
+            action_name: 对应 `@AgentServer.custom_action` 注册的动作名。
+            fields: 字段声明列表。
+            register: 是否登记到全局注册表，由插件清单还原的声明只用于校验，不登记。
+        """
+        if register and action_name in _SCHEMA_REGISTRY:
+            raise ValueError(f"自定义动作 {action_name} 的参数声明重复注册")
+        self.action_name = action_name
+        self.fields = fields
+        self._getters = tuple((field.name, field.compile()) for field in fields)
+        self._required = tuple(field.name for field in fields if field.default is REQUIRED)
+        self._parse_cached = lru_cache(maxsize=PARAM_CACHE_SIZE)(self._parse)
+        if register:
+            _SCHEMA_REGISTRY[action_name] = self
+
+    @property
+    def required(self) -> tuple[str, ...]:
+        """必填字段名列表。"""
+        return self._required
+
+    def _parse(self, raw: str) -> Mapping[str, Any]:
+        # 没有必填字段时允许不传参数
+        data = _load_json_cached(raw) if raw or self._required else MappingProxyType({})
+        return self.validate(data)
+
+    def validate(self, data: Mapping[str, Any]) -> Mapping[str, Any]:
+        """校验已解析的数据并返回转换后的只读字典。
+
+        Raises:
+            CustomActionParamError: 字段缺失、类型错误或不在可选范围内时抛出。
+        """
+        result: dict[str, Any] = {}
+        errors: list[str] = []
+        for name, getter in self._getters:
+            try:
+                result[name] = getter(data)
+            except CustomActionParamError as exc:
+                errors.append(str(exc))
+        if errors:
+            raise CustomActionParamError("; ".join(errors))
+        return MappingProxyType(result)
+
+    def parse(self, raw: str) -> Mapping[str, Any]:
+        """解析 custom_action_param 字符串，相同字符串直接命中缓存。
+
+        Args:
+            raw: `custom_action_param` 字符串。
+
+        Raises:
+            CustomActionParamError: 解析或校验失败时抛出。
+
+        Returns:
+            字段名 -> 转换后值 的只读字典。
+        """
+        return self._parse_cached(raw)
+
+    def __repr__(self) -> str:
+        return f"<ParamSchema action={self.action_name} fields={[f.name for f in self.fields]}>"
+
+
+def get_param_schema(action_name: str) -> ParamSchema | None:
+    """获取自定义动作的参数声明，未声明返回 None。"""
+    return _SCHEMA_REGISTRY.get(action_name)
+
+
+# 插件清单中的类型名 -> 类型
+_MANIFEST_TYPES: dict[str, type] = {"int": int, "float": float, "bool": bool, "str": str, "list": list}
+
+
+def schemas_from_manifest(params: Mapping[str, list[dict]]) -> dict[str, ParamSchema]:
+    """由插件清单中的参数声明还原校验用的 ParamSchema，不导入动作模块。
+
+    Args:
+        params: 插件清单的 params 部分：动作名 -> 字段声明列表。
+
+    Returns:
+        动作名 -> 参数声明，不登记到全局注册表。
+    """
+    schemas: dict[str, ParamSchema] = {}
+    for action_name, fields in params.items():
+        schemas[action_name] = ParamSchema(
+            action_name,
+            *(
+                ParamField(
+                    field["name"],
+                    _MANIFEST_TYPES[field["type"]],
+                    # 默认值不参与校验，非必填字段用 None 占位
+                    default=REQUIRED if field["required"] else None,
+                    choices=tuple(field["choices"]) if field.get("choices") else None,
+                    item_type=_MANIFEST_TYPES[field["item_type"]] if field.get("item_type") else None,
+                )
+                for field in fields
+            ),
+            register=False,
+        )
+    return schemas
+
+
+_LINE_COMMENT_PATTERN = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n\r]*')
+
+
+def _strip_line_comments(text: str) -> str:
+    """删除 pipeline JSON 中的 // 行注释，保留字符串中的 //。"""
+    return _LINE_COMMENT_PATTERN.sub(lambda m: m.group(1) or "", text)
+
+
+def _iter_custom_actions(node: Any):
+    """在单个 pipeline 节点中找出所有 Custom 动作的 (动作名, 参数)。"""
+    if not isinstance(node, dict):
+        return
+    action = node.get("action")
+    if isinstance(action, dict) and action.get("type") == "Custom":
+        param = action.get("param") or {}
+        yield param.get("custom_action"), param.get("custom_action_param")
+    # 兼容 v4 旧写法
+    elif node.get("action") == "Custom":
+        yield node.get("custom_action"), node.get("custom_action_param")
+
+
+def validate_pipeline_params(pipeline_dir: Path, schemas: Mapping[str, ParamSchema] | None = None) -> list[str]:
+    """校验资源目录下所有 pipeline 节点的 custom_action_param，在加载资源时就暴露配置错误。
+
+    Args:
+        pipeline_dir: pipeline 目录，会递归扫描所有 json / jsonc 文件。
+        schemas: 动作名 -> 参数声明，不传时使用已导入模块登记的声明。
+
+    Returns:
+        错误信息列表，为空表示全部通过。
+    """
+    if schemas is None:
+        schemas = _SCHEMA_REGISTRY
+    errors: list[str] = []
+    for path in sorted(Path(pipeline_dir).rglob("*.json*")):
+        try:
+            pipeline = json.loads(_strip_line_comments(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError) as exc:
+            errors.append(f"{path}: 无法解析 pipeline 文件: {exc}")
+            continue
+        if not isinstance(pipeline, dict):
+            continue
+        for node_name, node in pipeline.items():
+            for action_name, param in _iter_custom_actions(node):
+                schema = schemas.get(action_name) if action_name else None
+                if schema is None:
+                    continue
+                # pipeline 中既可以直接写对象，也可以写 JSON 字符串
+                try:
+                    if isinstance(param, str):
+                        data = _load_json_cached(param) if param else {}
+                    else:
+                        data = param or {}
+                    if not isinstance(data, Mapping):
+                        raise CustomActionParamError("custom_action_param 必须是 JSON 对象")
+                    schema.validate(data)
+                except CustomActionParamError as exc:
+                    errors.append(f"{path.name} [{node_name}] {action_name}: {exc}")
+    return errors
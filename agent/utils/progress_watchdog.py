@@ -0,0 +1,297 @@
+"""进度看门狗：动作在循环中上报进度心跳（画面变化、识别状态变化、计数增加），后台线程按正常运行中学习到的间隔判断是否卡住，比固定的超时时间更早发现模拟器卡死或者弹窗卡住。"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy
+
+from agent.logger import logger
+from agent.utils.event_stream import counter
+
+CURRENT_DIR = Path(__file__).parent
+PROJECT_ROOT = CURRENT_DIR.parent.parent
+STORE_FILEPATH = PROJECT_ROOT / "agent" / "watchdog_stats.json"
+
+# 后台线程检查的间隔（秒）
+CHECK_INTERVAL = 1.0
+# 每个阶段保留的最近正常状态变化间隔数
+GAP_HISTORY = 200
+# 学习到的样本少于此数时使用调用方给的默认窗口（通常是原来的固定超时）
+MIN_SAMPLES = 30
+# 窗口 = 正常间隔的分位数 * 系数
+WINDOW_QUANTILE = 0.99
+WINDOW_FACTOR = 3.0
+# 默认的窗口下限（秒） | 防止正常间隔很短时误判，阶段可以给自己的下限
+MIN_WINDOW = 10.0
+
+
+def frame_signature(img: Any) -> int | None:
+    """
+    截图的签名，画面不变时签名不变
+
+    对整张截图计算校验和，细的进度条或者文字变化也能区分；模拟器卡死时截图逐像素不变。
+    """
+    if img is None:
+        return None
+    return zlib.crc32(numpy.ascontiguousarray(img))
+
+
+class ProgressWatch:
+    """
+    一次动作运行的进度监视，由 ProgressWatchdog.watch 创建
+
+    动作通过 beat / frame 上报进度；超过窗口没有进度时后台线程调用恢复回调，并设置卡住标记，
+    动作循环中通过 take_stall 取走标记后执行自己的恢复流程。有新的进度时标记自动清除。
+
+    画面变化只说明没有卡死，不参与学习：截图每 0.5~1 秒一次，学出来的窗口总是落在下限。
+    学习的是有意义的状态变化（阶段切换、识别状态、计数）之间的间隔。
+    """
+
+    def __init__(
+        self,
+        watchdog: ProgressWatchdog,
+        task: str,
+        on_stall: Callable[[float], Any] | None,
+        default_window: float,
+        max_window: float,
+        min_window: float,
+    ) -> None:
+        self.watchdog = watchdog
+        self.task = task
+        self.on_stall = on_stall
+        self.default_window = default_window
+        self.max_window = max_window
+        self.min_window = min_window
+        self.phase = "default"
+        self.stalls = 0
+        self._values: dict[str, Any] = {}
+        # 最后一次任意进度（包括画面变化），用于卡住判断
+        self._last_progress = time.monotonic()
+        # 最后一次状态变化，用于学习间隔
+        self._last_state = self._last_progress
+        self.last_kind = "start"
+        self._stalled = False
+        # 卡住之后的第一个间隔不参与学习
+        self._after_stall = False
+        self._suspended = 0
+
+    @property
+    def key(self) -> str:
+        """学习进度间隔的分组：任务名/阶段"""
+        return f"{self.task}/{self.phase}"
+
+    def beat(self, kind: str, value: Any = None) -> None:
+        """
+        上报进度
+
+        Args:
+            kind: 进度类型，例如 frame / state / counter，frame 以外的都算状态变化
+            value: 当前值，与上一次相同时不算进度；None 表示每次都算进度
+        """
+        with self.watchdog.lock:
+            if value is not None:
+                if self._values.get(kind) == value:
+                    return
+                self._values[kind] = value
+            now = time.monotonic()
+            if kind != "frame":
+                if not self._after_stall and not self._suspended:
+                    self.watchdog.learn(self.key, now - self._last_state)
+                self._last_state = now
+            self._last_progress = now
+            self.last_kind = kind
+            self._stalled = False
+            self._after_stall = False
+
+    def frame(self, img: Any) -> None:
+        """上报截图，画面变化算进度"""
+        self.beat("frame", frame_signature(img))
+
+    def set_phase(self, phase: str, default_window: float | None = None, min_window: float | None = None) -> None:
+        """
+        切换阶段，不同阶段分开学习进度间隔，切换本身算状态变化，计入上一个阶段
+
+        Args:
+            phase: 阶段名
+            default_window: 该阶段样本不足时的窗口（秒），同时作为上限，None 表示不变
+            min_window: 该阶段的窗口下限（秒），None 表示使用 MIN_WINDOW
+        """
+        with self.watchdog.lock:
+            self.beat("phase")
+            self.phase = phase
+            if default_window is not None:
+                self.default_window = self.max_window = default_window
+            self.min_window = MIN_WINDOW if min_window is None else min_window
+            self._values.pop("frame", None)
+
+    @contextmanager
+    def suspend(self) -> Iterator[None]:
+        """暂停检测，用于已经有自己超时保护的长步骤，例如重启游戏"""
+        with self.watchdog.lock:
+            self._suspended += 1
+        try:
+            yield
+        finally:
+            with self.watchdog.lock:
+                self._suspended -= 1
+                self._last_progress = self._last_state = time.monotonic()
+                self._values.pop("frame", None)
+
+    def take_stall(self) -> bool:
+        """取走卡住标记，返回自上次取走以来是否检测到卡住"""
+        with self.watchdog.lock:
+            stalled = self._stalled
+            self._stalled = False
+            return stalled
+
+    def check(self, now: float) -> tuple[float, float] | None:
+        """后台线程调用，卡住时返回 (距上次进度的秒数, 窗口)"""
+        with self.watchdog.lock:
+            if self._suspended or self._stalled:
+                return None
+            idle = now - self._last_progress
+            window = self.watchdog.window(self.key, self.default_window, self.max_window, self.min_window)
+            if idle <= window:
+                return None
+            self.stalls += 1
+            self._stalled = True
+            self._after_stall = True
+            self._last_progress = now
+            return idle, window
+
+    def close(self) -> None:
+        self.watchdog.unwatch(self)
+
+    def __enter__(self) -> ProgressWatch:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+class ProgressWatchdog:
+    """
+    进度看门狗，所有动作共用一个后台线程
+
+    每个 任务/阶段 记录最近的正常状态变化间隔，窗口取间隔的 99 分位数的 3 倍，限制在 [阶段的下限, 调用方给的上限] 之间，
+    样本不足时使用调用方给的默认窗口。学习结果持久化到本地文件。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.RLock()
+        self._watches: list[ProgressWatch] = []
+        self._gaps: dict[str, deque[float]] | None = None
+        self._thread: threading.Thread | None = None
+
+    def _load(self) -> dict[str, deque[float]]:
+        if self._gaps is not None:
+            return self._gaps
+        self._gaps = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                data = {}
+            for key, gaps in data.get("gaps", {}).items() if isinstance(data, dict) else ():
+                self._gaps[key] = deque(gaps, maxlen=GAP_HISTORY)
+        return self._gaps
+
+    def _save(self) -> None:
+        try:
+            self.path.write_text(
+                json.dumps({"gaps": {key: list(gaps) for key, gaps in self._load().items()}},
+                           ensure_ascii=False, separators=(",", ":")),
+                encoding="utf-8",
+            )
+        except OSError as e:
+            logger.debug("[看门狗] 写入失败: {}", e)
+
+    def learn(self, key: str, gap: float) -> None:
+        """记录一次正常的状态变化间隔"""
+        with self.lock:
+            self._load().setdefault(key, deque(maxlen=GAP_HISTORY)).append(round(gap, 2))
+
+    def window(self, key: str, default: float, maximum: float, minimum: float = MIN_WINDOW) -> float:
+        """当前的卡住判定窗口（秒）"""
+        with self.lock:
+            gaps = self._load().get(key)
+            if not gaps or len(gaps) < MIN_SAMPLES:
+                return default
+            ordered = sorted(gaps)
+        quantile = ordered[min(len(ordered) - 1, int(len(ordered) * WINDOW_QUANTILE))]
+        return min(maximum, max(minimum, quantile * WINDOW_FACTOR))
+
+    def watch(
+        self,
+        task: str,
+        on_stall: Callable[[float], Any] | None = None,
+        default_window: float = 120.0,
+        max_window: float | None = None,
+        min_window: float = MIN_WINDOW,
+    ) -> ProgressWatch:
+        """
+        开始监视一次动作运行
+
+        Args:
+            task: 任务名，用于学习分组、日志和事件
+            on_stall: 恢复回调，参数为距上次进度的秒数，在后台线程中调用
+            default_window: 样本不足时的窗口（秒），通常传原来的固定超时
+            max_window: 窗口上限（秒），默认等于 default_window
+            min_window: 窗口下限（秒），切换阶段后使用阶段自己的下限
+
+        Returns:
+            进度监视
+        """
+        watch = ProgressWatch(self, task, on_stall, default_window,
+                              default_window if max_window is None else max_window, min_window)
+        with self.lock:
+            self._watches.append(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="progress-watchdog", daemon=True)
+                self._thread.start()
+        return watch
+
+    def unwatch(self, watch: ProgressWatch) -> None:
+        """结束监视并保存学习结果"""
+        with self.lock:
+            if watch not in self._watches:
+                return
+            self._watches.remove(watch)
+            self._save()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(CHECK_INTERVAL)
+            with self.lock:
+                watches = list(self._watches)
+            now = time.monotonic()
+            for watch in watches:
+                stall = watch.check(now)
+                if stall is not None:
+                    self._on_stall(watch, *stall)
+
+    @staticmethod
+    def _on_stall(watch: ProgressWatch, idle: float, window: float) -> None:
+        logger.warning(
+            "[看门狗] {} 在 {} 阶段 {:.1f} 秒没有进度（窗口 {:.1f} 秒，默认 {:.0f} 秒，最后一次进度: {}），触发恢复",
+            watch.task, watch.phase, idle, window, watch.default_window, watch.last_kind,
+        )
+        counter(watch.task, "stall_detect_seconds", round(idle, 1), phase=watch.phase, window=round(window, 1))
+        if watch.on_stall is not None:
+            try:
+                watch.on_stall(idle)
+            except Exception as e:
+                logger.exception(f"[看门狗] {watch.task} 恢复回调异常: {e}")
+
+
+# 全局进度看门狗
+progress_watchdog = ProgressWatchdog(STORE_FILEPATH)
@@ -0,0 +1,167 @@
+"""agent 启动耗时分析工具：结构化记录模块导入耗时和启动各阶段耗时。"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from pathlib import Path
+from typing import Any, Iterator
+
+
+class _TimingLoader:
+    """包装真实 loader，统计 create_module + exec_module 的耗时，其余属性全部透传。"""
+
+    def __init__(self, loader: Any, fullname: str, profiler: StartupProfiler) -> None:
+        self._loader = loader
+        self._fullname = fullname
+        self._profiler = profiler
+
+    def create_module(self, spec: Any) -> Any:
+        with self._profiler.timing_import(self._fullname):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        # 保证模块上看到的是真实 loader，避免影响 importlib.resources 等依赖 loader 类型的逻辑
+        module.__loader__ = self._loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self._loader
+        with self._profiler.timing_import(self._fullname):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(MetaPathFinder):
+    """放在 sys.meta_path 最前面，把其他 finder 找到的 spec 的 loader 包装成计时 loader。"""
+
+    def __init__(self, profiler: StartupProfiler) -> None:
+        self._profiler = profiler
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimingLoader(spec.loader, fullname, self._profiler)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    """
+    启动耗时分析器，类似 `python -X importtime` 但输出结构化 JSON。
+
+    用法:
+        profiler = StartupProfiler()
+        profiler.install()
+        with profiler.phase("load_plugins"):
+            ...
+        profiler.uninstall()
+        profiler.write_report(path)
+    """
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self._finder: _TimingFinder | None = None
+        # 模块名 -> [累计耗时(含子模块), 自身耗时]
+        self._imports: dict[str, list[float]] = {}
+        # 当前正在导入的模块栈：[模块名, 开始时间, 子模块耗时]
+        self._stack: list[list[Any]] = []
+        self._phases: dict[str, float] = {}
+        self._plugins: dict[str, float] = {}
+
+    def install(self) -> None:
+        """开始记录模块导入耗时"""
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self) -> None:
+        """停止记录模块导入耗时"""
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    @contextmanager
+    def timing_import(self, fullname: str) -> Iterator[None]:
+        """记录单个模块的导入耗时，嵌套导入会计入父模块的累计耗时而不计入自身耗时"""
+        frame = [fullname, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            cumulative = time.perf_counter() - frame[1]
+            entry = self._imports.setdefault(fullname, [0.0, 0.0])
+            entry[0] += cumulative
+            entry[1] += cumulative - frame[2]
+            if self._stack:
+                self._stack[-1][2] += cumulative
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """记录一个启动阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[name] = self._phases.get(name, 0.0) + time.perf_counter() - start
+
+    def record_plugin(self, module_name: str, seconds: float) -> None:
+        """记录单个模组的加载耗时"""
+        self._plugins[module_name] = seconds
+
+    @property
+    def elapsed(self) -> float:
+        """从分析器创建到现在的秒数"""
+        return time.perf_counter() - self._start
+
+    def report(self) -> dict[str, Any]:
+        """生成耗时报告，导入耗时按自身耗时降序"""
+        imports = sorted(self._imports.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "total_ms": round(self.elapsed * 1000, 2),
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self._phases.items()},
+            "plugins_ms": {
+                name: round(seconds * 1000, 2)
+                for name, seconds in sorted(self._plugins.items(), key=lambda item: item[1], reverse=True)
+            },
+            "imports": [
+                {"module": name, "self_ms": round(self_s * 1000, 3), "cumulative_ms": round(cum_s * 1000, 3)}
+                for name, (cum_s, self_s) in imports
+            ],
+        }
+
+    def write_report(self, path: Path) -> dict[str, Any]:
+        """写出 JSON 报告并返回报告内容"""
+        report = self.report()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=4), encoding="utf-8")
+        return report
+
+
+def check_startup_budget(report: dict[str, Any], budget_ms: float) -> str | None:
+    """
+    检查启动总耗时是否超出预算
+
+    Args:
+        report: StartupProfiler.report() 的结果
+        budget_ms: 预算毫秒数，<= 0 表示不检查
+
+    Returns:
+        超出预算时返回说明文字（附带最慢的几个模块），否则返回 None
+    """
+    if budget_ms <= 0 or report["total_ms"] <= budget_ms:
+        return None
+    slowest = ", ".join(f"{item['module']}({item['self_ms']}ms)" for item in report["imports"][:5])
+    return f"启动耗时 {report['total_ms']}ms 超出预算 {budget_ms}ms，最慢的模块: {slowest}"
@@ -0,0 +1,135 @@
+"""
+结构化事件统计
+
+读取 agent 写出的 debug/events/events-*.jsonl，统计每个任务的执行次数、失败率、平均耗时和吞吐量，
+以及异常恢复分支、识别命中率和计数器的最终值。
+
+用法:
+    python scripts/aggregate_events.py [路径 ...] [--task AutoFishing] [--json]
+    路径可以是事件文件或目录，默认 debug/events
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Iterator
+
+
+def iter_event_files(paths: list[Path]) -> Iterator[Path]:
+    for path in paths:
+        if path.is_dir():
+            yield from sorted(path.glob("events-*.jsonl"))
+        elif path.exists():
+            yield path
+
+
+def iter_events(paths: list[Path]) -> Iterator[dict[str, Any]]:
+    """逐行读取事件，跳过写到一半的坏行"""
+    for path in iter_event_files(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def aggregate(events: Iterator[dict[str, Any]], task_filter: str | None = None) -> dict[str, Any]:
+    tasks: dict[str, dict[str, Any]] = defaultdict(
+        lambda: {"runs": 0, "failures": 0, "errors": 0, "duration_ms": 0, "first_ts": None, "last_ts": None}
+    )
+    recoveries: dict[str, Counter] = defaultdict(Counter)
+    recognitions: dict[str, dict[str, list[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    counters: dict[str, dict[str, Any]] = defaultdict(dict)
+    commands: dict[str, Counter] = defaultdict(Counter)
+
+    for event in events:
+        task = event.get("task") or "-"
+        if task_filter and task != task_filter:
+            continue
+        event_type = event.get("type")
+        ts = event.get("ts")
+        if event_type == "task_end":
+            stats = tasks[task]
+            stats["runs"] += 1
+            stats["failures"] += 0 if event.get("success") else 1
+            stats["errors"] += 1 if event.get("error") else 0
+            stats["duration_ms"] += event.get("duration_ms", 0)
+            if ts is not None:
+                stats["first_ts"] = ts if stats["first_ts"] is None else min(stats["first_ts"], ts)
+                stats["last_ts"] = ts if stats["last_ts"] is None else max(stats["last_ts"], ts)
+        elif event_type == "recovery":
+            recoveries[task][event.get("branch")] += 1
+        elif event_type == "recognition":
+            hit_miss = recognitions[task][event.get("node")]
+            hit_miss[0 if event.get("hit") else 1] += 1
+        elif event_type == "counter":
+            counters[task][event.get("name")] = event.get("value")
+        elif event_type == "controller":
+            commands[task][event.get("command")] += 1
+
+    summary: dict[str, Any] = {}
+    for task in sorted(set(tasks) | set(recoveries) | set(recognitions) | set(counters) | set(commands)):
+        item: dict[str, Any] = {}
+        stats = tasks.get(task)
+        if stats and stats["runs"]:
+            span_hours = (stats["last_ts"] - stats["first_ts"]) / 3600 if stats["first_ts"] is not None else 0
+            item.update({
+                "runs": stats["runs"],
+                "failure_rate": round(stats["failures"] / stats["runs"], 4),
+                "errors": stats["errors"],
+                "avg_duration_s": round(stats["duration_ms"] / stats["runs"] / 1000, 2),
+                "runs_per_hour": round(stats["runs"] / span_hours, 2) if span_hours > 0 else None,
+            })
+        if recoveries.get(task):
+            item["recoveries"] = dict(recoveries[task].most_common())
+        if recognitions.get(task):
+            item["recognition_hit_rate"] = {
+                node: round(hit / (hit + miss), 4) for node, (hit, miss) in recognitions[task].items()
+            }
+        if commands.get(task):
+            item["controller_commands"] = dict(commands[task])
+        if counters.get(task):
+            item["counters"] = counters[task]
+        summary[task] = item
+    return summary
+
+
+def print_table(summary: dict[str, Any]) -> None:
+    header = f"{'任务':<32}{'次数':>8}{'失败率':>10}{'平均耗时(s)':>14}{'每小时':>10}"
+    print(header)
+    print("-" * len(header))
+    for task, item in summary.items():
+        if "runs" not in item:
+            continue
+        runs_per_hour = item["runs_per_hour"] if item["runs_per_hour"] is not None else "-"
+        print(f"{task:<32}{item['runs']:>8}{item['failure_rate']:>10.2%}{item['avg_duration_s']:>14}{runs_per_hour:>10}")
+    for task, item in summary.items():
+        extra = {key: value for key, value in item.items() if key in ("recoveries", "recognition_hit_rate", "counters")}
+        if extra:
+            print(f"\n[{task}]")
+            for key, value in extra.items():
+                print(f"  {key}: {json.dumps(value, ensure_ascii=False)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计结构化事件流")
+    parser.add_argument("paths", nargs="*", type=Path, default=[Path("debug") / "events"], help="事件文件或目录")
+    parser.add_argument("--task", help="只统计指定任务")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    summary = aggregate(iter_events(args.paths), args.task)
+    if not summary:
+        print("没有找到事件", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=4))
+    else:
+        print_table(summary)
+
+
+if __name__ == "__main__":
+    main()
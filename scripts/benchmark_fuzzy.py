@@ -0,0 +1,99 @@
+"""
+模糊匹配基准测试
+
+构造 1k 条候选的目录和一批带 OCR 噪声的查询（包含大量重复文本，模拟同一条鱼被反复识别），
+对比 get_best_match_single 与 FuzzyIndex.match 的耗时和结果一致率。
+
+用法:
+    python scripts/benchmark_fuzzy.py [--catalog 1000] [--queries 5000] [--unique 300]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from agent.utils.fuzzy_utils import FuzzyIndex, get_best_match_single  # noqa: E402
+
+# 生成候选用的汉字池
+CHAR_POOL = "鱼虾蟹贝螺鲨鲸鳗鲤鲈鳕鲑鳟金银红蓝黑白斑纹星月海河湖溪深浅大小长短圆扁刺甲"
+
+
+def build_catalog(size: int, rng: random.Random) -> list[str]:
+    """生成 size 条互不相同的 2~6 字候选"""
+    catalog: set[str] = set()
+    while len(catalog) < size:
+        catalog.add("".join(rng.choices(CHAR_POOL, k=rng.randint(2, 6))))
+    return sorted(catalog)
+
+
+def add_ocr_noise(text: str, rng: random.Random) -> str:
+    """模拟 OCR 错误：随机替换 / 删除一个字，或者夹带空格"""
+    roll = rng.random()
+    if roll < 0.3 and len(text) > 2:
+        idx = rng.randrange(len(text))
+        return text[:idx] + rng.choice(CHAR_POOL) + text[idx + 1:]
+    if roll < 0.45 and len(text) > 2:
+        idx = rng.randrange(len(text))
+        return text[:idx] + text[idx + 1:]
+    if roll < 0.55:
+        return " " + text + " "
+    return text
+
+
+def measure(fn, queries: list[str]) -> tuple[float, list[str | None]]:
+    start = time.perf_counter()
+    results = [fn(query) for query in queries]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 get_best_match_single 与 FuzzyIndex 的性能")
+    parser.add_argument("--catalog", type=int, default=1000, help="候选数量")
+    parser.add_argument("--queries", type=int, default=5000, help="查询次数")
+    parser.add_argument("--unique", type=int, default=300, help="不同查询文本的数量")
+    parser.add_argument("--threshold", type=float, default=60, help="分数阈值")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = build_catalog(args.catalog, rng)
+    unique_queries = [add_ocr_noise(rng.choice(catalog), rng) for _ in range(args.unique)]
+    queries = [rng.choice(unique_queries) for _ in range(args.queries)]
+
+    baseline_s, baseline = measure(lambda q: get_best_match_single(q, catalog, args.threshold), queries)
+
+    build_start = time.perf_counter()
+    index = FuzzyIndex(catalog, score_threshold=args.threshold)
+    build_s = time.perf_counter() - build_start
+    indexed_s, indexed = measure(index.match, queries)
+
+    # 不带缓存：每个查询文本只算一次，单独衡量预处理 + extractOne 剪枝的收益
+    index.cache_clear()
+    uncached_s, _ = measure(index.match, unique_queries)
+    baseline_unique_s, _ = measure(lambda q: get_best_match_single(q, catalog, args.threshold), unique_queries)
+
+    agree = sum(a == b for a, b in zip(baseline, indexed))
+    result = {
+        "catalog": len(catalog),
+        "queries": len(queries),
+        "unique_queries": len(unique_queries),
+        "baseline_ms": round(baseline_s * 1000, 2),
+        "index_build_ms": round(build_s * 1000, 2),
+        "index_ms": round(indexed_s * 1000, 2),
+        "speedup": round(baseline_s / indexed_s, 1) if indexed_s else None,
+        "uncached_baseline_us_per_query": round(baseline_unique_s / len(unique_queries) * 1e6, 1),
+        "uncached_index_us_per_query": round(uncached_s / len(unique_queries) * 1e6, 1),
+        # 不一致通常是 query 带空格 / 全角字符，FuzzyIndex 规范化后才能匹配上
+        "agreement": round(agree / len(queries), 4),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+日志 sink 吞吐量基准测试
+
+对比 逐条 write + flush 的旧 sink 与 BufferedSink 的吞吐量（条/秒），输出写入临时文件，
+避免终端渲染速度影响结果。计时包含 logger.complete()，即等待后台队列全部写出。
+
+用法:
+    python scripts/benchmark_logging.py [--records 50000]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from agent.logger import BufferedSink, format_record, logger  # noqa: E402
+
+
+def make_unbuffered_sink(stream):
+    """与旧版 sink_function 一致：每条日志 write + flush 一次"""
+
+    def sink(message) -> None:
+        stream.write(format_record(message.record))
+        stream.flush()
+
+    return sink
+
+
+def measure(sink, records: int, enqueue: bool) -> float:
+    """用指定 sink 写出 records 条 INFO 日志，返回条/秒"""
+    logger.remove()
+    handler_id = logger.add(sink, level="DEBUG", enqueue=enqueue)
+    start = time.perf_counter()
+    for i in range(records):
+        logger.info("[执行钓鱼] 第 {} 次收线, 剩余耐力 {}", i, records - i)
+    logger.complete()
+    if isinstance(sink, BufferedSink):
+        sink.flush()
+    seconds = time.perf_counter() - start
+    logger.remove(handler_id)
+    return records / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比日志 sink 吞吐量")
+    parser.add_argument("--records", type=int, default=50000, help="每轮写出的日志条数")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for enqueue in (False, True):
+            suffix = "enqueue" if enqueue else "direct"
+            with open(Path(tmp) / f"unbuffered_{suffix}.log", "w", encoding="utf-8") as f:
+                results[f"unbuffered_{suffix}"] = round(measure(make_unbuffered_sink(f), args.records, enqueue))
+            with open(Path(tmp) / f"buffered_{suffix}.log", "w", encoding="utf-8") as f:
+                sink = BufferedSink(stream=f)
+                results[f"buffered_{suffix}"] = round(measure(sink, args.records, enqueue))
+                sink.close()
+
+    print(json.dumps({"records": args.records, "records_per_second": results}, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+OCR 易混淆字符打分离线评估
+
+对比 普通 fuzz.ratio 与 归并易混淆字符后的 fuzz.ratio 在带标注 OCR 语料上的准确率和吞吐量。
+
+语料为 JSONL，每行 {"ocr": "OCR 识别结果", "truth": "正确文本"}，可从调试日志中整理；
+不传语料时用鱼名列表按易混淆表合成一份（仅用于冒烟测试，准确率不代表真实情况）。
+
+用法:
+    python scripts/benchmark_ocr_scorer.py [--corpus ocr_samples.jsonl] [--learn] [--threshold 60]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from agent.constant.fish import FISH_LIST  # noqa: E402
+from agent.constant.ocr_confusion import OCR_CONFUSION  # noqa: E402
+from agent.utils.fuzzy_utils import FuzzyIndex, OcrConfusionTable, normalize_text  # noqa: E402
+
+
+def load_corpus(path: Path) -> list[tuple[str, str]]:
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                samples.append((item["ocr"], item["truth"]))
+    return samples
+
+
+def synthesize_corpus(catalog: list[str], table: OcrConfusionTable, size: int, rng: random.Random) -> list[tuple[str, str]]:
+    """把正确文本中的字符替换成同组易混淆字符，偶尔再删掉一个字"""
+    confusable: dict[str, list[str]] = {}
+    for group in table.groups:
+        for char in group:
+            confusable[char] = [other for other in group if other != char]
+    samples = []
+    for _ in range(size):
+        truth = rng.choice(catalog)
+        chars = list(truth)
+        positions = [i for i, char in enumerate(chars) if char in confusable]
+        for i in rng.sample(positions, k=min(len(positions), rng.randint(1, 2))):
+            chars[i] = rng.choice(confusable[chars[i]])
+        if len(chars) > 3 and rng.random() < 0.3:
+            del chars[rng.randrange(len(chars))]
+        samples.append(("".join(chars), truth))
+    return samples
+
+
+def evaluate(index: FuzzyIndex, samples: list[tuple[str, str]]) -> dict:
+    start = time.perf_counter()
+    results = [index.match(ocr_text) for ocr_text, _ in samples]
+    seconds = time.perf_counter() - start
+    correct = sum(result == truth for result, (_, truth) in zip(results, samples))
+    unmatched = sum(result is None for result in results)
+    return {
+        "accuracy": round(correct / len(samples), 4),
+        "unmatched": unmatched,
+        "queries_per_second": round(len(samples) / seconds) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估 OCR 易混淆字符打分")
+    parser.add_argument("--corpus", type=Path, help="带标注的 OCR 语料 JSONL")
+    parser.add_argument("--learn", action="store_true", help="用一半语料学习易混淆表，另一半评估")
+    parser.add_argument("--threshold", type=float, default=60, help="分数阈值")
+    parser.add_argument("--size", type=int, default=5000, help="合成语料的条数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table = OCR_CONFUSION
+    if args.corpus:
+        samples = load_corpus(args.corpus)
+        catalog = sorted({truth for _, truth in samples})
+    else:
+        catalog = list(FISH_LIST)
+        samples = synthesize_corpus(catalog, table, args.size, rng)
+    # 只评估 OCR 结果确实有误的样本
+    samples = [(ocr_text, truth) for ocr_text, truth in samples if normalize_text(ocr_text) != normalize_text(truth)]
+    if not samples:
+        print("语料中没有识别错误的样本")
+        return
+
+    if args.learn:
+        rng.shuffle(samples)
+        train, samples = samples[: len(samples) // 2], samples[len(samples) // 2:]
+        table = OcrConfusionTable([*OCR_CONFUSION.groups, *OcrConfusionTable.learn(train).groups])
+
+    # 关闭查询缓存，测量的是单次打分的真实开销
+    plain = FuzzyIndex(catalog, score_threshold=args.threshold, cache_size=0)
+    confusion = FuzzyIndex(catalog, score_threshold=args.threshold, cache_size=0, normalizer=table.canonicalize)
+    result = {
+        "catalog": len(catalog),
+        "samples": len(samples),
+        "confusion_groups": len(table.groups),
+        "ratio": evaluate(plain, samples),
+        "confusion_ratio": evaluate(confusion, samples),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+agent 启动耗时基准测试
+
+分别以 全量导入 / 插件清单懒加载 两种模式启动子进程，测量从解释器启动到即将调用
+AgentServer.start_up 的耗时（不真正连接 MaaFW 客户端）。
+
+用法:
+    python scripts/benchmark_startup.py [--rounds 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+AGENT_DIR = REPO_ROOT / "agent"
+
+# 子进程中执行的代码：与 agent/main.py 的 main() 保持一致的导入顺序
+CHILD_CODE = """
+import sys, time
+t0 = time.perf_counter()
+sys.path[:0] = [{repo_root!r}, {agent_dir!r}]
+import main as agent_main
+from maa.agent.agent_server import AgentServer
+from maa.toolkit import Toolkit
+from pathlib import Path
+manifest_path = {manifest_path!r}
+agent_main.load_agent_plugins(Path(manifest_path) if manifest_path else None)
+print("STARTUP_SECONDS", time.perf_counter() - t0, len(sys.modules))
+"""
+
+
+def run_once(manifest_path: Path | None) -> tuple[float, float, int]:
+    """启动一次子进程，返回 (进程总耗时, 到 start_up 前的耗时, 已导入模块数)"""
+    code = CHILD_CODE.format(
+        repo_root=str(REPO_ROOT),
+        agent_dir=str(AGENT_DIR),
+        manifest_path=str(manifest_path) if manifest_path else "",
+    )
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        cwd=REPO_ROOT,
+    )
+    wall = time.perf_counter() - start
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP_SECONDS"):
+            _, seconds, modules = line.split()
+            return wall, float(seconds), int(modules)
+    raise RuntimeError(f"子进程未输出启动耗时:\n{proc.stdout}\n{proc.stderr}")
+
+
+def summarize(samples: list[tuple[float, float, int]]) -> dict:
+    return {
+        "wall_median_ms": round(statistics.median(s[0] for s in samples) * 1000, 1),
+        "startup_median_ms": round(statistics.median(s[1] for s in samples) * 1000, 1),
+        "startup_min_ms": round(min(s[1] for s in samples) * 1000, 1),
+        "modules": samples[-1][2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量 agent 启动到 AgentServer.start_up 前的耗时")
+    parser.add_argument("--rounds", type=int, default=5, help="每种模式的测量轮数")
+    args = parser.parse_args()
+
+    sys.path[:0] = [str(REPO_ROOT), str(AGENT_DIR)]
+    from agent.module_loader import write_plugin_manifest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_path = Path(tmp) / "plugin_manifest.json"
+        write_plugin_manifest(AGENT_DIR, manifest_path)
+
+        # 先各跑一次预热 __pycache__
+        run_once(None)
+        run_once(manifest_path)
+
+        results = {
+            "eager": summarize([run_once(None) for _ in range(args.rounds)]),
+            "lazy": summarize([run_once(manifest_path) for _ in range(args.rounds)]),
+        }
+
+    eager, lazy = results["eager"]["startup_median_ms"], results["lazy"]["startup_median_ms"]
+    results["saved_ms"] = round(eager - lazy, 1)
+    print(json.dumps(results, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+多控制器并发运行检查
+
+用假的控制器 / 上下文，在多个线程中让同一个动作实例同时运行，检查：
+1. 每次运行的状态（FishingRun / BeatChenRun）互不影响，计数与各自的假识别结果一致
+2. 共用的缓存（分线选择、断点存储）在并发读写后计数不丢失
+3. 按控制器分开的状态（断点、当前分线、位置记录、队伍信息）互不覆盖
+4. 两个控制器同时完整运行 AutoFishingAction.run（同一个任务名），断点各自恢复、保存和清除
+
+所有文件都写到临时目录，不影响本地的分线记录和断点。
+
+用法:
+    python scripts/check_concurrent_runs.py [--controllers 4] [--rounds 200]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from agent.constant.fish import FISH_LIST  # noqa: E402
+from agent.custom.beat_chen_min import BeatChenRun  # noqa: E402
+from agent.custom.fishing_action import AutoFishingAction, FishingRun  # noqa: E402
+from agent.custom.general.chat_message import TeamInfoCache  # noqa: E402
+from agent.custom.general.line_selector import FISHING, LineSelector  # noqa: E402
+from agent.custom.general.line_selector import line_selector  # noqa: E402
+from agent.custom.general.route_planner import LocationTracker  # noqa: E402
+from agent.logger import logger  # noqa: E402
+from agent.utils.checkpoint import Checkpoint, CheckpointStore, checkpoint_store, config_key  # noqa: E402
+from agent.utils.controller_scope import PerController  # noqa: E402
+from agent.utils.event_stream import event_stream  # noqa: E402
+from agent.utils.progress_watchdog import ProgressWatchdog, progress_watchdog  # noqa: E402
+
+RARITIES = ["常见", "珍稀", "神话"]
+RARITY_ROI = [734, 531, 91, 23]
+# 完整运行 AutoFishingAction.run 时，从断点恢复的控制器之前已经钓过的次数
+RESUMED_FISHING_COUNT = 5
+# 每轮开始时点击的位置 | 第二次点击时停止任务，第二轮开始前已经保存了第一轮的进度
+ROUND_START_CLICK = (640, 10)
+
+
+class FakeJob:
+    def __init__(self, value=None) -> None:
+        self.value = value
+        self.succeeded = True
+
+    def wait(self) -> "FakeJob":
+        return self
+
+    def get(self):
+        return self.value
+
+
+class FakeController:
+    """每个实例代表一个模拟器，记录收到的点击"""
+
+    def __init__(self, index: int) -> None:
+        self.uuid = f"fake-{index}"
+        self.frame = numpy.full((72, 128, 3), index, dtype=numpy.uint8)
+        self.clicks: list[tuple] = []
+
+    def post_screencap(self) -> FakeJob:
+        return FakeJob(self.frame)
+
+    def post_click(self, *args) -> FakeJob:
+        self.clicks.append(args[:2])
+        return FakeJob()
+
+    def post_touch_down(self, *_args) -> FakeJob:
+        return FakeJob()
+
+    def post_touch_up(self, *_args) -> FakeJob:
+        return FakeJob()
+
+
+class FakeResult:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class FakeDetail:
+    def __init__(self, text: str = "", hit: bool = True) -> None:
+        self.hit = hit
+        self.best_result = FakeResult(text) if hit else None
+        self.all_results = [self.best_result] if hit else []
+
+
+class FakeTasker:
+    def __init__(self, controller: FakeController) -> None:
+        self.controller = controller
+        self.stopping = False
+
+
+class FakeContext:
+    """固定识别出某个稀有度和鱼名的上下文"""
+
+    def __init__(self, index: int) -> None:
+        self.tasker = FakeTasker(FakeController(index))
+        self.rarity = RARITIES[index % len(RARITIES)]
+        self.fish = FISH_LIST[index % len(FISH_LIST)]
+
+    def run_recognition(self, _node: str, _img, pipeline_override: dict | None = None) -> FakeDetail:
+        roi = (pipeline_override or {}).get("通用文字识别", {}).get("roi")
+        return FakeDetail(self.rarity if roi == RARITY_ROI else self.fish)
+
+
+class FishingContext(FakeContext):
+    """
+    按钓鱼流程给出识别结果的上下文：抛竿 -> 咬钩 -> 收线（检测不到张力）-> 继续钓鱼
+
+    第二轮开始时停止任务，AutoFishingAction.run 正常结束并清除断点。
+    """
+
+    def __init__(self, index: int) -> None:
+        super().__init__(index)
+        self.reeled = False
+
+    @staticmethod
+    def get_node_data(_node: str) -> None:
+        # 所有参数节点都使用默认值，即原地钓鱼
+        return None
+
+    def run_action(self, _node: str, *_args, **_kwargs) -> None:
+        controller = self.tasker.controller
+        if controller.clicks.count(ROUND_START_CLICK) >= 2:
+            self.tasker.stopping = True
+
+    def run_recognition(self, node: str, img, pipeline_override: dict | None = None) -> FakeDetail:
+        if node == "通用文字识别":
+            return super().run_recognition(node, img, pipeline_override)
+        if node == "检测继续钓鱼":
+            return FakeDetail("继续钓鱼", self.reeled)
+        if node in ("检测抛竿按钮", "检测鱼鱼是否咬钩"):
+            return FakeDetail(node)
+        if node == "检测张力百分比":
+            self.reeled = True
+        return FakeDetail(hit=False)
+
+
+def run_controller(index: int, rounds: int, shared: dict, results: dict) -> None:
+    """一个控制器上的一次运行：同一个动作实例，独立的运行状态"""
+    context = FakeContext(index)
+    action: AutoFishingAction = shared["action"]
+    state = FishingRun(shared["watchdog"].watch(f"controller-{index}"), 0.0)
+    # 所有控制器使用同一个任务名，断点按控制器分开
+    chen = BeatChenRun.restore(Checkpoint(context, "BeatChenMinPoint", "check", store=shared["checkpoints"]))
+    img = context.tasker.controller.post_screencap().wait().get()
+    line = str(40 + index)
+    for i in range(rounds):
+        state.success_fishing_count += 1
+        action.check_fishing_result(context, state, img)
+        state.watch.frame(img)
+
+        shared["lines"].record_switch(context, line, True, 10.0)
+        shared["lines"].record(line, FISHING, True)
+        team = shared["team"].get(context)
+        info = team.get(300, True)
+        if info is None:
+            info = (index, 5, f"队伍{index}")
+            team.put(info, True)
+        if info[2] != f"队伍{index}":
+            shared["foreign_teams"].append((index, info[2]))
+        tracker = shared["tracker"].get(context)
+        tracker.start_navigation("阿斯特里斯", str(i), {"x": i, "y": index})
+        tracker.arrive()
+
+        chen.beat_count += 1
+        chen.tried_lines.add(line)
+        chen.save()
+    state.watch.close()
+    results[index] = {"context": context, "state": state, "chen": chen}
+
+
+def run_fishing(index: int, results: dict) -> None:
+    """一个控制器上完整运行一次 AutoFishingAction.run，任务名与其他控制器相同"""
+    context = FishingContext(index)
+    argv = type("RunArg", (), {"custom_action_param": "{}"})()
+    results[index] = {"context": context, "result": AutoFishingAction().run(context, argv)}  # type: ignore
+
+
+def check_fishing_runs(controllers: int, errors: list[str]) -> None:
+    """
+    多个控制器同时完整运行自动钓鱼，检查断点按控制器恢复、保存和清除
+
+    第一个控制器有崩溃前的断点，其他控制器从零开始；每个控制器钓上一条自己稀有度的鱼后停止。
+    """
+    key = config_key(0, "不导航")
+    resumed = FishingContext(0)
+    rarity_fields = {"常见": "r_fish_count", "珍稀": "sr_fish_count", "神话": "ssr_fish_count"}
+    Checkpoint(resumed, "AutoFishing", key).save(
+        arrived=False, fishing_count=RESUMED_FISHING_COUNT, success_fishing_count=RESUMED_FISHING_COUNT,
+        **{rarity_fields[resumed.rarity]: RESUMED_FISHING_COUNT},
+    )
+
+    # 记录每个断点条目保存过的进度
+    saves: dict[str, list[dict]] = {}
+    store_save = checkpoint_store.save
+
+    def record_save(entry: str, key: str, state: dict) -> None:
+        saves.setdefault(entry, []).append(dict(state))
+        store_save(entry, key, state)
+
+    checkpoint_store.save = record_save  # type: ignore
+    results: dict = {}
+    threads = [threading.Thread(target=run_fishing, args=(index, results)) for index in range(controllers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    checkpoint_store.save = store_save  # type: ignore
+
+    for index in range(controllers):
+        entry = f"AutoFishing@fake-{index}"
+        result = results.get(index)
+        if not result or result["result"] is not True:
+            errors.append(f"控制器 {index} 的 AutoFishingAction.run 没有正常结束")
+            continue
+        history = saves.get(entry, [])
+        if len(history) != 2:
+            errors.append(f"断点 {entry} 保存了 {len(history)} 次，应为 2 次")
+            continue
+        before = RESUMED_FISHING_COUNT if index == 0 else 0
+        if history[0].get("fishing_count") != before:
+            errors.append(f"断点 {entry} 恢复的 fishing_count = {history[0].get('fishing_count')}，应为 {before}")
+        field = rarity_fields[result["context"].rarity]
+        for name in ("fishing_count", "success_fishing_count", field):
+            if history[1].get(name) != before + 1:
+                errors.append(f"断点 {entry} 的 {name} = {history[1].get(name)}，应为 {before + 1}")
+        if checkpoint_store.load(entry, key) is not None:
+            errors.append(f"断点 {entry} 在任务结束后没有清除")
+    unexpected = set(saves) - {f"AutoFishing@fake-{index}" for index in range(controllers)}
+    if unexpected:
+        errors.append(f"出现了不属于任何控制器的断点: {sorted(unexpected)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多控制器并发运行检查")
+    parser.add_argument("--controllers", type=int, default=4, help="同时运行的控制器数量")
+    parser.add_argument("--rounds", type=int, default=200, help="每个控制器的运行轮数")
+    parser.add_argument("--fishing-controllers", type=int, default=2,
+                        help="同时完整运行自动钓鱼的控制器数量，每个约需 20 秒，0 表示跳过")
+    args = parser.parse_args()
+
+    # 假识别每轮都会打印钓鱼结果并记录事件，只保留警告以上的日志，不写事件文件
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    event_stream.enabled = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        shared = {
+            "action": AutoFishingAction(),
+            "watchdog": ProgressWatchdog(tmp_path / "watchdog_stats.json"),
+            "checkpoints": CheckpointStore(tmp_path / "checkpoints.json"),
+            "lines": LineSelector(tmp_path / "line_stats.json"),
+            "team": PerController(TeamInfoCache),
+            # 读到的不是自己队伍的 (控制器, 队伍名)
+            "foreign_teams": [],
+            "tracker": PerController(LocationTracker),
+        }
+        results: dict = {}
+        threads = [
+            threading.Thread(target=run_controller, args=(index, args.rounds, shared, results))
+            for index in range(args.controllers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        errors = []
+        rarity_fields = {"常见": "r_fish_count", "珍稀": "sr_fish_count", "神话": "ssr_fish_count"}
+        for index, team_name in shared["foreign_teams"]:
+            errors.append(f"控制器 {index} 读到了其他控制器的队伍信息: {team_name}")
+        for index, result in sorted(results.items()):
+            state: FishingRun = result["state"]
+            for rarity, name in rarity_fields.items():
+                expected = args.rounds if rarity == result["context"].rarity else 0
+                if getattr(state, name) != expected:
+                    errors.append(f"控制器 {index} 的 {name} = {getattr(state, name)}，应为 {expected}")
+            context = result["context"]
+            saved = shared["checkpoints"].load(f"BeatChenMinPoint@fake-{index}", "check")
+            if not saved or saved.get("beat_count") != args.rounds:
+                errors.append(f"控制器 {index} 的断点 beat_count = {saved and saved.get('beat_count')}")
+            if shared["lines"].current_line(context) != str(40 + index):
+                errors.append(f"控制器 {index} 的当前分线 = {shared['lines'].current_line(context)}")
+            if shared["tracker"].get(context).point != str(args.rounds - 1):
+                errors.append(f"控制器 {index} 的位置记录 = {shared['tracker'].get(context).point}")
+            rate = shared["lines"].success_rate(str(40 + index), FISHING)
+            expected_rate = (args.rounds + 1) / (args.rounds + 2)
+            if abs(rate - expected_rate) > 1e-3:
+                errors.append(f"分线 {40 + index} 的成功率 {rate:.4f}，应为 {expected_rate:.4f}")
+        if len(results) != args.controllers:
+            errors.append(f"只完成了 {len(results)} 个控制器")
+        team_cache = {"hits": 0, "refreshes": 0}
+        for index, result in sorted(results.items()):
+            team = shared["team"].get(result["context"])
+            team_cache["hits"] += team.hits
+            team_cache["refreshes"] += team.refreshes
+            if team.refreshes != 1 or team.hits != args.rounds - 1:
+                errors.append(f"控制器 {index} 的队伍信息缓存命中 {team.hits} 次、刷新 {team.refreshes} 次，"
+                              f"应为 {args.rounds - 1} 次、1 次")
+
+        if args.fishing_controllers:
+            # 完整运行时使用全局的断点、看门狗和分线记录，改到临时目录
+            checkpoint_store.path = tmp_path / "run_checkpoints.json"
+            checkpoint_store._tasks = None
+            progress_watchdog.path = tmp_path / "run_watchdog_stats.json"
+            progress_watchdog._gaps = None
+            line_selector.path = tmp_path / "run_line_stats.json"
+            line_selector._lines, line_selector._loaded = {}, False
+            check_fishing_runs(args.fishing_controllers, errors)
+
+    print(json.dumps({
+        "controllers": args.controllers,
+        "rounds": args.rounds,
+        "fishing_controllers": args.fishing_controllers,
+        "team_cache": team_cache,
+        "errors": errors,
+    }, ensure_ascii=False, indent=4))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
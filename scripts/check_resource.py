@@ -1,3 +1,5 @@
+import importlib
+import pkgutil
 import sys
 
 from typing import List
@@ -6,6 +8,12 @@ from pathlib import Path
 from maa.resource import Resource
 from maa.tasker import Tasker, LoggingLevelEnum
 
+REPO_ROOT = Path(__file__).resolve().parent.parent
+AGENT_DIR = REPO_ROOT / "agent"
+for path in (REPO_ROOT, AGENT_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
 
 def check(dirs: List[Path]) -> bool:
     resource = Resource()
@@ -23,6 +31,44 @@ def check(dirs: List[Path]) -> bool:
     return True
 
 
+def import_custom_modules() -> bool:
+    """导入所有自定义动作模块以注册参数声明，任何模块导入失败都算检查失败
+
+    不使用 module_loader.load_plugins：它只记录导入错误，部分参数声明缺失时校验会静默通过。
+    """
+    import agent.custom
+
+    ok = True
+    for module in pkgutil.walk_packages(agent.custom.__path__, "agent.custom."):
+        if any(part.startswith("_") for part in module.name.split(".")):
+            continue
+        try:
+            importlib.import_module(module.name)
+        except Exception as e:
+            print(f"Failed to import {module.name}: {e!r}")
+            ok = False
+    return ok
+
+
+def check_custom_action_params(dirs: List[Path]) -> bool:
+    """校验 pipeline 中自定义动作的 custom_action_param 是否符合参数声明"""
+    from agent.utils.param_utils import validate_pipeline_params
+
+    if not import_custom_modules():
+        return False
+
+    ok = True
+    for dir in dirs:
+        pipeline_dir = dir / "pipeline"
+        if not pipeline_dir.exists():
+            continue
+        print(f"Checking custom action params in {pipeline_dir}...")
+        for error in validate_pipeline_params(pipeline_dir):
+            print(f"Invalid custom_action_param: {error}")
+            ok = False
+    return ok
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python configure.py <directory>")
@@ -33,6 +79,8 @@ def main():
     dirs = [Path(arg) for arg in sys.argv[1:]]
     if not check(dirs):
         sys.exit(1)
+    if not check_custom_action_params(dirs):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -174,6 +174,25 @@ def install_agent():
     else:
         print("未找到 agent/main.py，无法取消注释 init_python_env()")
 
+    # 生成插件清单 | agent 启动时按清单注册懒加载代理，首次调用才导入模块
+    agent_dir = str(working_dir / "agent")
+    if agent_dir not in sys.path:
+        sys.path.insert(0, agent_dir)
+    from agent.module_loader import write_plugin_manifest
+
+    manifest = write_plugin_manifest(
+        install_path / "agent", install_path / "agent" / "plugin_manifest.json"
+    )
+    print(
+        f"已生成插件清单: {len(manifest['actions'])} 个动作, {len(manifest['recognitions'])} 个识别器, {len(manifest['params'])} 个参数声明"
+    )
+
+    # 预编译常量数据缓存 | 按源文件内容校验，打包和解压后仍然有效
+    from agent.constant.data_cache import write_constant_cache
+
+    write_constant_cache(install_path / "agent" / "constant" / "constant_cache.pickle")
+    print("已生成常量数据缓存")
+
 
 # 安装 embeddable python(仅适用于 Windows)
 def install_embed_python():